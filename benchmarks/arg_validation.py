@@ -0,0 +1,54 @@
+"""Per-action CPU spent validating and serializing tool args.
+
+Run with ``python -m benchmarks.arg_validation``. Times the args work of one
+action lifecycle (propose, execute, one detail render) the old way, with
+``model_validate``/``model_dump`` and JSON round trips at every phase, against
+the registry's compiled codecs, which validate once and reuse canonical JSON.
+"""
+import argparse
+import json
+import timeit
+
+from server.crypto import canonical_json
+from server.registry import RiskTier, Tool, ToolRegistry
+from server.tools.workspace import WriteFileArgs, write_file_preview
+
+ARGS = {"path": "docs/notes/README.generated.md", "content": "# Generated\n\n" + "lorem ipsum " * 200}
+
+
+def baseline() -> None:
+    parsed = WriteFileArgs.model_validate(ARGS)
+    args = parsed.model_dump()
+    json.loads(canonical_json(args))
+    args_json = json.dumps(args)
+    WriteFileArgs.model_validate(json.loads(args_json))
+    WriteFileArgs.model_validate(json.loads(args_json))
+
+
+def compiled(registry: ToolRegistry) -> None:
+    codec = registry.codec("workspace.write_file")
+    args = codec.dump(codec.validate(ARGS))
+    args_json = canonical_json(args)
+    codec.validate_json(args_json)
+    codec.trusted(json.loads(args_json))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--number", type=int, default=20000)
+    args = parser.parse_args()
+    registry = ToolRegistry()
+    registry.register(Tool("workspace.write_file", "", WriteFileArgs, RiskTier.PRIVILEGED, write_file_preview, print))
+
+    results = {
+        "baseline": min(timeit.repeat(baseline, number=args.number, repeat=5)),
+        "compiled": min(timeit.repeat(lambda: compiled(registry), number=args.number, repeat=5)),
+    }
+    print(f"{'path':>10} {'us/action':>10}")
+    for name, seconds in results.items():
+        print(f"{name:>10} {seconds / args.number * 1e6:>10.2f}")
+    print(f"{'speedup':>10} {results['baseline'] / results['compiled']:>9.2f}x")
+
+
+if __name__ == "__main__":
+    main()
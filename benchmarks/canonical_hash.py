@@ -0,0 +1,69 @@
+"""Canonical action hashing cost across write_file payload sizes.
+
+Run with ``python -m benchmarks.canonical_hash``. Compares the previous
+``json.dumps`` + encode + sha256 path with the streaming encoder and, when
+orjson is installed, the orjson fast path. Reports time per hash and peak
+memory allocated while hashing.
+"""
+import argparse
+import hashlib
+import time
+import tracemalloc
+
+from server import crypto
+
+
+def legacy(payload: dict) -> str:
+    return hashlib.sha256(crypto.canonical_json(payload).encode("utf-8")).hexdigest()
+
+
+def streaming(payload: dict) -> str:
+    enabled, crypto.ORJSON_ENABLED = crypto.ORJSON_ENABLED, False
+    try:
+        return crypto.canonical_digest(payload)
+    finally:
+        crypto.ORJSON_ENABLED = enabled
+
+
+def fast(payload: dict) -> str:
+    return crypto.canonical_digest(payload)
+
+
+def _payload(size: int) -> dict:
+    line = "naïve café — lorem ipsum dolor sit amet\n"
+    content = (line * (size // len(line) + 1))[:size]
+    return {"tool_name": "workspace.write_file", "args": {"path": "big.txt", "content": content}, "created_at": 0, "requested_by": "bench"}
+
+
+def measure(fn, payload: dict, repeat: int) -> tuple[float, float]:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(payload)
+        timings.append(time.perf_counter() - started)
+    tracemalloc.start()
+    fn(payload)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return min(timings) * 1000, peak / 1024
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="1024,65536,1048576,8388608")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    paths = {"legacy": legacy, "streaming": streaming}
+    if crypto.ORJSON_ENABLED:
+        paths["orjson"] = fast
+    print(f"{'bytes':>10} {'path':>10} {'ms':>10} {'peak KiB':>10}")
+    for size in (int(size) for size in args.sizes.split(",")):
+        payload = _payload(size)
+        assert len({fn(payload) for fn in paths.values()}) == 1
+        for name, fn in paths.items():
+            ms, peak = measure(fn, payload, args.repeat)
+            print(f"{size:>10} {name:>10} {ms:>10.3f} {peak:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
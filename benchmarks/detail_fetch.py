@@ -0,0 +1,66 @@
+"""Detail-fetch latency as the audit log grows.
+
+Run with ``python -m benchmarks.detail_fetch``. Each step bulk-loads unrelated
+audit rows and then times ``ActionService.get_action_detail`` for one action,
+clearing the detail cache before every call so each sample runs the queries;
+with the action_id indexes in place the latency should stay flat.
+"""
+import argparse
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from server.actions import ActionService
+from server.registry import RiskTier, Tool, ToolRegistry
+from server.storage import Storage
+from server.tools.workspace import WorkspacePolicy, WorkspaceTools, WriteFileArgs, write_file_preview
+
+
+def _fill_audit(storage: Storage, rows: int, start: int) -> None:
+    with storage.transaction() as conn:
+        conn.executemany(
+            "INSERT INTO audit_log(action_id,event_type,created_at,metadata_json) VALUES(?,?,?,?)",
+            ((f"noise-{(start + i) % 50000}", "ACTION_PROPOSED", 0, "{}") for i in range(rows)),
+        )
+
+
+def run(steps: list[int], samples: int) -> list[tuple[int, float, float]]:
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = Storage(str(Path(tmp) / "bench.db"))
+        registry = ToolRegistry()
+        tools = WorkspaceTools(WorkspacePolicy(str(Path(tmp) / "workspace")))
+        registry.register(Tool("workspace.write_file", "", WriteFileArgs, RiskTier.PRIVILEGED, write_file_preview, tools.write_file))
+        service = ActionService(storage, registry, action_ttl_seconds=300, approval_ttl_seconds=120)
+        action_id = service.create_proposed_action("workspace.write_file", {"path": "a.txt", "content": "x"}, "bench")["action_id"]
+
+        results = []
+        loaded = 0
+        for target in steps:
+            _fill_audit(storage, target - loaded, loaded)
+            loaded = target
+            timings = []
+            for _ in range(samples):
+                service.detail_cache.clear()
+                started = time.perf_counter()
+                service.get_action_detail(action_id)
+                timings.append((time.perf_counter() - started) * 1000)
+            timings.sort()
+            results.append((target, statistics.median(timings), timings[int(len(timings) * 0.95) - 1]))
+        storage.close()
+        return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--steps", default="1000,10000,100000,1000000")
+    parser.add_argument("--samples", type=int, default=200)
+    args = parser.parse_args()
+    steps = [int(step) for step in args.steps.split(",")]
+    print(f"{'audit rows':>12} {'p50 ms':>10} {'p95 ms':>10}")
+    for rows, p50, p95 in run(steps, args.samples):
+        print(f"{rows:>12} {p50:>10.3f} {p95:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
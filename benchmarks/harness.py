@@ -0,0 +1,81 @@
+"""Shared reporting and baseline comparison for the lifecycle and micro benchmarks.
+
+Results are ``{name: {"count", "p50_ms", "p95_ms", "p99_ms", "rps"}}``. A saved
+baseline is the same mapping as JSON; comparing flags any entry whose p95 grew,
+or whose throughput fell, by more than the tolerance.
+"""
+import argparse
+import json
+import math
+import time
+from pathlib import Path
+
+
+def percentile(ordered: list[float], q: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[max(0, math.ceil(q * len(ordered)) - 1)]
+
+
+def summarize(timings: list[float], elapsed: float) -> dict:
+    ordered = sorted(timings)
+    return {
+        "count": len(ordered),
+        "p50_ms": percentile(ordered, 0.50) * 1000,
+        "p95_ms": percentile(ordered, 0.95) * 1000,
+        "p99_ms": percentile(ordered, 0.99) * 1000,
+        "rps": len(ordered) / elapsed if elapsed > 0 else 0.0,
+    }
+
+
+def time_calls(fn, iterations: int) -> dict:
+    timings = []
+    started = time.perf_counter()
+    for _ in range(iterations):
+        call_started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - call_started)
+    return summarize(timings, time.perf_counter() - started)
+
+
+def report(results: dict[str, dict]) -> None:
+    width = max([len(name) for name in results] + [10])
+    print(f"{'name':<{width}} {'count':>8} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10} {'rps':>12}")
+    for name, row in results.items():
+        print(f"{name:<{width}} {row['count']:>8} {row['p50_ms']:>10.3f} {row['p95_ms']:>10.3f} {row['p99_ms']:>10.3f} {row['rps']:>12.1f}")
+
+
+def compare(results: dict[str, dict], baseline: dict[str, dict], tolerance: float) -> list[str]:
+    regressions = []
+    for name, row in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        if base["p95_ms"] > 0 and row["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {base['p95_ms']:.3f} -> {row['p95_ms']:.3f} ms")
+        if base["rps"] > 0 and row["rps"] < base["rps"] * (1 - tolerance):
+            regressions.append(f"{name}: rps {base['rps']:.1f} -> {row['rps']:.1f}")
+    return regressions
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--save-baseline", metavar="PATH", help="write results to a JSON baseline")
+    parser.add_argument("--compare", metavar="PATH", help="compare results with a saved baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative regression (default 0.25)")
+
+
+def finish(args: argparse.Namespace, results: dict[str, dict]) -> int:
+    report(results)
+    if args.save_baseline:
+        path = Path(args.save_baseline)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(results, indent=2, sort_keys=True) + "\n", encoding="utf-8")
+        print(f"baseline saved to {path}")
+    if args.compare:
+        regressions = compare(results, json.loads(Path(args.compare).read_text(encoding="utf-8")), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            return 1
+        print(f"no regressions beyond {args.tolerance:.0%}")
+    return 0
@@ -0,0 +1,96 @@
+"""Plan/approve/execute lifecycle load test.
+
+Run with ``python -m benchmarks.lifecycle``. Builds the same app as the test
+suite's ``app_client`` fixture (``FakeAIClient``, temporary SQLite database and
+workspace) and drives concurrent sessions, each repeatedly calling
+``POST /agent/plan``, ``POST /actions/approve``, ``POST /actions/execute`` and
+polling ``GET /actions/{id}`` until the action is ``EXECUTED``. Reports
+p50/p95/p99 latency and requests per second per endpoint and for whole
+lifecycles; ``--save-baseline`` / ``--compare`` track regressions.
+"""
+import argparse
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from benchmarks.harness import add_arguments, finish, summarize
+from server import main as app_main
+from server.ai.client import PlanOutput
+from server.ai.fake_client import FakeAIClient
+from server.registry import ToolCatalog
+from tests.conftest import make_app_client
+
+ENDPOINTS = ("plan", "approve", "execute", "detail", "lifecycle")
+
+
+class SessionFileAIClient(FakeAIClient):
+    # FakeAIClient always targets README.generated.md; proposals pin the file's
+    # sha256, so concurrent sessions would fail each other's writes.
+    def plan(self, goal: str, catalog: ToolCatalog) -> PlanOutput:
+        plan = super().plan(goal, catalog)
+        for action in plan.proposed_actions:
+            action.args["path"] = f"{goal.split()[-1]}.md"
+        return plan
+
+
+def _session(client, session_id: str, rounds: int, timings: dict[str, list[float]], lock: threading.Lock) -> None:
+    headers = {"X-Session-Id": session_id}
+    local = {name: [] for name in ENDPOINTS}
+
+    def call(name: str, method: str, url: str, **kwargs):
+        started = time.perf_counter()
+        response = client.request(method, url, headers=headers, **kwargs)
+        local[name].append(time.perf_counter() - started)
+        response.raise_for_status()
+        return response.json()
+
+    for i in range(rounds):
+        started = time.perf_counter()
+        plan = call("plan", "POST", "/agent/plan", json={"goal": f"write a readme for {session_id}-{i}"})
+        action_id = plan["actions"][0]["action_id"]
+        call("approve", "POST", "/actions/approve", json={"action_id": action_id})
+        call("execute", "POST", "/actions/execute", json={"action_id": action_id})
+        while call("detail", "GET", f"/actions/{action_id}")["status"] not in ("EXECUTED", "FAILED"):
+            time.sleep(0.001)
+        local["lifecycle"].append(time.perf_counter() - started)
+    with lock:
+        for name, values in local.items():
+            timings[name].extend(values)
+
+
+def run(sessions: int, rounds: int, workers: int) -> dict[str, dict]:
+    timings = {name: [] for name in ENDPOINTS}
+    lock = threading.Lock()
+    with tempfile.TemporaryDirectory() as tmp:
+        overrides = {
+            "action_ttl_seconds": 300,
+            "approval_ttl_seconds": 300,
+            "execution_workers": workers,
+            "execution_max_queued": max(100, sessions * 2),
+        }
+        with make_app_client(Path(tmp), **overrides) as (client, _, _):
+            app_main.planner.ai_client = SessionFileAIClient()
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=sessions) as pool:
+                futures = [pool.submit(_session, client, f"bench-{n}", rounds, timings, lock) for n in range(sessions)]
+                for future in futures:
+                    future.result()
+            elapsed = time.perf_counter() - started
+    return {name: summarize(values, elapsed) for name, values in timings.items()}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=8, help="concurrent sessions")
+    parser.add_argument("--rounds", type=int, default=25, help="lifecycles per session")
+    parser.add_argument("--workers", type=int, default=4, help="execution queue workers")
+    add_arguments(parser)
+    args = parser.parse_args()
+    return finish(args, run(args.sessions, args.rounds, args.workers))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,100 @@
+"""Microbenchmarks for storage, action hashing and the workspace tools.
+
+Run with ``python -m benchmarks.micro``. Times single calls against a
+temporary SQLite database and workspace and reports p50/p95/p99 latency and
+calls per second; ``--save-baseline`` / ``--compare`` track regressions.
+"""
+import argparse
+import itertools
+import sys
+import tempfile
+import uuid
+from pathlib import Path
+
+from benchmarks.harness import add_arguments, finish, time_calls
+from server.crypto import action_hash
+from server.storage import Storage
+from server.tools.search import SearchArgs, WorkspaceIndex
+from server.tools.workspace import ApplyPatchArgs, ReadFileArgs, WorkspacePolicy, WorkspaceTools, WriteFileArgs
+
+CONTENT = "".join(f"line {n}: lorem ipsum dolor sit amet\n" for n in range(200))
+
+
+def _row(n: int) -> dict:
+    return {
+        "action_id": str(uuid.uuid4()),
+        "tool_name": "workspace.write_file",
+        "args": {"path": f"f{n}.txt", "content": "x"},
+        "requested_by": "bench",
+        "created_at": n,
+        "expires_at": n + 300,
+        "action_hash": "0" * 64,
+        "status": "PROPOSED",
+    }
+
+
+def _storage_cases(storage: Storage) -> dict:
+    counter = itertools.count()
+    seeded = [_row(next(counter)) for _ in range(100)]
+    storage.create_actions(seeded)
+    action_id = seeded[0]["action_id"]
+
+    def propose():
+        row = _row(next(counter))
+        with storage.transaction():
+            storage.create_actions([row])
+            storage.add_audits([(row["action_id"], "ACTION_PROPOSED", row["created_at"], {})])
+
+    return {
+        "storage.propose": propose,
+        "storage.get_action": lambda: storage.get_action(action_id),
+        "storage.add_audit": lambda: storage.add_audit(action_id, "BENCH", 0, {}),
+        "storage.list_audit": lambda: storage.list_audit(action_id),
+    }
+
+
+def _hash_cases() -> dict:
+    small = {"tool_name": "workspace.read_file", "args": {"path": "a.txt"}, "created_at": 0, "requested_by": "bench"}
+    large = {**small, "args": {"path": "big.txt", "content": CONTENT * 16}}
+    return {
+        "crypto.action_hash small": lambda: action_hash(small),
+        "crypto.action_hash 130KiB": lambda: action_hash(large),
+    }
+
+
+def _workspace_cases(root: Path) -> dict:
+    tools = WorkspaceTools(WorkspacePolicy(str(root)))
+    (root / "src").mkdir(parents=True, exist_ok=True)
+    for n in range(200):
+        (root / "src" / f"m{n}.py").write_text(CONTENT.replace("lorem", f"token{n}"), encoding="utf-8")
+    index = WorkspaceIndex(tools.policy, rescan_interval_seconds=3600)
+    index.refresh(force=True)
+    edits = itertools.cycle([CONTENT, CONTENT.replace("line 100", "LINE 100")])
+    patch = ApplyPatchArgs(path="src/m0.py", edits=[{"start_line": 10, "end_line": 10, "content": "changed\n"}])
+    return {
+        "workspace.read_file": lambda: tools.read_file(ReadFileArgs(path="src/m1.py")),
+        "workspace.write_file": lambda: tools.write_file(WriteFileArgs(path="out.txt", content=next(edits))),
+        "workspace.apply_patch preview": lambda: tools.apply_patch_preview(patch),
+        "workspace.search": lambda: index.search(SearchArgs(query="token150")),
+    }
+
+
+def run(iterations: int) -> dict[str, dict]:
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = Storage(str(Path(tmp) / "bench.db"))
+        cases = {**_storage_cases(storage), **_hash_cases(), **_workspace_cases(Path(tmp) / "workspace")}
+        results = {name: time_calls(fn, iterations) for name, fn in cases.items()}
+        storage.close()
+    return results
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=500)
+    add_arguments(parser)
+    args = parser.parse_args()
+    return finish(args, run(args.iterations))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,65 @@
+"""Workspace index build, rescan and query latency.
+
+Run with ``python -m benchmarks.workspace_search``. Generates a synthetic
+workspace, then times the initial index build, a no-change mtime rescan and
+``workspace.search`` / ``workspace.list_tree`` queries against the warm index.
+"""
+import argparse
+import random
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from server.tools.search import ListTreeArgs, SearchArgs, WorkspaceIndex
+from server.tools.workspace import WorkspacePolicy
+
+WORDS = "alpha beta gamma delta epsilon zeta theta kappa lambda sigma omega handler request response config".split()
+
+
+def _populate(root: Path, files: int, lines: int) -> None:
+    rng = random.Random(7)
+    for i in range(files):
+        path = root / f"pkg{i % 50}" / f"mod{i // 50 % 20}" / f"file{i}.py"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        body = "\n".join(" ".join(rng.choice(WORDS) for _ in range(8)) for _ in range(lines))
+        path.write_text(f"# file {i} needle{i}\n{body}\n", encoding="utf-8")
+
+
+def _time(fn, samples: int) -> float:
+    timings = []
+    for _ in range(samples):
+        started = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=20000)
+    parser.add_argument("--lines", type=int, default=20)
+    parser.add_argument("--samples", type=int, default=50)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        _populate(root, args.files, args.lines)
+        index = WorkspaceIndex(WorkspacePolicy(tmp), rescan_interval_seconds=3600)
+        started = time.perf_counter()
+        index.refresh(force=True)
+        print(f"{'initial build':>24} {(time.perf_counter() - started) * 1000:>10.1f} ms")
+        print(f"{'no-change rescan':>24} {_time(lambda: index.refresh(force=True), 3):>10.1f} ms")
+        queries = {
+            "rare token": SearchArgs(query=f"needle{args.files // 2}"),
+            "common token": SearchArgs(query="lambda sigma", max_results=50),
+            "no match": SearchArgs(query="zzzqqq"),
+            "2-char no match": SearchArgs(query="qj"),
+        }
+        for name, query in queries.items():
+            print(f"{'search ' + name:>24} {_time(lambda: index.search(query), args.samples):>10.3f} ms")
+        tree = ListTreeArgs(path="pkg7", max_entries=500)
+        print(f"{'list_tree subdir':>24} {_time(lambda: index.list_tree(tree), args.samples):>10.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,35 @@
+import asyncio
 import json
+import logging
 import time
 import uuid
+from contextlib import contextmanager
 from dataclasses import dataclass
+from typing import Callable
 
+from pydantic import BaseModel, ValidationError
+
+from .blobs import BLOB_KEY, BlobStore
+from .cache import TTLCache
 from .crypto import action_hash, canonical_json
-from .registry import RiskTier, ToolRegistry
-from .storage import Storage
+from .metrics import ACTION_TRANSITIONS, TOOL_EXECUTE_SECONDS, TOOL_PREVIEW_SECONDS
+from .registry import RiskTier, Tool, ToolRegistry
+from .storage import AsyncStorage, StorageBackend
+from .streams import EventBus
+
+logger = logging.getLogger(__name__)
 
 PROPOSED = "PROPOSED"
 APPROVED = "APPROVED"
 EXECUTED = "EXECUTED"
 EXPIRED = "EXPIRED"
 REJECTED = "REJECTED"
+RUNNING = "RUNNING"
+FAILED = "FAILED"
+TERMINAL_STATUSES = [EXECUTED, EXPIRED, REJECTED, FAILED]
+
+for _status in (PROPOSED, APPROVED, RUNNING, *TERMINAL_STATUSES):
+    ACTION_TRANSITIONS.labels(_status)
 
 
 class ActionError(Exception):
@@ -21,58 +39,229 @@ class ActionError(Exception):
         self.detail = detail
 
 
+def batch_item(action_id: str, outcome: dict | ActionError) -> dict:
+    if isinstance(outcome, ActionError):
+        return {"action_id": action_id, "ok": False, "status_code": outcome.status_code, "error": outcome.detail}
+    return {"action_id": action_id, "ok": True, "action": outcome}
+
+
+def _observe_execution(tool: Tool, outcome: str, started: float) -> None:
+    TOOL_EXECUTE_SECONDS.labels(tool.name, outcome).observe(time.perf_counter() - started)
+
+
+@dataclass
+class PreparedExecution:
+    action_id: str
+    tool: Tool
+    args: BaseModel
+    approval: dict | None
+    now: int
+    session_id: str
+
+
 @dataclass
 class ActionService:
-    storage: Storage
+    storage: StorageBackend
     registry: ToolRegistry
     action_ttl_seconds: int
     approval_ttl_seconds: int
+    async_storage: AsyncStorage | None = None
+    detail_cache: TTLCache | None = None
+    blobs: BlobStore | None = None
+    events: EventBus | None = None
+    # While RUNNING, expires_at is the execution deadline; past it the action
+    # is assumed lost with its worker and is failed by the sweeper.
+    execution_timeout_seconds: int = 900
+
+    def __post_init__(self) -> None:
+        if self.async_storage is None:
+            self.async_storage = AsyncStorage(self.storage)
+        if self.detail_cache is None:
+            self.detail_cache = TTLCache()
 
     def _now(self) -> int:
         return int(time.time())
 
+    def _externalize(self, value):
+        return self.blobs.externalize(value) if self.blobs else value
+
+    def resolve_blobs(self, value):
+        return self.blobs.resolve(value) if self.blobs else value
+
     def _expire_if_needed(self, action: dict, phase: str) -> dict:
         now = self._now()
-        if action["status"] in {EXECUTED, EXPIRED, REJECTED}:
+        if action["status"] in {RUNNING, *TERMINAL_STATUSES}:
             return action
         if now > action["expires_at"]:
-            self.storage.update_action(action["action_id"], status=EXPIRED)
-            self.storage.add_audit(action["action_id"], "ACTION_EXPIRED", now, {"phase": phase})
+            self._mark_expired(action, now, phase)
             action["status"] = EXPIRED
         return action
 
+    @contextmanager
+    def _transition(self, action_id: str, status: str):
+        try:
+            with self.storage.transaction():
+                yield
+        finally:
+            self.detail_cache.invalidate(action_id)
+        ACTION_TRANSITIONS.labels(status).inc()
+
+    def _publish(self, session_id: str, action_id: str, status: str, event_type: str, now: int, metadata: dict, **fields) -> None:
+        # Compact delta: the new status, any changed fields and the audit entry
+        # written with the transition, instead of a re-rendered detail.
+        if self.events is None:
+            return
+        audit = {"event_type": event_type, "created_at": now, "metadata_json": json.dumps(metadata)}
+        self.events.publish(session_id, "action", {"action_id": action_id, "status": status, **fields, "audit": audit})
+
+    def _claim(self, action_id: str, expected: str, status: str, **fields) -> None:
+        # Checks made before the write can race with another worker process;
+        # the conditional update is what actually decides the winner.
+        if not self.storage.claim_action(action_id, expected, status, **fields):
+            raise ActionError(409, "Action was modified concurrently")
+
+    def _mark_expired(self, action: dict, now: int, phase: str) -> None:
+        action_id = action["action_id"]
+        with self._transition(action_id, EXPIRED):
+            self._claim(action_id, action["status"], EXPIRED)
+            self.storage.add_audit(action_id, "ACTION_EXPIRED", now, {"phase": phase})
+        self._publish(action["requested_by"], action_id, EXPIRED, "ACTION_EXPIRED", now, {"phase": phase})
+
+    def sweep_expired(self, limit: int = 500) -> list[str]:
+        now = self._now()
+        with self.storage.transaction():
+            action_ids = self.storage.find_actions_due([PROPOSED, APPROVED], now, limit)
+            self.storage.set_status(action_ids, EXPIRED)
+            self.storage.add_audits([(action_id, "ACTION_EXPIRED", now, {"phase": "sweeper"}) for action_id in action_ids])
+        for action_id in action_ids:
+            self.detail_cache.invalidate(action_id)
+        ACTION_TRANSITIONS.labels(EXPIRED).inc(len(action_ids))
+        self._publish_many(action_ids, EXPIRED, "ACTION_EXPIRED", now, {"phase": "sweeper"})
+        return action_ids
+
+    def recover_stale_running(self, limit: int = 500) -> list[str]:
+        # Executions whose worker crashed or restarted never finish; failing
+        # them once the deadline passes records the outcome and releases them.
+        now = self._now()
+        error = {"error": "Execution did not finish before its deadline; the worker was likely lost"}
+        with self.storage.transaction():
+            action_ids = self.storage.find_actions_due([RUNNING], now, limit)
+            self.storage.set_status(action_ids, FAILED)
+            for action_id in action_ids:
+                self.storage.save_tool_result(action_id, error, now)
+            self.storage.add_audits([(action_id, "ACTION_FAILED", now, {**error, "phase": "recovery"}) for action_id in action_ids])
+        for action_id in action_ids:
+            self.detail_cache.invalidate(action_id)
+        ACTION_TRANSITIONS.labels(FAILED).inc(len(action_ids))
+        self._publish_many(action_ids, FAILED, "ACTION_FAILED", now, {**error, "phase": "recovery"}, result=error)
+        return action_ids
+
+    def _publish_many(self, action_ids: list[str], status: str, event_type: str, now: int, metadata: dict, **fields) -> None:
+        if self.events is None or not self.events.has_subscribers():
+            return
+        for action_id in action_ids:
+            action = self.storage.get_action(action_id)
+            if action:
+                self._publish(action["requested_by"], action_id, status, event_type, now, metadata, **fields)
+
+    def purge_terminal(self, before: int, limit: int, archive: Callable[[list[dict]], None]) -> int:
+        with self.storage.transaction():
+            action_ids = self.storage.find_actions_due(TERMINAL_STATUSES, before, limit)
+            if not action_ids:
+                return 0
+            # The archive is written before the delete commits, so a failed
+            # write rolls the purge back instead of losing rows.
+            archive(self.storage.export_actions(action_ids))
+            self.storage.delete_actions(action_ids)
+        for action_id in action_ids:
+            self.detail_cache.invalidate(action_id)
+        return len(action_ids)
+
     def _canonical_payload(self, tool_name: str, args: dict, created_at: int, requested_by: str) -> dict:
         return {
             "tool_name": tool_name,
-            "args": json.loads(canonical_json(args)),
+            "args": args,
             "created_at": created_at,
             "requested_by": requested_by,
         }
 
-    def create_proposed_action(self, tool_name: str, args: dict, requested_by: str) -> dict:
+    def _validate_proposal(self, tool_name: str, args: dict) -> tuple[Tool, BaseModel]:
         tool = self.registry.get(tool_name)
         if not tool:
             raise ActionError(400, f"Unknown tool: {tool_name}")
-        parsed_args = tool.input_schema.model_validate(args)
+        codec = self.registry.codec(tool_name)
+        if isinstance(args, dict) and (unknown := sorted(set(args) - codec.fields)):
+            raise ActionError(400, f"Invalid args for {tool_name}: unknown fields {', '.join(unknown)}")
+        try:
+            parsed_args = codec.validate(args)
+        except ValidationError as exc:
+            errors = "; ".join(f"{'.'.join(str(part) for part in err['loc']) or 'args'}: {err['msg']}" for err in exc.errors())
+            raise ActionError(400, f"Invalid args for {tool_name}: {errors}") from exc
+        if tool.prepare:
+            try:
+                parsed_args = tool.prepare(parsed_args)
+            except ValueError as exc:
+                raise ActionError(400, f"Invalid args for {tool_name}: {exc}") from exc
+        return tool, parsed_args
+
+    def create_proposed_action(self, tool_name: str, args: dict, requested_by: str) -> dict:
+        return self.create_proposed_actions([(tool_name, args)], requested_by)[0]
+
+    def create_proposed_actions(self, proposals: list[tuple[str, dict]], requested_by: str) -> list[dict]:
+        validated = [self._validate_proposal(tool_name, args) for tool_name, args in proposals]
         now = self._now()
-        payload = self._canonical_payload(tool_name, parsed_args.model_dump(), now, requested_by)
-        digest = action_hash(payload)
-        action_id = str(uuid.uuid4())
         expires_at = now + self.action_ttl_seconds
-        self.storage.create_action(
-            {
-                "action_id": action_id,
-                "tool_name": tool_name,
-                "args": parsed_args.model_dump(),
+        rows = []
+        audits = []
+        for tool, parsed_args in validated:
+            # JSON-mode dump is already canonical-safe, so it is hashed and
+            # stored as is. Large strings become blob references first; the
+            # reference carries the content digest, so the hash still binds it.
+            args = self._externalize(self.registry.codec(tool.name).dump(parsed_args))
+            digest = action_hash(self._canonical_payload(tool.name, args, now, requested_by))
+            row = {
+                "action_id": str(uuid.uuid4()),
+                "tool_name": tool.name,
+                "args": args,
+                "args_json": canonical_json(args),
                 "requested_by": requested_by,
                 "created_at": now,
                 "expires_at": expires_at,
                 "action_hash": digest,
                 "status": PROPOSED,
             }
-        )
-        self.storage.add_audit(action_id, "ACTION_PROPOSED", now, {"tool_name": tool_name, "action_hash": digest})
-        return self.get_action_detail(action_id)
+            rows.append(row)
+            audits.append((row["action_id"], "ACTION_PROPOSED", now, {"tool_name": tool.name, "action_hash": digest}))
+
+        version = self.detail_cache.version
+        with self.storage.transaction():
+            self.storage.create_actions(rows)
+            audit_ids = self.storage.add_audits(audits)
+        ACTION_TRANSITIONS.labels(PROPOSED).inc(len(rows))
+        for row, audit in zip(rows, audits):
+            self._publish(requested_by, row["action_id"], PROPOSED, *audit[1:], tool_name=row["tool_name"], expires_at=row["expires_at"])
+
+        details = []
+        for row, (tool, parsed_args), audit_id, audit in zip(rows, validated, audit_ids, audits):
+            detail = self._build_detail(
+                {**row, "approval_expires_at": None},
+                tool,
+                row["args"],
+                parsed_args,
+                None,
+                [
+                    {
+                        "id": audit_id,
+                        "action_id": row["action_id"],
+                        "event_type": audit[1],
+                        "created_at": audit[2],
+                        "metadata_json": json.dumps(audit[3]),
+                    }
+                ],
+            )
+            self.detail_cache.put(row["action_id"], detail, version)
+            details.append(detail)
+        return details
 
     def approve(self, action_id: str) -> dict:
         action = self.storage.get_action(action_id)
@@ -83,19 +272,48 @@ class ActionService:
             raise ActionError(400, "Action must be PROPOSED")
         now = self._now()
         approval_expires_at = now + self.approval_ttl_seconds
-        self.storage.create_approval(
-            {
-                "action_id": action_id,
-                "action_hash": action["action_hash"],
-                "approved_at": now,
-                "expires_at": approval_expires_at,
-            }
+        with self._transition(action_id, APPROVED):
+            self._claim(action_id, PROPOSED, APPROVED, approval_expires_at=approval_expires_at)
+            self.storage.create_approval(
+                {
+                    "action_id": action_id,
+                    "action_hash": action["action_hash"],
+                    "approved_at": now,
+                    "expires_at": approval_expires_at,
+                }
+            )
+            self.storage.add_audit(action_id, "ACTION_APPROVED", now, {"approval_expires_at": approval_expires_at})
+        self._publish(
+            action["requested_by"],
+            action_id,
+            APPROVED,
+            "ACTION_APPROVED",
+            now,
+            {"approval_expires_at": approval_expires_at},
+            approval_expires_at=approval_expires_at,
         )
-        self.storage.update_action(action_id, status=APPROVED, approval_expires_at=approval_expires_at)
-        self.storage.add_audit(action_id, "ACTION_APPROVED", now, {"approval_expires_at": approval_expires_at})
         return self.get_action_detail(action_id)
 
-    def execute(self, action_id: str) -> dict:
+    def _run_batch(self, fn: Callable[[str], object], action_ids: list[str]) -> list:
+        outcomes = []
+        try:
+            with self.storage.transaction():
+                for action_id in action_ids:
+                    try:
+                        outcomes.append(fn(action_id))
+                    except ActionError as exc:
+                        outcomes.append(exc)
+        finally:
+            # Per-item invalidations ran before the shared commit.
+            for action_id in action_ids:
+                self.detail_cache.invalidate(action_id)
+        return outcomes
+
+    def approve_many(self, action_ids: list[str]) -> list[dict]:
+        outcomes = self._run_batch(self.approve, action_ids)
+        return [batch_item(action_id, outcome) for action_id, outcome in zip(action_ids, outcomes)]
+
+    def _prepare_execution(self, action_id: str) -> PreparedExecution:
         action = self.storage.get_action(action_id)
         if not action:
             raise ActionError(404, "Action not found")
@@ -105,6 +323,7 @@ class ActionService:
         if not tool:
             raise ActionError(500, "Tool missing from registry")
 
+        approval = None
         if tool.risk_tier == RiskTier.PRIVILEGED:
             if action["status"] != APPROVED:
                 raise ActionError(400, "Action must be APPROVED")
@@ -116,41 +335,183 @@ class ActionService:
             if approval["action_hash"] != action["action_hash"]:
                 raise ActionError(400, "Approval hash mismatch")
             if now > approval["expires_at"]:
-                self.storage.update_action(action_id, status=EXPIRED)
-                self.storage.add_audit(action_id, "ACTION_EXPIRED", now, {"phase": "approval_expired"})
+                self._mark_expired(action, now, "approval_expired")
                 raise ActionError(400, "Approval expired")
         else:
             if action["status"] != PROPOSED:
                 raise ActionError(400, "Safe actions must be PROPOSED")
 
-        if not tool:
-            raise ActionError(500, "Tool missing from registry")
-        parsed_args = tool.input_schema.model_validate(json.loads(action["args_json"]))
+        # Execution is the trust boundary, so stored args are re-validated, but
+        # straight from JSON in one pass unless blobs need resolving first.
+        codec = self.registry.codec(tool.name)
+        if BLOB_KEY in action["args_json"]:
+            try:
+                args = self.resolve_blobs(json.loads(action["args_json"]))
+            except ValueError as exc:
+                raise ActionError(409, f"Action args unavailable: {exc}") from exc
+            parsed_args = codec.validate(args)
+        else:
+            parsed_args = codec.validate_json(action["args_json"])
+        return PreparedExecution(action_id, tool, parsed_args, approval, now, action["requested_by"])
 
-        result = tool.execute(parsed_args)
-        if tool.risk_tier == RiskTier.PRIVILEGED:
-            self.storage.mark_approval_used(approval["id"])
-        self.storage.update_action(action_id, status=EXECUTED)
-        self.storage.save_tool_result(action_id, result, now)
-        self.storage.add_audit(action_id, "ACTION_EXECUTED", now, {"result": result})
+    def begin_execution(self, action_id: str) -> PreparedExecution:
+        return self._start_execution(self._prepare_execution(action_id))
+
+    def _start_execution(self, prepared: PreparedExecution) -> PreparedExecution:
+        action_id = prepared.action_id
+        deadline = prepared.now + self.execution_timeout_seconds
+        with self._transition(action_id, RUNNING):
+            self._claim(action_id, APPROVED if prepared.approval else PROPOSED, RUNNING, expires_at=deadline)
+            if prepared.approval and not self.storage.mark_approval_used(prepared.approval["id"]):
+                raise ActionError(409, "Approval already used")
+            self.storage.add_audit(action_id, "ACTION_RUNNING", prepared.now, {"tool_name": prepared.tool.name})
+        self._publish(
+            prepared.session_id, action_id, RUNNING, "ACTION_RUNNING", prepared.now, {"tool_name": prepared.tool.name}, expires_at=deadline
+        )
+        return prepared
+
+    def begin_executions(self, action_ids: list[str]) -> list[PreparedExecution | ActionError]:
+        return self._run_batch(self.begin_execution, action_ids)
+
+    def prepare_executions(self, action_ids: list[str]) -> list[PreparedExecution | ActionError]:
+        return self._run_batch(self._prepare_execution, action_ids)
+
+    def skip_execution(self, prepared: PreparedExecution, reason: str) -> None:
+        # The action was never claimed, so it keeps its status and approval.
+        action_id = prepared.action_id
+        now = self._now()
+        status = APPROVED if prepared.approval else PROPOSED
+        self.storage.add_audit(action_id, "ACTION_SKIPPED", now, {"reason": reason})
+        self.detail_cache.invalidate(action_id)
+        self._publish(prepared.session_id, action_id, status, "ACTION_SKIPPED", now, {"reason": reason})
+
+    def _extend_deadline(self, prepared: PreparedExecution) -> None:
+        # Runs once the job has its worker slot, so time spent queued does not
+        # count against the execution deadline. Losing the claim means the
+        # sweeper already failed the action, and the tool must not run.
+        deadline = self._now() + self.execution_timeout_seconds
+        try:
+            self._claim(prepared.action_id, RUNNING, RUNNING, expires_at=deadline)
+        finally:
+            self.detail_cache.invalidate(prepared.action_id)
+
+    def _complete_execution(self, prepared: PreparedExecution, result: dict) -> dict:
+        action_id = prepared.action_id
+        now = self._now()
+        result = self._externalize(result)
+        # Leaving RUNNING is a compare-and-set as well: if the sweeper (on any
+        # worker) failed the action meanwhile, the late result is dropped.
+        with self._transition(action_id, EXECUTED):
+            self._claim(action_id, RUNNING, EXECUTED)
+            self.storage.save_tool_result(action_id, result, now)
+            self.storage.add_audit(action_id, "ACTION_EXECUTED", now, {"result": result})
+        self._publish(prepared.session_id, action_id, EXECUTED, "ACTION_EXECUTED", now, {"result": result}, result=result)
         return {"action": self.get_action_detail(action_id), "result": result}
 
+    def fail_execution(self, prepared: PreparedExecution, error: Exception) -> None:
+        action_id = prepared.action_id
+        now = self._now()
+        try:
+            with self._transition(action_id, FAILED):
+                self._claim(action_id, RUNNING, FAILED)
+                self.storage.save_tool_result(action_id, {"error": str(error)}, now)
+                self.storage.add_audit(action_id, "ACTION_FAILED", now, {"error": str(error)})
+        except ActionError:
+            logger.warning("Dropped failure of action %s: it is no longer RUNNING", action_id)
+            return
+        self._publish(prepared.session_id, action_id, FAILED, "ACTION_FAILED", now, {"error": str(error)}, result={"error": str(error)})
+
+    def execute(self, action_id: str) -> dict:
+        prepared = self.begin_execution(action_id)
+        started = time.perf_counter()
+        try:
+            result = prepared.tool.execute(prepared.args)
+        except Exception as exc:
+            _observe_execution(prepared.tool, "error", started)
+            self.fail_execution(prepared, exc)
+            raise
+        _observe_execution(prepared.tool, "ok", started)
+        return self._complete_execution(prepared, result)
+
+    async def run_execution(self, prepared: PreparedExecution, on_output: Callable[[str, str], None] | None = None) -> dict:
+        await self.async_storage.run(self._extend_deadline, prepared)
+        started = time.perf_counter()
+        try:
+            if on_output and prepared.tool.stream:
+                result = await prepared.tool.stream(prepared.args, on_output)
+            elif prepared.tool.execute_async:
+                result = await prepared.tool.execute_async(prepared.args)
+            else:
+                result = await asyncio.to_thread(prepared.tool.execute, prepared.args)
+        except Exception as exc:
+            _observe_execution(prepared.tool, "error", started)
+            await self.async_storage.run(self.fail_execution, prepared, exc)
+            raise
+        _observe_execution(prepared.tool, "ok", started)
+        return await self.async_storage.run(self._complete_execution, prepared, result)
+
+    async def execute_async(self, action_id: str) -> dict:
+        prepared = await self.async_storage.run(self.begin_execution, action_id)
+        return await self.run_execution(prepared)
+
+    async def approve_async(self, action_id: str) -> dict:
+        return await self.async_storage.run(self.approve, action_id)
+
+    async def approve_many_async(self, action_ids: list[str]) -> list[dict]:
+        return await self.async_storage.run(self.approve_many, action_ids)
+
+    async def get_action_detail_async(self, action_id: str) -> dict:
+        cached = self.detail_cache.get(action_id)
+        if cached is not None:
+            return cached
+        return await self.async_storage.run(self._load_action_detail, action_id)
+
     def get_action_detail(self, action_id: str) -> dict:
+        cached = self.detail_cache.get(action_id)
+        if cached is not None:
+            return cached
+        return self._load_action_detail(action_id)
+
+    def _load_action_detail(self, action_id: str) -> dict:
+        version = self.detail_cache.version
+        detail = self._render_action_detail(action_id)
+        self.detail_cache.put(action_id, detail, version)
+        return detail
+
+    def _render_action_detail(self, action_id: str) -> dict:
         action = self.storage.get_action(action_id)
         if not action:
             raise ActionError(404, "Action not found")
         tool = self.registry.get(action["tool_name"])
-        parsed_args = json.loads(action["args_json"])
-        preview = tool.preview(tool.input_schema.model_validate(parsed_args)) if tool else ""
+        args = json.loads(action["args_json"])
+        parsed_args = None
+        if tool:
+            full_args = self.resolve_blobs(args) if BLOB_KEY in action["args_json"] else args
+            parsed_args = self.registry.codec(tool.name).trusted(full_args)
+        return self._build_detail(
+            action,
+            tool,
+            args,
+            parsed_args,
+            self.storage.get_latest_tool_result(action_id),
+            self.storage.list_audit(action_id),
+        )
+
+    def _build_detail(self, action: dict, tool: Tool | None, args: dict, parsed_args: BaseModel | None, result, audit: list[dict]) -> dict:
+        preview = ""
+        if tool:
+            with TOOL_PREVIEW_SECONDS.labels(tool.name).time():
+                preview = tool.preview(parsed_args)
         return {
             "action_id": action["action_id"],
             "tool_name": action["tool_name"],
-            "args": parsed_args,
+            "args": args,
             "status": action["status"],
             "expires_at": action["expires_at"],
             "approval_expires_at": action["approval_expires_at"],
             "action_hash": action["action_hash"],
             "preview": preview,
             "risk_tier": tool.risk_tier.value if tool else None,
-            "audit": self.storage.list_audit(action_id),
+            "result": result,
+            "audit": audit,
         }
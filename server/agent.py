@@ -1,20 +1,108 @@
 from dataclasses import dataclass
+from typing import AsyncIterator
 
-from .actions import ActionService
-from .ai.client import AIClient
+from .actions import ActionError, ActionService
+from .ai.client import AIClient, PlanOutput, ProposedAction
+from .metrics import PLANNER_SECONDS, timed_async_iterator, timed_async_method, timed_method
+from .plan_cache import PlanCache
+
+
+def _retry_goal(goal: str, error: str | None) -> str:
+    if error is None:
+        return goal
+    return f"{goal}\n\nYour previous plan was rejected: {error}\nReturn a corrected plan."
 
 
 @dataclass
 class AgentPlanner:
     ai_client: AIClient
     actions: ActionService
+    plan_cache: PlanCache | None = None
+    repair_rounds: int = 0
+
+    @timed_method(PLANNER_SECONDS, "plan")
+    def plan(self, goal: str, session_id: str, use_cache: bool = True) -> dict:
+        catalog = self.actions.registry.catalog()
+        cache_key = self.plan_cache.key(goal, catalog.version) if self.plan_cache else None
+        ai_plan = self.plan_cache.get(cache_key) if cache_key and use_cache else None
+        if ai_plan is not None:
+            return self._materialize(ai_plan, session_id)
+        error = None
+        for attempt in range(self.repair_rounds + 1):
+            ai_plan = self.ai_client.plan(_retry_goal(goal, error), catalog)
+            try:
+                return self._materialize(ai_plan, session_id, cache_key)
+            except ActionError as exc:
+                if attempt == self.repair_rounds or exc.status_code != 400:
+                    raise
+                error = exc.detail
+
+    @timed_async_method(PLANNER_SECONDS, "plan_async")
+    async def plan_async(self, goal: str, session_id: str, use_cache: bool = True) -> dict:
+        catalog = self.actions.registry.catalog()
+        cache_key = self.plan_cache.key(goal, catalog.version) if self.plan_cache else None
+        if cache_key and use_cache:
+            ai_plan = await self.actions.async_storage.run(self.plan_cache.get, cache_key)
+            if ai_plan is not None:
+                return await self.actions.async_storage.run(self._materialize, ai_plan, session_id)
+        error = None
+        for attempt in range(self.repair_rounds + 1):
+            ai_plan = await self.ai_client.plan_async(_retry_goal(goal, error), catalog)
+            try:
+                return await self.actions.async_storage.run(self._materialize, ai_plan, session_id, cache_key)
+            except ActionError as exc:
+                if attempt == self.repair_rounds or exc.status_code != 400:
+                    raise
+                error = exc.detail
+
+    def _repair(self, proposed: ProposedAction) -> ProposedAction:
+        tool_name, args = self.actions.registry.repair(proposed.tool_name, proposed.args)
+        return ProposedAction(tool_name=tool_name, args=args)
 
-    def plan(self, goal: str, session_id: str) -> dict:
-        ai_plan = self.ai_client.plan(goal, self.actions.registry.names())
-        created_actions = []
-        for proposed in ai_plan.proposed_actions:
-            created_actions.append(self.actions.create_proposed_action(proposed.tool_name, proposed.args, session_id))
+    def _materialize(self, ai_plan: PlanOutput, session_id: str, cache_key: str | None = None) -> dict:
+        ai_plan = PlanOutput(ai_plan.plan_summary, [self._repair(proposed) for proposed in ai_plan.proposed_actions])
+        proposals = [(proposed.tool_name, proposed.args) for proposed in ai_plan.proposed_actions]
+        created = self.actions.create_proposed_actions(proposals, session_id)
+        # Only plans that passed validation are cached, in their repaired form.
+        if cache_key:
+            self.plan_cache.put(cache_key, ai_plan)
         return {
             "plan_summary": ai_plan.plan_summary,
-            "actions": created_actions,
+            "actions": created,
         }
+
+    @timed_async_iterator(PLANNER_SECONDS, "plan_stream")
+    async def plan_stream(self, goal: str, session_id: str, use_cache: bool = True) -> AsyncIterator[tuple[str, dict]]:
+        catalog = self.actions.registry.catalog()
+        cache_key = self.plan_cache.key(goal, catalog.version) if self.plan_cache else None
+        source = None
+        if cache_key and use_cache:
+            cached = await self.actions.async_storage.run(self.plan_cache.get, cache_key)
+            if cached is not None:
+                source = _replay(cached)
+                cache_key = None
+        if source is None:
+            source = self.ai_client.plan_stream(goal, catalog)
+
+        async for item in source:
+            if isinstance(item, ProposedAction):
+                item = self._repair(item)
+                try:
+                    (detail,) = await self.actions.async_storage.run(
+                        self.actions.create_proposed_actions, [(item.tool_name, item.args)], session_id
+                    )
+                except ActionError as exc:
+                    yield "error", {"status_code": exc.status_code, "detail": exc.detail}
+                    return
+                yield "action", detail
+            else:
+                if cache_key:
+                    repaired = PlanOutput(item.plan_summary, [self._repair(proposed) for proposed in item.proposed_actions])
+                    await self.actions.async_storage.run(self.plan_cache.put, cache_key, repaired)
+                yield "summary", {"plan_summary": item.plan_summary}
+
+
+async def _replay(plan: PlanOutput) -> AsyncIterator[ProposedAction | PlanOutput]:
+    for action in plan.proposed_actions:
+        yield action
+    yield plan
@@ -1,5 +1,8 @@
+import asyncio
 from dataclasses import dataclass
-from typing import Protocol
+from typing import AsyncIterator, Protocol
+
+from ..registry import ToolCatalog
 
 
 @dataclass
@@ -15,5 +18,15 @@ class PlanOutput:
 
 
 class AIClient(Protocol):
-    def plan(self, goal: str, tool_names: list[str]) -> PlanOutput:
+    def plan(self, goal: str, catalog: ToolCatalog) -> PlanOutput:
         ...
+
+    async def plan_async(self, goal: str, catalog: ToolCatalog) -> PlanOutput:
+        return await asyncio.to_thread(self.plan, goal, catalog)
+
+    async def plan_stream(self, goal: str, catalog: ToolCatalog) -> AsyncIterator[ProposedAction | PlanOutput]:
+        # Yields each ProposedAction as soon as it is known, then the full PlanOutput.
+        plan = await self.plan_async(goal, catalog)
+        for action in plan.proposed_actions:
+            yield action
+        yield plan
@@ -1,8 +1,9 @@
+from ..registry import ToolCatalog
 from .client import AIClient, PlanOutput, ProposedAction
 
 
 class FakeAIClient(AIClient):
-    def plan(self, goal: str, tool_names: list[str]) -> PlanOutput:
+    def plan(self, goal: str, catalog: ToolCatalog) -> PlanOutput:
         lowered = goal.lower()
         if "readme" in lowered:
             action = ProposedAction(
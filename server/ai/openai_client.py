@@ -1,22 +1,64 @@
 import json
+from typing import AsyncIterator
 
+from ..metrics import AI_CLIENT_SECONDS, timed_async_iterator, timed_async_method, timed_method
+from ..registry import ToolCatalog
 from .client import AIClient, PlanOutput, ProposedAction
+from .streaming import PlanStreamParser
+from .transport import PlannerTransport
 
 
-class OpenAIClient(AIClient):
-    def __init__(self, api_key: str, model: str = "gpt-4o-mini"):
-        from openai import OpenAI
+INSTRUCTIONS = (
+    "You are a planner. Return strict JSON with keys plan_summary and proposed_actions. "
+    "proposed_actions is a list of {tool_name, args}; args must match the tool's args JSON schema. "
+    "Only use the tools in this catalog:\n"
+)
+
+
+def _output_text(body: dict) -> str:
+    if isinstance(body.get("output_text"), str):
+        return body["output_text"]
+    parts = []
+    for item in body.get("output", []):
+        for content in item.get("content", []) or []:
+            if content.get("type") == "output_text":
+                parts.append(content.get("text", ""))
+    return "".join(parts)
 
-        self.client = OpenAI(api_key=api_key)
+
+class OpenAIClient(AIClient):
+    def __init__(self, api_key: str, model: str = "gpt-4o-mini", transport: PlannerTransport | None = None):
+        self.transport = transport or PlannerTransport(api_key)
         self.model = model
 
-    def plan(self, goal: str, tool_names: list[str]) -> PlanOutput:
-        prompt = (
-            "You are a planner. Return strict JSON with keys plan_summary and proposed_actions. "
-            "proposed_actions is a list of {tool_name, args}. Only use these tools: "
-            f"{', '.join(tool_names)}. Goal: {goal}"
-        )
-        response = self.client.responses.create(model=self.model, input=prompt)
-        parsed = json.loads(response.output_text)
+    def _request(self, goal: str, catalog: ToolCatalog, stream: bool = False) -> dict:
+        # Instructions and catalog come first and only change with the tool set,
+        # so they form a stable prefix for provider-side prompt caching.
+        request = {"model": self.model, "instructions": INSTRUCTIONS + catalog.prompt, "input": f"Goal: {goal}"}
+        if stream:
+            request["stream"] = True
+        return request
+
+    def _parse(self, output_text: str) -> PlanOutput:
+        parsed = json.loads(output_text)
         actions = [ProposedAction(tool_name=a["tool_name"], args=a.get("args", {})) for a in parsed.get("proposed_actions", [])]
         return PlanOutput(plan_summary=parsed.get("plan_summary", ""), proposed_actions=actions)
+
+    @timed_method(AI_CLIENT_SECONDS, "plan")
+    def plan(self, goal: str, catalog: ToolCatalog) -> PlanOutput:
+        body = self.transport.post_json("/responses", self._request(goal, catalog))
+        return self._parse(_output_text(body))
+
+    @timed_async_method(AI_CLIENT_SECONDS, "plan_async")
+    async def plan_async(self, goal: str, catalog: ToolCatalog) -> PlanOutput:
+        body = await self.transport.post_json_async("/responses", self._request(goal, catalog))
+        return self._parse(_output_text(body))
+
+    @timed_async_iterator(AI_CLIENT_SECONDS, "plan_stream")
+    async def plan_stream(self, goal: str, catalog: ToolCatalog) -> AsyncIterator[ProposedAction | PlanOutput]:
+        parser = PlanStreamParser()
+        async for event, data in self.transport.stream_events("/responses", self._request(goal, catalog, stream=True)):
+            if event == "response.output_text.delta":
+                for action in parser.feed(data.get("delta", "")):
+                    yield action
+        yield PlanOutput(plan_summary=parser.plan_summary or "", proposed_actions=parser.actions)
@@ -0,0 +1,86 @@
+import json
+
+from .client import ProposedAction
+
+
+# Incremental scanner for planner output of the form
+# {"plan_summary": "...", "proposed_actions": [{...}, {...}]}. It emits each
+# proposed action as soon as its object closes, long before the full JSON
+# document has arrived. Anything before the first "{" (e.g. a code fence) is
+# ignored.
+class PlanStreamParser:
+    def __init__(self) -> None:
+        self.text = ""
+        self.plan_summary: str | None = None
+        self.actions: list[ProposedAction] = []
+        self._pos = 0
+        self._stack: list[str] = []
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._last_string: str | None = None
+        self._key: str | None = None
+        self._expect_value = False
+        self._object_start: int | None = None
+        self._in_actions = False
+
+    def feed(self, chunk: str) -> list[ProposedAction]:
+        self.text += chunk
+        emitted = []
+        text = self.text
+        while self._pos < len(text):
+            index = self._pos
+            char = text[index]
+            self._pos += 1
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    self._close_string(text[self._string_start : index + 1])
+                continue
+            if not self._stack and char != "{":
+                continue
+            if char == '"':
+                self._in_string = True
+                self._string_start = index
+            elif char in "{[":
+                if self._in_actions and char == "{" and len(self._stack) == 2:
+                    self._object_start = index
+                if char == "[" and len(self._stack) == 1 and self._expect_value and self._key == "proposed_actions":
+                    self._in_actions = True
+                self._stack.append(char)
+            elif char in "}]":
+                self._stack.pop()
+                if char == "}" and self._object_start is not None and len(self._stack) == 2:
+                    action = self._to_action(json.loads(text[self._object_start : index + 1]))
+                    self._object_start = None
+                    if action:
+                        self.actions.append(action)
+                        emitted.append(action)
+                elif char == "]" and self._in_actions and len(self._stack) == 1:
+                    self._in_actions = False
+            elif len(self._stack) == 1:
+                if char == ":":
+                    self._key = self._last_string
+                    self._expect_value = True
+                elif char == ",":
+                    self._expect_value = False
+        return emitted
+
+    def _close_string(self, literal: str) -> None:
+        if len(self._stack) != 1:
+            return
+        value = json.loads(literal)
+        if self._expect_value:
+            if self._key == "plan_summary":
+                self.plan_summary = value
+        else:
+            self._last_string = value
+
+    def _to_action(self, raw) -> ProposedAction | None:
+        if not isinstance(raw, dict) or "tool_name" not in raw:
+            return None
+        return ProposedAction(tool_name=raw["tool_name"], args=raw.get("args", {}))
@@ -0,0 +1,192 @@
+import asyncio
+import hashlib
+import json
+import random
+import threading
+import time
+from concurrent.futures import Future
+from email.utils import parsedate_to_datetime
+from typing import Any, AsyncIterator
+
+import httpx
+
+RETRY_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+
+
+class PlannerHTTPError(Exception):
+    def __init__(self, status_code: int, body: str):
+        super().__init__(f"Planner API returned {status_code}: {body[:200]}")
+        self.status_code = status_code
+        self.body = body
+
+
+def _retry_after(response: httpx.Response) -> float | None:
+    value = response.headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+# HTTP transport for the planner API: one pooled keep-alive client per mode,
+# per-request timeouts, exponential backoff on 429/5xx and network errors, a
+# cap on requests in flight, and coalescing of identical concurrent requests.
+class PlannerTransport:
+    def __init__(
+        self,
+        api_key: str,
+        base_url: str = "https://api.openai.com/v1",
+        timeout_seconds: float = 60,
+        connect_timeout_seconds: float = 5,
+        max_retries: int = 3,
+        backoff_base_seconds: float = 0.5,
+        backoff_max_seconds: float = 8,
+        max_in_flight: int = 8,
+        max_connections: int = 16,
+    ):
+        self.max_retries = max_retries
+        self.backoff_base_seconds = backoff_base_seconds
+        self.backoff_max_seconds = backoff_max_seconds
+        timeout = httpx.Timeout(timeout_seconds, connect=connect_timeout_seconds)
+        limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections, keepalive_expiry=30)
+        headers = {"Authorization": f"Bearer {api_key}"}
+        self._client = httpx.Client(base_url=base_url, headers=headers, timeout=timeout, limits=limits)
+        self._async_client = httpx.AsyncClient(base_url=base_url, headers=headers, timeout=timeout, limits=limits)
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+        self._async_slots = asyncio.Semaphore(max_in_flight)
+        self._lock = threading.Lock()
+        self._inflight: dict[str, Future] = {}
+        self._async_inflight: dict[str, asyncio.Task] = {}
+        self._async_waiters: dict[asyncio.Task, int] = {}
+
+    def _key(self, path: str, body: dict) -> str:
+        return hashlib.sha256(f"{path}\n{json.dumps(body, sort_keys=True)}".encode("utf-8")).hexdigest()
+
+    def _backoff(self, attempt: int, retry_after: float | None) -> float:
+        if retry_after is not None:
+            return min(retry_after, self.backoff_max_seconds)
+        delay = min(self.backoff_max_seconds, self.backoff_base_seconds * 2**attempt)
+        return delay * random.uniform(0.5, 1.0)
+
+    def _classify(self, response: httpx.Response) -> tuple[Exception | None, float | None]:
+        if response.status_code < 400:
+            return None, None
+        error = PlannerHTTPError(response.status_code, response.text)
+        if response.status_code not in RETRY_STATUS_CODES:
+            raise error
+        return error, _retry_after(response)
+
+    def post_json(self, path: str, body: dict, timeout: float | None = None) -> Any:
+        key = self._key(path, body)
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+        if not leader:
+            return future.result()
+        try:
+            result = self._send(path, body, timeout)
+        except BaseException as exc:
+            future.set_exception(exc)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._inflight[key]
+
+    def _send(self, path: str, body: dict, timeout: float | None) -> Any:
+        request_timeout = timeout if timeout is not None else httpx.USE_CLIENT_DEFAULT
+        for attempt in range(self.max_retries + 1):
+            with self._slots:
+                try:
+                    response = self._client.post(path, json=body, timeout=request_timeout)
+                    error, retry_after = self._classify(response)
+                except httpx.TransportError as exc:
+                    error, retry_after = exc, None
+            if error is None:
+                return response.json()
+            if attempt == self.max_retries:
+                raise error
+            time.sleep(self._backoff(attempt, retry_after))
+
+    async def post_json_async(self, path: str, body: dict, timeout: float | None = None) -> Any:
+        # The shared request runs in its own task, so a cancelled caller (e.g.
+        # a disconnected client) only stops waiting; the request is cancelled
+        # once nobody is waiting for it any more.
+        key = self._key(path, body)
+        task = self._async_inflight.get(key)
+        if task is None:
+            task = self._async_inflight[key] = asyncio.create_task(self._send_async(path, body, timeout))
+            task.add_done_callback(lambda _: self._async_inflight.pop(key, None))
+        self._async_waiters[task] = self._async_waiters.get(task, 0) + 1
+        try:
+            return await asyncio.shield(task)
+        finally:
+            self._async_waiters[task] -= 1
+            if not self._async_waiters[task]:
+                del self._async_waiters[task]
+                task.cancel()
+
+    async def _send_async(self, path: str, body: dict, timeout: float | None) -> Any:
+        request_timeout = timeout if timeout is not None else httpx.USE_CLIENT_DEFAULT
+        for attempt in range(self.max_retries + 1):
+            async with self._async_slots:
+                try:
+                    response = await self._async_client.post(path, json=body, timeout=request_timeout)
+                    error, retry_after = self._classify(response)
+                except httpx.TransportError as exc:
+                    error, retry_after = exc, None
+            if error is None:
+                return response.json()
+            if attempt == self.max_retries:
+                raise error
+            await asyncio.sleep(self._backoff(attempt, retry_after))
+
+    async def stream_events(self, path: str, body: dict, timeout: float | None = None) -> AsyncIterator[tuple[str, Any]]:
+        # Server-sent events. Retries only happen before the first event, since
+        # a half-consumed stream cannot be replayed.
+        request_timeout = timeout if timeout is not None else httpx.USE_CLIENT_DEFAULT
+        started = False
+        for attempt in range(self.max_retries + 1):
+            async with self._async_slots:
+                try:
+                    async with self._async_client.stream("POST", path, json=body, timeout=request_timeout) as response:
+                        if response.status_code >= 400:
+                            await response.aread()
+                        error, retry_after = self._classify(response)
+                        if error is None:
+                            event = "message"
+                            async for line in response.aiter_lines():
+                                if line.startswith("event:"):
+                                    event = line[6:].strip()
+                                elif line.startswith("data:"):
+                                    data = line[5:].strip()
+                                    if data == "[DONE]":
+                                        return
+                                    started = True
+                                    yield event, json.loads(data)
+                                elif not line:
+                                    event = "message"
+                            return
+                except httpx.TransportError as exc:
+                    if started:
+                        raise
+                    error, retry_after = exc, None
+            if attempt == self.max_retries:
+                raise error
+            await asyncio.sleep(self._backoff(attempt, retry_after))
+
+    def close(self) -> None:
+        self._client.close()
+
+    async def aclose(self) -> None:
+        await self._async_client.aclose()
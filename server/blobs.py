@@ -0,0 +1,96 @@
+import hashlib
+import os
+import re
+import tempfile
+import time
+from pathlib import Path
+from typing import Any
+
+BLOB_KEY = "$blob"
+DIGEST_RE = re.compile(r"^[0-9a-f]{64}$")
+REFERENCE_RE = re.compile(r'"\$blob":\s*"([0-9a-f]{64})"')
+
+
+def is_reference(value: Any) -> bool:
+    return isinstance(value, dict) and set(value) == {BLOB_KEY, "size"}
+
+
+def references(text: str) -> set[str]:
+    return set(REFERENCE_RE.findall(text))
+
+
+# Content-addressed store for large strings in args and tool results. Blobs
+# live at <root>/<digest[:2]>/<digest>; rows hold {"$blob": digest, "size": n}.
+class BlobStore:
+    def __init__(self, root: str, inline_limit: int = 4096):
+        self.root = Path(root)
+        self.inline_limit = inline_limit
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def path(self, digest: str) -> Path:
+        if not DIGEST_RE.match(digest):
+            raise ValueError("Invalid blob digest")
+        return self.root / digest[:2] / digest
+
+    def put(self, data: bytes) -> str:
+        digest = hashlib.sha256(data).hexdigest()
+        target = self.path(digest)
+        if target.exists():
+            # Refresh mtime so a concurrent collect() treats it as new.
+            os.utime(target)
+            return digest
+        target.parent.mkdir(exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=target.parent, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, target)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        return digest
+
+    def get(self, digest: str) -> bytes | None:
+        try:
+            data = self.path(digest).read_bytes()
+        except FileNotFoundError:
+            return None
+        if hashlib.sha256(data).hexdigest() != digest:
+            raise ValueError(f"Blob {digest} is corrupt")
+        return data
+
+    def externalize(self, value: Any) -> Any:
+        if isinstance(value, str):
+            data = value.encode("utf-8")
+            if len(data) <= self.inline_limit:
+                return value
+            return {BLOB_KEY: self.put(data), "size": len(data)}
+        if isinstance(value, dict):
+            return {key: self.externalize(item) for key, item in value.items()}
+        if isinstance(value, list):
+            return [self.externalize(item) for item in value]
+        return value
+
+    def resolve(self, value: Any) -> Any:
+        if is_reference(value):
+            data = self.get(value[BLOB_KEY])
+            if data is None:
+                raise ValueError(f"Blob {value[BLOB_KEY]} is missing")
+            return data.decode("utf-8")
+        if isinstance(value, dict):
+            return {key: self.resolve(item) for key, item in value.items()}
+        if isinstance(value, list):
+            return [self.resolve(item) for item in value]
+        return value
+
+    def collect(self, referenced: set[str], grace_seconds: float = 3600) -> int:
+        # Blobs written within the grace period may belong to rows that are
+        # not committed yet, so only older unreferenced blobs are removed.
+        cutoff = time.time() - grace_seconds
+        removed = 0
+        for path in self.root.glob("??/*"):
+            if path.name in referenced or path.name.startswith(".tmp-") or path.stat().st_mtime > cutoff:
+                continue
+            path.unlink(missing_ok=True)
+            removed += 1
+        return removed
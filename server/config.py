@@ -9,14 +9,57 @@ class Settings:
     action_ttl_seconds: int = 300
     bind_host: str = "0.0.0.0"
     port: int = 8787
+    workers: int = 1
     db_path: str = "./data/pancho.db"
+    database_url: str | None = None
+    database_max_connections: int = 10
     workspace_dir: str = "./workspace"
     max_read_bytes: int = 65536
+    workspace_index_max_files: int = 100000
+    workspace_index_max_file_bytes: int = 1048576
+    workspace_index_rescan_seconds: float = 2.0
+    storage_workers: int = 4
+    sweep_interval_seconds: float = 30
+    sweep_batch_size: int = 500
+    retention_days: int = 30
+    archive_dir: str = "./data/archive"
+    blob_dir: str = "./data/blobs"
+    blob_inline_limit_bytes: int = 4096
+    detail_cache_max_entries: int = 1024
+    detail_cache_ttl_seconds: float = 5.0
+    execution_workers: int = 4
+    execution_max_queued: int = 100
+    execution_per_session_limit: int = 2
+    execution_timeout_seconds: int = 900
+    execution_tool_limits: dict[str, int] = field(default_factory=lambda: {"shell.run_allowlisted": 2})
     openai_api_key: str | None = None
     openai_keyring_service: str = "panchobot"
     openai_keyring_username: str = "openai"
     openai_model: str = "gpt-4o-mini"
+    openai_base_url: str = "https://api.openai.com/v1"
+    openai_timeout_seconds: float = 60
+    openai_connect_timeout_seconds: float = 5
+    openai_max_retries: int = 3
+    openai_max_in_flight: int = 8
+    openai_max_connections: int = 16
+    plan_cache_ttl_seconds: int = 3600
+    plan_cache_memory_entries: int = 256
+    plan_cache_max_rows: int = 10000
+    planner_repair_rounds: int = 1
     allowed_shell_commands: list[str] = field(default_factory=lambda: ["ls", "pwd", "cat", "pytest"])
+    shell_timeout_seconds: int = 300
+    shell_max_output_bytes: int = 65536
+
+
+
+def _parse_limits(raw: str) -> dict[str, int]:
+    limits = {}
+    for item in raw.split(","):
+        if not item.strip():
+            continue
+        name, _, value = item.partition("=")
+        limits[name.strip()] = int(value)
+    return limits
 
 
 
@@ -26,13 +69,45 @@ def load_settings() -> Settings:
         action_ttl_seconds=int(os.getenv("ACTION_TTL_SECONDS", "300")),
         bind_host=os.getenv("BIND_HOST", "0.0.0.0"),
         port=int(os.getenv("PORT", "8787")),
+        workers=int(os.getenv("WORKERS", "1")),
         db_path=os.getenv("DB_PATH", "./data/pancho.db"),
+        database_url=os.getenv("DATABASE_URL") or None,
+        database_max_connections=int(os.getenv("DATABASE_MAX_CONNECTIONS", "10")),
         workspace_dir=os.getenv("WORKSPACE_DIR", "./workspace"),
         max_read_bytes=int(os.getenv("MAX_READ_BYTES", "65536")),
+        workspace_index_max_files=int(os.getenv("WORKSPACE_INDEX_MAX_FILES", "100000")),
+        workspace_index_max_file_bytes=int(os.getenv("WORKSPACE_INDEX_MAX_FILE_BYTES", "1048576")),
+        workspace_index_rescan_seconds=float(os.getenv("WORKSPACE_INDEX_RESCAN_SECONDS", "2")),
+        storage_workers=int(os.getenv("STORAGE_WORKERS", "4")),
+        sweep_interval_seconds=float(os.getenv("SWEEP_INTERVAL_SECONDS", "30")),
+        sweep_batch_size=int(os.getenv("SWEEP_BATCH_SIZE", "500")),
+        retention_days=int(os.getenv("RETENTION_DAYS", "30")),
+        archive_dir=os.getenv("ARCHIVE_DIR", "./data/archive"),
+        blob_dir=os.getenv("BLOB_DIR", "./data/blobs"),
+        blob_inline_limit_bytes=int(os.getenv("BLOB_INLINE_LIMIT_BYTES", "4096")),
+        detail_cache_max_entries=int(os.getenv("DETAIL_CACHE_MAX_ENTRIES", "1024")),
+        detail_cache_ttl_seconds=float(os.getenv("DETAIL_CACHE_TTL_SECONDS", "5")),
+        execution_workers=int(os.getenv("EXECUTION_WORKERS", "4")),
+        execution_max_queued=int(os.getenv("EXECUTION_MAX_QUEUED", "100")),
+        execution_per_session_limit=int(os.getenv("EXECUTION_PER_SESSION_LIMIT", "2")),
+        execution_timeout_seconds=int(os.getenv("EXECUTION_TIMEOUT_SECONDS", "900")),
+        execution_tool_limits=_parse_limits(os.getenv("EXECUTION_TOOL_LIMITS", "shell.run_allowlisted=2")),
         openai_api_key=os.getenv("OPENAI_API_KEY"),
         openai_keyring_service=os.getenv("OPENAI_KEYRING_SERVICE", "panchobot"),
         openai_keyring_username=os.getenv("OPENAI_KEYRING_USERNAME", "openai"),
         openai_model=os.getenv("OPENAI_MODEL", "gpt-4o-mini"),
+        openai_base_url=os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1"),
+        openai_timeout_seconds=float(os.getenv("OPENAI_TIMEOUT_SECONDS", "60")),
+        openai_connect_timeout_seconds=float(os.getenv("OPENAI_CONNECT_TIMEOUT_SECONDS", "5")),
+        openai_max_retries=int(os.getenv("OPENAI_MAX_RETRIES", "3")),
+        openai_max_in_flight=int(os.getenv("OPENAI_MAX_IN_FLIGHT", "8")),
+        openai_max_connections=int(os.getenv("OPENAI_MAX_CONNECTIONS", "16")),
+        plan_cache_ttl_seconds=int(os.getenv("PLAN_CACHE_TTL_SECONDS", "3600")),
+        plan_cache_memory_entries=int(os.getenv("PLAN_CACHE_MEMORY_ENTRIES", "256")),
+        plan_cache_max_rows=int(os.getenv("PLAN_CACHE_MAX_ROWS", "10000")),
+        planner_repair_rounds=int(os.getenv("PLANNER_REPAIR_ROUNDS", "1")),
+        shell_timeout_seconds=int(os.getenv("SHELL_TIMEOUT_SECONDS", "300")),
+        shell_max_output_bytes=int(os.getenv("SHELL_MAX_OUTPUT_BYTES", "65536")),
     )
 
 
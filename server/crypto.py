@@ -1,6 +1,17 @@
 import hashlib
 import json
-from typing import Any
+from json.encoder import encode_basestring
+from typing import Any, Iterator
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+HASH_BUFFER_CHARS = 65536
+ORJSON_MAX_INT = 2**63 - 1
+
+_ENCODER = json.JSONEncoder(sort_keys=True, separators=(",", ":"), ensure_ascii=False)
 
 
 def canonical_json(data: dict[str, Any]) -> str:
@@ -8,5 +19,94 @@ def canonical_json(data: dict[str, Any]) -> str:
 
 
 
+def _orjson_safe(value: Any) -> bool:
+    # Only types orjson encodes exactly like canonical_json. Floats are left
+    # out because the two libraries format them differently.
+    kind = type(value)
+    if kind is str or kind is bool or value is None:
+        return True
+    if kind is int:
+        return -ORJSON_MAX_INT <= value <= ORJSON_MAX_INT
+    if kind is dict:
+        return all(type(key) is str and _orjson_safe(item) for key, item in value.items())
+    if kind is list:
+        return all(_orjson_safe(item) for item in value)
+    return False
+
+
+
+def _orjson_verified() -> bool:
+    if orjson is None:
+        return False
+    samples = [
+        {"b": [1, -2, True, None], "a": {"z": "é \x00\x1f\"\\/", "y": "😀"}, "": ""},
+        {"é": 1, "e": 2, "Z": 3, "😀": [], "\x7f": {}},
+    ]
+    try:
+        return all(orjson.dumps(sample, option=orjson.OPT_SORT_KEYS) == canonical_json(sample).encode("utf-8") for sample in samples)
+    except orjson.JSONEncodeError:
+        return False
+
+
+ORJSON_ENABLED = _orjson_verified()
+
+
+
+def _iter_canonical(value: Any) -> Iterator[str]:
+    # Same bytes as canonical_json, but long strings are escaped and yielded
+    # in slices so no piece is larger than HASH_BUFFER_CHARS.
+    if isinstance(value, str):
+        yield '"'
+        for start in range(0, len(value), HASH_BUFFER_CHARS):
+            yield encode_basestring(value[start : start + HASH_BUFFER_CHARS])[1:-1]
+        yield '"'
+    elif isinstance(value, dict):
+        if not all(isinstance(key, str) for key in value):
+            yield from _ENCODER.iterencode(value)
+            return
+        yield "{"
+        for index, key in enumerate(sorted(value)):
+            if index:
+                yield ","
+            yield encode_basestring(key)
+            yield ":"
+            yield from _iter_canonical(value[key])
+        yield "}"
+    elif isinstance(value, (list, tuple)):
+        yield "["
+        for index, item in enumerate(value):
+            if index:
+                yield ","
+            yield from _iter_canonical(item)
+        yield "]"
+    else:
+        yield _ENCODER.encode(value)
+
+
+
+def canonical_digest(data: Any) -> str:
+    # sha256 of canonical_json(data) without materializing the whole string:
+    # orjson when the payload only holds types it encodes identically,
+    # otherwise the canonical encoding streamed into the hasher in bounded chunks.
+    if ORJSON_ENABLED and _orjson_safe(data):
+        try:
+            return hashlib.sha256(orjson.dumps(data, option=orjson.OPT_SORT_KEYS)).hexdigest()
+        except orjson.JSONEncodeError:
+            pass
+    hasher = hashlib.sha256()
+    pending: list[str] = []
+    pending_chars = 0
+    for chunk in _iter_canonical(data):
+        pending.append(chunk)
+        pending_chars += len(chunk)
+        if pending_chars >= HASH_BUFFER_CHARS:
+            hasher.update("".join(pending).encode("utf-8"))
+            pending.clear()
+            pending_chars = 0
+    hasher.update("".join(pending).encode("utf-8"))
+    return hasher.hexdigest()
+
+
+
 def action_hash(payload: dict[str, Any]) -> str:
-    return hashlib.sha256(canonical_json(payload).encode("utf-8")).hexdigest()
+    return canonical_digest(payload)
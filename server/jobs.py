@@ -0,0 +1,141 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+
+from .actions import ActionError, ActionService, PreparedExecution, batch_item
+from .streams import OutputHub
+
+logger = logging.getLogger(__name__)
+
+
+class KeyedLimiter:
+    def __init__(self, default_limit: int, limits: dict[str, int] | None = None):
+        self.default_limit = default_limit
+        self.limits = limits or {}
+        self._slots: dict[str, tuple[asyncio.Semaphore, int]] = {}
+
+    @asynccontextmanager
+    async def hold(self, key: str):
+        limit = self.limits.get(key, self.default_limit)
+        if limit <= 0:
+            yield
+            return
+        semaphore, users = self._slots.get(key, (asyncio.Semaphore(limit), 0))
+        self._slots[key] = (semaphore, users + 1)
+        try:
+            async with semaphore:
+                yield
+        finally:
+            semaphore, users = self._slots[key]
+            if users == 1:
+                del self._slots[key]
+            else:
+                self._slots[key] = (semaphore, users - 1)
+
+
+class ExecutionQueue:
+    def __init__(
+        self,
+        actions: ActionService,
+        max_workers: int = 4,
+        max_queued: int = 100,
+        per_session_limit: int = 2,
+        per_tool_limits: dict[str, int] | None = None,
+        output_hub: OutputHub | None = None,
+    ):
+        self.actions = actions
+        self.output_hub = output_hub or OutputHub()
+        self.max_queued = max_queued
+        self._workers = asyncio.Semaphore(max_workers)
+        self._sessions = KeyedLimiter(per_session_limit)
+        self._tools = KeyedLimiter(0, per_tool_limits)
+        self._tasks: set[asyncio.Task] = set()
+        self.queued = 0
+        self.running = 0
+
+    def _check_capacity(self, count: int) -> None:
+        if self.queued + count > self.max_queued:
+            raise ActionError(429, "Execution queue is full")
+
+    async def submit(self, action_id: str) -> dict:
+        self._check_capacity(1)
+        prepared = await self.actions.async_storage.run(self.actions.begin_execution, action_id)
+        self._enqueue([prepared], ordered=False)
+        return await self.actions.get_action_detail_async(action_id)
+
+    async def submit_many(self, action_ids: list[str], ordered: bool = False) -> list[dict]:
+        self._check_capacity(len(action_ids))
+        # Ordered batches are only checked here; each step is claimed when its
+        # turn comes, so a failure leaves the later steps and their approvals
+        # untouched.
+        claim = self.actions.prepare_executions if ordered else self.actions.begin_executions
+        outcomes = await self.actions.async_storage.run(claim, action_ids)
+        self._enqueue([outcome for outcome in outcomes if isinstance(outcome, PreparedExecution)], ordered)
+        results = []
+        for action_id, outcome in zip(action_ids, outcomes):
+            if isinstance(outcome, PreparedExecution):
+                outcome = await self.actions.get_action_detail_async(action_id)
+            results.append(batch_item(action_id, outcome))
+        return results
+
+    def _enqueue(self, batch: list[PreparedExecution], ordered: bool) -> None:
+        self.queued += len(batch)
+        for prepared in batch:
+            self.output_hub.open(prepared.action_id)
+        if ordered:
+            self._spawn(self._run_sequence(batch))
+        else:
+            for prepared in batch:
+                self._spawn(self._run(prepared))
+
+    def _spawn(self, coro) -> None:
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run_sequence(self, batch: list[PreparedExecution]) -> None:
+        for index, planned in enumerate(batch):
+            try:
+                prepared = await self.actions.async_storage.run(self.actions.begin_execution, planned.action_id)
+            except ActionError as exc:
+                logger.warning("Ordered step %s could not start: %s", planned.action_id, exc.detail)
+                self.queued -= 1
+                self.output_hub.close(planned.action_id)
+            else:
+                if await self._run(prepared):
+                    continue
+            reason = f"action {planned.action_id} failed"
+            for skipped in batch[index + 1 :]:
+                self.queued -= 1
+                await self.actions.async_storage.run(self.actions.skip_execution, skipped, reason)
+                self.output_hub.close(skipped.action_id)
+            return
+
+    async def _run(self, prepared: PreparedExecution) -> bool:
+        started = False
+        try:
+            # Per-key slots are taken before a worker slot so that jobs held
+            # back by their session or tool limit never idle a worker.
+            async with self._sessions.hold(prepared.session_id), self._tools.hold(prepared.tool.name):
+                async with self._workers:
+                    self.queued -= 1
+                    started = True
+                    self.running += 1
+                    try:
+                        await self.actions.run_execution(prepared, self.output_hub.sink(prepared.action_id))
+                    finally:
+                        self.running -= 1
+            return True
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Execution of action %s failed", prepared.action_id)
+            return False
+        finally:
+            if not started:
+                self.queued -= 1
+            self.output_hub.close(prepared.action_id)
+
+    async def drain(self) -> None:
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
@@ -1,26 +1,59 @@
+import logging
+from contextlib import asynccontextmanager
 from pathlib import Path
+from typing import Literal
 
 from fastapi import FastAPI, Header
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
 from pydantic import BaseModel, Field
 
 from .actions import ActionError, ActionService
 from .agent import AgentPlanner
+from .blobs import BlobStore
+from .cache import TTLCache
 from .ai.fake_client import FakeAIClient
 from .ai.openai_client import OpenAIClient
+from .ai.transport import PlannerTransport
 from .config import ensure_directories, load_settings
+from .jobs import ExecutionQueue
+from .metrics import EXECUTION_QUEUE_DEPTH, EXECUTIONS_IN_FLIGHT, REGISTRY
+from .plan_cache import PlanCache
 from .registry import RiskTier, Tool, ToolRegistry
 from .secrets import resolve_openai_api_key
-from .storage import Storage
+from .storage import AsyncStorage, Storage
+from .storage_postgres import PostgresStorage
+from .streams import EventBus, OutputHub, sse_event
+from .sweeper import ExpirySweeper
+from .tools.search import ListTreeArgs, SearchArgs, WorkspaceIndex, list_tree_preview, search_preview
 from .tools.shell import ShellArgs, ShellPolicy, ShellTool
-from .tools.workspace import ReadFileArgs, WorkspacePolicy, WorkspaceTools, WriteFileArgs, read_file_preview, write_file_preview
+from .tools.workspace import ApplyPatchArgs, ReadFileArgs, WorkspacePolicy, WorkspaceTools, WriteFileArgs, read_file_preview
+
+logger = logging.getLogger(__name__)
 
 settings = load_settings()
 ensure_directories(settings)
-storage = Storage(settings.db_path)
+storage = (
+    PostgresStorage(settings.database_url, settings.database_max_connections)
+    if settings.database_url
+    else Storage(settings.db_path)
+)
 registry = ToolRegistry()
-workspace_tools = WorkspaceTools(WorkspacePolicy(settings.workspace_dir, settings.max_read_bytes))
-shell_tool = ShellTool(ShellPolicy(settings.workspace_dir, settings.allowed_shell_commands))
+workspace_policy = WorkspacePolicy(settings.workspace_dir, settings.max_read_bytes)
+workspace_tools = WorkspaceTools(workspace_policy)
+workspace_index = WorkspaceIndex(
+    workspace_policy,
+    settings.workspace_index_max_file_bytes,
+    settings.workspace_index_max_files,
+    settings.workspace_index_rescan_seconds,
+)
+shell_tool = ShellTool(
+    ShellPolicy(
+        settings.workspace_dir,
+        settings.allowed_shell_commands,
+        settings.shell_timeout_seconds,
+        settings.shell_max_output_bytes,
+    )
+)
 
 
 class ExplainPlanArgs(BaseModel):
@@ -55,14 +88,46 @@ registry.register(
         execute=workspace_tools.read_file,
     )
 )
+registry.register(
+    Tool(
+        name="workspace.search",
+        description="Search text in workspace files (substring, case-insensitive by default)",
+        input_schema=SearchArgs,
+        risk_tier=RiskTier.SAFE,
+        preview=search_preview,
+        execute=workspace_index.search,
+    )
+)
+registry.register(
+    Tool(
+        name="workspace.list_tree",
+        description="List workspace files with sizes and modification times",
+        input_schema=ListTreeArgs,
+        risk_tier=RiskTier.SAFE,
+        preview=list_tree_preview,
+        execute=workspace_index.list_tree,
+    )
+)
 registry.register(
     Tool(
         name="workspace.write_file",
         description="Write text file inside local workspace",
         input_schema=WriteFileArgs,
         risk_tier=RiskTier.PRIVILEGED,
-        preview=write_file_preview,
+        preview=workspace_tools.write_file_preview,
         execute=workspace_tools.write_file,
+        prepare=workspace_tools.prepare_write,
+    )
+)
+registry.register(
+    Tool(
+        name="workspace.apply_patch",
+        description="Patch a text file inside local workspace with a unified diff or line range edits",
+        input_schema=ApplyPatchArgs,
+        risk_tier=RiskTier.PRIVILEGED,
+        preview=workspace_tools.apply_patch_preview,
+        execute=workspace_tools.apply_patch,
+        prepare=workspace_tools.prepare_patch,
     )
 )
 registry.register(
@@ -73,15 +138,106 @@ registry.register(
         risk_tier=RiskTier.PRIVILEGED,
         preview=shell_tool.preview,
         execute=shell_tool.execute,
+        execute_async=shell_tool.execute_async,
+        stream=shell_tool.stream,
     )
 )
 
-action_service = ActionService(storage, registry, settings.action_ttl_seconds, settings.approval_ttl_seconds)
+blob_store = BlobStore(settings.blob_dir, settings.blob_inline_limit_bytes)
+event_bus = EventBus()
+action_service = ActionService(
+    storage,
+    registry,
+    settings.action_ttl_seconds,
+    settings.approval_ttl_seconds,
+    AsyncStorage(storage, settings.storage_workers),
+    TTLCache(settings.detail_cache_max_entries, settings.detail_cache_ttl_seconds),
+    blob_store,
+    event_bus,
+    settings.execution_timeout_seconds,
+)
+
+
+def _on_remote_change(action_id: str, status: str) -> None:
+    action_service.detail_cache.invalidate(action_id)
+    if event_bus.has_subscribers():
+        action = storage.get_action(action_id)
+        if action:
+            delta = {"action_id": action_id, "status": status, "approval_expires_at": action["approval_expires_at"]}
+            event_bus.publish(action["requested_by"], "action", delta)
+
+
+# Writes from other processes or nodes reach the detail cache and event
+# subscribers only through backend notifications; without them the cache is
+# only safe for a single worker, and session events only carry transitions
+# handled by this process, so clients are told to refresh details themselves.
+events_process_local = not storage.listen(_on_remote_change) and settings.workers > 1
+if events_process_local:
+    action_service.detail_cache.max_entries = 0
 openai_api_key = resolve_openai_api_key(settings)
-ai_client = OpenAIClient(openai_api_key, settings.openai_model) if openai_api_key else FakeAIClient()
-planner = AgentPlanner(ai_client, action_service)
+ai_client = (
+    OpenAIClient(
+        openai_api_key,
+        settings.openai_model,
+        PlannerTransport(
+            openai_api_key,
+            settings.openai_base_url,
+            settings.openai_timeout_seconds,
+            settings.openai_connect_timeout_seconds,
+            settings.openai_max_retries,
+            max_in_flight=settings.openai_max_in_flight,
+            max_connections=settings.openai_max_connections,
+        ),
+    )
+    if openai_api_key
+    else FakeAIClient()
+)
+plan_cache = (
+    PlanCache(
+        storage,
+        settings.openai_model if openai_api_key else "fake",
+        settings.plan_cache_ttl_seconds,
+        settings.plan_cache_memory_entries,
+        settings.plan_cache_max_rows,
+    )
+    if settings.plan_cache_ttl_seconds > 0
+    else None
+)
+planner = AgentPlanner(ai_client, action_service, plan_cache, settings.planner_repair_rounds)
+output_hub = OutputHub(settings.shell_max_output_bytes)
+execution_queue = ExecutionQueue(
+    action_service,
+    settings.execution_workers,
+    settings.execution_max_queued,
+    settings.execution_per_session_limit,
+    settings.execution_tool_limits,
+    output_hub,
+)
+EXECUTION_QUEUE_DEPTH.set_function(lambda: execution_queue.queued)
+EXECUTIONS_IN_FLIGHT.set_function(lambda: execution_queue.running)
+
+sweeper = ExpirySweeper(
+    action_service,
+    settings.sweep_interval_seconds,
+    settings.sweep_batch_size,
+    settings.retention_days * 86400,
+    archive_dir=settings.archive_dir,
+)
+
 
-app = FastAPI(title="PanchoBot MVP 0")
+@asynccontextmanager
+async def lifespan(_):
+    sweeper.start()
+    yield
+    await sweeper.stop()
+    await execution_queue.drain()
+    if isinstance(ai_client, OpenAIClient):
+        await ai_client.transport.aclose()
+        ai_client.transport.close()
+    storage.close()
+
+
+app = FastAPI(title="PanchoBot MVP 0", lifespan=lifespan)
 
 
 @app.exception_handler(ActionError)
@@ -101,24 +257,131 @@ class ExecuteRequest(BaseModel):
     action_id: str
 
 
+class BatchRequest(BaseModel):
+    action_ids: list[str] = Field(min_length=1, max_length=100)
+
+
+class BatchExecuteRequest(BatchRequest):
+    mode: Literal["parallel", "ordered"] = "parallel"
+
+
 @app.post("/agent/plan")
-def agent_plan(req: PlanRequest, x_session_id: str = Header(default="local-session")):
-    return planner.plan(req.goal, x_session_id)
+async def agent_plan(
+    req: PlanRequest,
+    x_session_id: str = Header(default="local-session"),
+    x_plan_cache: str | None = Header(default=None),
+):
+    return await planner.plan_async(req.goal, x_session_id, use_cache=x_plan_cache != "bypass")
+
+
+async def _plan_events(goal: str, session_id: str, use_cache: bool):
+    # Actions are persisted as they stream, so a failure part-way still ends
+    # with error and done, naming what was kept so the client knows the plan
+    # is partial.
+    action_ids = []
+    try:
+        async for event, data in planner.plan_stream(goal, session_id, use_cache):
+            if event == "action":
+                action_ids.append(data["action_id"])
+            elif event == "error":
+                data = {**data, "action_ids": action_ids}
+            yield sse_event(event, data)
+    except Exception as exc:
+        logger.exception("Streaming plan failed")
+        yield sse_event("error", {"status_code": 502, "detail": f"Planner failed: {exc}", "action_ids": action_ids})
+    yield sse_event("done", {})
+
+
+@app.post("/agent/plan:stream")
+async def agent_plan_stream(
+    req: PlanRequest,
+    x_session_id: str = Header(default="local-session"),
+    x_plan_cache: str | None = Header(default=None),
+):
+    return StreamingResponse(_plan_events(req.goal, x_session_id, x_plan_cache != "bypass"), media_type="text/event-stream")
 
 
 @app.post("/actions/approve")
-def approve(req: ApproveRequest):
-    return action_service.approve(req.action_id)
+async def approve(req: ApproveRequest):
+    return await action_service.approve_async(req.action_id)
+
+
+@app.post("/actions/execute", status_code=202)
+async def execute(req: ExecuteRequest):
+    return {"action": await execution_queue.submit(req.action_id)}
+
+
+@app.post("/actions/approve:batch")
+async def approve_batch(req: BatchRequest):
+    return {"results": await action_service.approve_many_async(req.action_ids)}
 
 
-@app.post("/actions/execute")
-def execute(req: ExecuteRequest):
-    return action_service.execute(req.action_id)
+@app.post("/actions/execute:batch", status_code=202)
+async def execute_batch(req: BatchExecuteRequest):
+    return {"results": await execution_queue.submit_many(req.action_ids, ordered=req.mode == "ordered")}
 
 
 @app.get("/actions/{action_id}")
-def action_detail(action_id: str):
-    return action_service.get_action_detail(action_id)
+async def action_detail(action_id: str):
+    return await action_service.get_action_detail_async(action_id)
+
+
+async def _output_events(action_id: str, detail: dict):
+    hub = execution_queue.output_hub
+    if hub.is_open(action_id):
+        async for stream, text in hub.subscribe(action_id):
+            yield sse_event(stream, text)
+        detail = await action_service.get_action_detail_async(action_id)
+    else:
+        result = await action_service.async_storage.run(action_service.resolve_blobs, detail["result"] or {})
+        for stream in ("stdout", "stderr"):
+            if result.get(stream):
+                yield sse_event(stream, result[stream])
+    yield sse_event("end", {"status": detail["status"]})
+
+
+@app.get("/actions/{action_id}/output")
+async def action_output(action_id: str):
+    detail = await action_service.get_action_detail_async(action_id)
+    return StreamingResponse(_output_events(action_id, detail), media_type="text/event-stream")
+
+
+async def _session_events(session_id: str, after: int | None):
+    yield sse_event("ready", {"process_local": events_process_local})
+    async for item in event_bus.subscribe(session_id, after):
+        if item is None:
+            yield ": keepalive\n\n"
+        else:
+            yield sse_event(item[1], item[2], item[0])
+
+
+@app.get("/sessions/{session_id}/events")
+async def session_events(session_id: str, last_event_id: int | None = Header(default=None)):
+    return StreamingResponse(_session_events(session_id, last_event_id), media_type="text/event-stream")
+
+
+@app.get("/blobs/{digest}")
+async def blob(digest: str):
+    try:
+        data = await action_service.async_storage.run(blob_store.get, digest)
+    except ValueError as exc:
+        raise ActionError(400, str(exc)) from exc
+    if data is None:
+        raise ActionError(404, "Blob not found")
+    return Response(data, media_type="text/plain; charset=utf-8", headers={"Cache-Control": "public, max-age=31536000, immutable"})
+
+
+@app.get("/stats")
+async def stats():
+    return {
+        "detail_cache": action_service.detail_cache.stats(),
+        "plan_cache": planner.plan_cache.stats() if planner.plan_cache else None,
+    }
+
+
+@app.get("/metrics")
+async def metrics():
+    return Response(REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
 
 
 web_dir = Path(__file__).resolve().parent.parent / "web"
@@ -0,0 +1,237 @@
+import bisect
+import functools
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+# Metric children are looked up once per label set and cached, so the hot path
+# is a dict hit plus a short critical section.
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: dict[tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values: str):
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._child())
+        return child
+
+    def _child(self):
+        raise NotImplementedError
+
+    def _samples(self) -> list[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        return "\n".join(lines + self._samples())
+
+
+class _Value:
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1) -> None:
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1) -> None:
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _child(self) -> _Value:
+        return _Value()
+
+    def inc(self, amount: float = 1) -> None:
+        self.labels().inc(amount)
+
+    def _samples(self) -> list[str]:
+        return [f"{self.name}{_labels(self.labelnames, values)} {_format_value(child.value)}" for values, child in sorted(self._children.items())]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._function: Callable[[], float] | None = None
+
+    def set(self, value: float) -> None:
+        self.labels().set(value)
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        # Read at scrape time, so nothing is recorded on the hot path.
+        self._function = function
+
+    def _samples(self) -> list[str]:
+        if self._function is not None:
+            return [f"{self.name} {_format_value(self._function())}"]
+        return super()._samples()
+
+
+class _HistogramValue:
+    def __init__(self, buckets: tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    @contextmanager
+    def time(self):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = (), buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _child(self) -> _HistogramValue:
+        return _HistogramValue(self.buckets)
+
+    def _samples(self) -> list[str]:
+        lines = []
+        for values, child in sorted(self._children.items()):
+            with child._lock:
+                counts, total = list(child.counts), child.sum
+            cumulative = 0
+            for bound, count in zip((*self.buckets, math.inf), counts):
+                cumulative += count
+                le = 'le="' + _format_value(bound) + '"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, values, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, values)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, values)} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: dict[str, _Metric] = {}
+
+    def _register(self, metric: _Metric) -> _Metric:
+        return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: tuple[str, ...] = (), buckets: tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        return "\n".join(metric.render() for metric in self._metrics.values()) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+PLANNER_SECONDS = REGISTRY.histogram("panchobot_planner_seconds", "AgentPlanner latency by entry point.", ("method",))
+AI_CLIENT_SECONDS = REGISTRY.histogram("panchobot_ai_client_seconds", "Planner model call latency by entry point.", ("method",))
+STORAGE_SECONDS = REGISTRY.histogram("panchobot_storage_seconds", "Storage method latency.", ("method",))
+TOOL_EXECUTE_SECONDS = REGISTRY.histogram("panchobot_tool_execute_seconds", "Tool execution latency.", ("tool", "outcome"))
+TOOL_PREVIEW_SECONDS = REGISTRY.histogram("panchobot_tool_preview_seconds", "Tool preview generation latency.", ("tool",))
+ACTION_TRANSITIONS = REGISTRY.counter("panchobot_action_transitions_total", "Committed action state transitions.", ("status",))
+EXECUTION_QUEUE_DEPTH = REGISTRY.gauge("panchobot_execution_queue_depth", "Executions accepted but not yet running.")
+EXECUTIONS_IN_FLIGHT = REGISTRY.gauge("panchobot_executions_in_flight", "Executions currently running.")
+
+
+def timed_method(histogram: Histogram, method: str):
+    child = histogram.labels(method)
+
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                child.observe(time.perf_counter() - started)
+
+        return wrapper
+
+    return decorate
+
+
+def timed_async_method(histogram: Histogram, method: str):
+    child = histogram.labels(method)
+
+    def decorate(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return await fn(*args, **kwargs)
+            finally:
+                child.observe(time.perf_counter() - started)
+
+        return wrapper
+
+    return decorate
+
+
+def timed_async_iterator(histogram: Histogram, method: str):
+    child = histogram.labels(method)
+
+    def decorate(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                async for item in fn(*args, **kwargs):
+                    yield item
+            finally:
+                child.observe(time.perf_counter() - started)
+
+        return wrapper
+
+    return decorate
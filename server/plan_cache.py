@@ -0,0 +1,67 @@
+import hashlib
+import time
+from dataclasses import asdict
+
+from .ai.client import PlanOutput, ProposedAction
+from .cache import TTLCache
+from .crypto import canonical_json
+from .storage import StorageBackend
+
+PRUNE_EVERY_PUTS = 100
+
+
+class PlanCache:
+    def __init__(
+        self,
+        storage: StorageBackend,
+        model: str,
+        ttl_seconds: int = 3600,
+        memory_entries: int = 256,
+        max_rows: int = 10000,
+    ):
+        self.storage = storage
+        self.model = model
+        self.ttl_seconds = ttl_seconds
+        self.max_rows = max_rows
+        self.memory = TTLCache(memory_entries, ttl_seconds)
+        self.persistent_hits = 0
+        self._puts = 0
+
+    def key(self, goal: str, catalog_version: str) -> str:
+        payload = {"goal": " ".join(goal.split()), "catalog": catalog_version, "model": self.model}
+        return hashlib.sha256(canonical_json(payload).encode("utf-8")).hexdigest()
+
+    def get(self, cache_key: str) -> PlanOutput | None:
+        cached = self.memory.get(cache_key)
+        if cached is not None:
+            return cached
+        row = self.storage.get_cached_plan(cache_key, int(time.time()) - self.ttl_seconds)
+        if row is None:
+            return None
+        self.persistent_hits += 1
+        plan = PlanOutput(
+            plan_summary=row["plan_summary"],
+            proposed_actions=[ProposedAction(**action) for action in row["proposed_actions"]],
+        )
+        self.memory.put(cache_key, plan)
+        return plan
+
+    def put(self, cache_key: str, plan: PlanOutput) -> None:
+        now = int(time.time())
+        self.memory.put(cache_key, plan)
+        self.storage.put_cached_plan(cache_key, asdict(plan), now)
+        self._puts += 1
+        if self._puts % PRUNE_EVERY_PUTS == 0:
+            self.storage.prune_plan_cache(now - self.ttl_seconds, self.max_rows)
+
+    def stats(self) -> dict:
+        memory = self.memory.stats()
+        misses = memory["misses"] - self.persistent_hits
+        lookups = memory["hits"] + memory["misses"]
+        return {
+            "memory_hits": memory["hits"],
+            "persistent_hits": self.persistent_hits,
+            "misses": misses,
+            "memory_size": memory["size"],
+            "hit_rate": (memory["hits"] + self.persistent_hits) / lookups if lookups else 0.0,
+        }
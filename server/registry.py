@@ -1,8 +1,13 @@
+import hashlib
+import json
+import re
 from dataclasses import dataclass
 from enum import Enum
-from typing import Any, Callable
+from typing import Any, Awaitable, Callable
 
-from pydantic import BaseModel
+from pydantic import BaseModel, TypeAdapter
+
+SEPARATORS_RE = re.compile(r"[\s._\-/:]+")
 
 
 class RiskTier(str, Enum):
@@ -18,17 +23,120 @@ class Tool:
     risk_tier: RiskTier
     preview: Callable[[BaseModel], str]
     execute: Callable[[BaseModel], Any]
+    execute_async: Callable[[BaseModel], Awaitable[Any]] | None = None
+    stream: Callable[[BaseModel, Callable[[str, str], None]], Awaitable[Any]] | None = None
+    # Runs once at proposal time on validated args, e.g. to bind a file digest.
+    prepare: Callable[[BaseModel], BaseModel] | None = None
+
+
+# Compiled once per tool at registration. Args are validated once when an
+# action is proposed and stored in JSON mode; later phases either validate the
+# stored JSON in one pass (execution) or construct the model without
+# validation (rendering previews).
+class ToolCodec:
+    def __init__(self, input_schema: type[BaseModel]):
+        self.input_schema = input_schema
+        self.adapter = TypeAdapter(input_schema)
+        self.fields = frozenset(input_schema.model_fields)
+        # model_construct does not build nested models, so those still validate.
+        self.flat = "$defs" not in input_schema.model_json_schema()
+
+    def validate(self, args: Any) -> BaseModel:
+        return self.adapter.validate_python(args)
+
+    def validate_json(self, args_json: str) -> BaseModel:
+        return self.adapter.validate_json(args_json)
+
+    def dump(self, parsed: BaseModel) -> dict:
+        return self.adapter.dump_python(parsed, mode="json")
+
+    def trusted(self, args: dict) -> BaseModel:
+        return self.input_schema.model_construct(**args) if self.flat else self.validate(args)
+
+
+@dataclass(frozen=True)
+class ToolCatalog:
+    version: str
+    names: list[str]
+    prompt: str
+
+
+def _normalized(name: str) -> str:
+    return SEPARATORS_RE.sub("", name).lower()
+
+
+def _alias_map(names: Any) -> dict[str, str | None]:
+    # Normalized spellings that are ambiguous map to None and are not repaired.
+    aliases: dict[str, str | None] = {}
+    for name in names:
+        key = _normalized(name)
+        aliases[key] = None if key in aliases and aliases[key] != name else name
+    return aliases
+
+
+def _compact_schema(schema: Any) -> Any:
+    if isinstance(schema, dict):
+        return {key: _compact_schema(value) for key, value in schema.items() if key != "title"}
+    if isinstance(schema, list):
+        return [_compact_schema(value) for value in schema]
+    return schema
 
 
 class ToolRegistry:
     def __init__(self) -> None:
         self._tools: dict[str, Tool] = {}
+        self._names: dict[str, str | None] = {}
+        self._fields: dict[str, dict[str, str | None]] = {}
+        self._codecs: dict[str, ToolCodec] = {}
+        self._catalog = ToolCatalog(version="", names=[], prompt="[]")
 
     def register(self, tool: Tool) -> None:
         self._tools[tool.name] = tool
+        self._fields[tool.name] = _alias_map(tool.input_schema.model_fields)
+        self._codecs[tool.name] = ToolCodec(tool.input_schema)
+        self._names = _alias_map(self._tools)
+        self._catalog = self._build_catalog()
+
+    def _build_catalog(self) -> ToolCatalog:
+        entries = [
+            {
+                "name": tool.name,
+                "description": tool.description,
+                "risk": tool.risk_tier.value,
+                "args": _compact_schema(tool.input_schema.model_json_schema()),
+            }
+            for tool in sorted(self._tools.values(), key=lambda tool: tool.name)
+        ]
+        prompt = json.dumps(entries, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+        version = hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:16]
+        return ToolCatalog(version=version, names=[entry["name"] for entry in entries], prompt=prompt)
+
+    def catalog(self) -> ToolCatalog:
+        return self._catalog
+
+    def repair(self, tool_name: str, args: Any) -> tuple[str, Any]:
+        # Lossless fixes only (case, separators, args sent as a JSON string).
+        # Unknown tools and fields are left for validation to reject, so the
+        # planner can ask the model for a corrected plan.
+        if tool_name not in self._tools:
+            tool_name = self._names.get(_normalized(tool_name)) or tool_name
+        if isinstance(args, str):
+            try:
+                args = json.loads(args)
+            except ValueError:
+                return tool_name, args
+        fields = self._fields.get(tool_name)
+        if fields is not None and isinstance(args, dict):
+            renamed = {key: fields.get(_normalized(key)) or key for key in args}
+            if len(set(renamed.values())) == len(renamed):
+                args = {renamed[key]: value for key, value in args.items()}
+        return tool_name, args
 
     def get(self, name: str) -> Tool | None:
         return self._tools.get(name)
 
+    def codec(self, name: str) -> ToolCodec | None:
+        return self._codecs.get(name)
+
     def names(self) -> list[str]:
         return sorted(self._tools.keys())
@@ -1,25 +1,158 @@
+import asyncio
+import functools
 import json
 import sqlite3
-from contextlib import contextmanager
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import AbstractContextManager, contextmanager
+from typing import Callable, Protocol
+
+from .blobs import references
+from .metrics import STORAGE_SECONDS, timed_method
+
+# Applied to every pooled connection when it is opened. journal_mode is
+# persistent at the database level and is set once in _init_db.
+CONNECTION_PRAGMAS = (
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA cache_size=-16000",
+    "PRAGMA mmap_size=268435456",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA foreign_keys=ON",
+    "PRAGMA busy_timeout=5000",
+)
+STATEMENT_CACHE_SIZE = 256
+
+# Ordered schema migrations, tracked through PRAGMA user_version. Append new
+# entries; never edit or reorder ones that have shipped.
+MIGRATIONS: list[tuple[int, tuple[str, ...]]] = [
+    (
+        1,
+        (
+            "CREATE INDEX IF NOT EXISTS idx_audit_log_action ON audit_log(action_id, id)",
+            "CREATE INDEX IF NOT EXISTS idx_approvals_action ON approvals(action_id, id)",
+            "CREATE INDEX IF NOT EXISTS idx_tool_results_action ON tool_results(action_id, id)",
+            "CREATE INDEX IF NOT EXISTS idx_actions_status_expires ON actions(status, expires_at)",
+        ),
+    ),
+    (
+        2,
+        (
+            """CREATE TABLE IF NOT EXISTS plan_cache (
+                cache_key TEXT PRIMARY KEY,
+                plan_json TEXT NOT NULL,
+                created_at INTEGER NOT NULL
+            )""",
+            "CREATE INDEX IF NOT EXISTS idx_plan_cache_created ON plan_cache(created_at)",
+        ),
+    ),
+]
+
+
+# What ActionService, the planner cache and the sweeper rely on. Storage
+# (SQLite) is the default; PostgresStorage in storage_postgres lets several
+# nodes share one database.
+class StorageBackend(Protocol):
+    def transaction(self) -> AbstractContextManager: ...
+    def close(self) -> None: ...
+    def schema_version(self) -> int: ...
+    def listen(self, callback: Callable[[str, str], None]) -> bool: ...
+    def create_action(self, row: dict) -> None: ...
+    def create_actions(self, rows: list[dict]) -> None: ...
+    def get_action(self, action_id: str) -> dict | None: ...
+    def update_action(self, action_id: str, **fields) -> None: ...
+    def claim_action(self, action_id: str, expected: str, status: str, **fields) -> bool: ...
+    def create_approval(self, row: dict) -> None: ...
+    def get_latest_approval(self, action_id: str) -> dict | None: ...
+    def mark_approval_used(self, approval_id: int) -> bool: ...
+    def add_audit(self, action_id: str, event_type: str, created_at: int, metadata: dict) -> None: ...
+    def add_audits(self, entries: list[tuple[str, str, int, dict]]) -> list[int]: ...
+    def list_audit(self, action_id: str) -> list[dict]: ...
+    def save_tool_result(self, action_id: str, result: dict, created_at: int) -> None: ...
+    def get_latest_tool_result(self, action_id: str): ...
+    def get_cached_plan(self, cache_key: str, not_before: int): ...
+    def put_cached_plan(self, cache_key: str, plan: dict, created_at: int) -> None: ...
+    def prune_plan_cache(self, not_before: int, max_rows: int) -> None: ...
+    def find_actions_due(self, statuses: list[str], before: int, limit: int) -> list[str]: ...
+    def set_status(self, action_ids: list[str], status: str) -> None: ...
+    def export_actions(self, action_ids: list[str]) -> list[dict]: ...
+    def referenced_blobs(self) -> set[str]: ...
+    def delete_actions(self, action_ids: list[str]) -> None: ...
+    def compact(self, max_pages: int = 1000) -> None: ...
 
 
 class Storage:
     def __init__(self, path: str):
         self.path = path
+        self._local = threading.local()
+        self._connections: list[sqlite3.Connection] = []
+        self._lock = threading.Lock()
         self._init_db()
 
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.path, check_same_thread=False, cached_statements=STATEMENT_CACHE_SIZE)
+        connection.row_factory = sqlite3.Row
+        for pragma in CONNECTION_PRAGMAS:
+            connection.execute(pragma)
+        with self._lock:
+            self._connections.append(connection)
+        return connection
+
+    def _thread_connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = self._connect()
+            self._local.connection = connection
+        return connection
+
     @contextmanager
     def conn(self):
-        connection = sqlite3.connect(self.path)
-        connection.row_factory = sqlite3.Row
+        connection = self._thread_connection()
+        depth = getattr(self._local, "depth", 0)
+        self._local.depth = depth + 1
         try:
             yield connection
-            connection.commit()
+        except BaseException:
+            if depth == 0:
+                connection.rollback()
+            raise
+        else:
+            if depth == 0:
+                connection.commit()
         finally:
+            self._local.depth = depth
+
+    @contextmanager
+    def transaction(self):
+        # Storage calls inside the block share this thread's connection; only
+        # the outermost block commits, so the whole unit lands in one fsync.
+        with self.conn() as connection:
+            if not connection.in_transaction:
+                connection.execute("BEGIN IMMEDIATE")
+                yield connection
+                return
+            # A failed nested block (e.g. one item of a batch losing a claim)
+            # is undone on its own without aborting the enclosing unit.
+            connection.execute("SAVEPOINT nested")
+            try:
+                yield connection
+            except BaseException:
+                connection.execute("ROLLBACK TO nested")
+                raise
+            finally:
+                connection.execute("RELEASE nested")
+
+    def close(self) -> None:
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for connection in connections:
             connection.close()
+        self._local = threading.local()
 
     def _init_db(self):
         with self.conn() as conn:
+            # Only takes effect on a fresh database; compact() converts older ones.
+            conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            conn.execute("PRAGMA journal_mode=WAL")
             conn.executescript(
                 """
                 CREATE TABLE IF NOT EXISTS actions (
@@ -56,23 +189,49 @@ class Storage:
                 );
                 """
             )
+        self._migrate()
+
+    def schema_version(self) -> int:
+        with self.conn() as conn:
+            return conn.execute("PRAGMA user_version").fetchone()[0]
+
+    def listen(self, callback: Callable[[str, str], None]) -> bool:
+        # Reports status changes made by other processes. SQLite cannot, so
+        # callers treat other processes' writes as invisible to local state.
+        return False
+
+    def _migrate(self):
+        with self.transaction() as conn:
+            current = conn.execute("PRAGMA user_version").fetchone()[0]
+            for version, statements in MIGRATIONS:
+                if version <= current:
+                    continue
+                for statement in statements:
+                    conn.execute(statement)
+                conn.execute(f"PRAGMA user_version={version}")
+
+    def _action_values(self, row: dict) -> tuple:
+        return (
+            row["action_id"],
+            row["tool_name"],
+            row.get("args_json") or json.dumps(row["args"]),
+            row["requested_by"],
+            row["created_at"],
+            row["expires_at"],
+            row.get("approval_expires_at"),
+            row["action_hash"],
+            row["status"],
+        )
 
     def create_action(self, row: dict):
+        self.create_actions([row])
+
+    def create_actions(self, rows: list[dict]):
         with self.conn() as conn:
-            conn.execute(
+            conn.executemany(
                 """INSERT INTO actions(action_id,tool_name,args_json,requested_by,created_at,expires_at,approval_expires_at,action_hash,status)
                 VALUES(?,?,?,?,?,?,?,?,?)""",
-                (
-                    row["action_id"],
-                    row["tool_name"],
-                    json.dumps(row["args"]),
-                    row["requested_by"],
-                    row["created_at"],
-                    row["expires_at"],
-                    row.get("approval_expires_at"),
-                    row["action_hash"],
-                    row["status"],
-                ),
+                [self._action_values(row) for row in rows],
             )
 
     def get_action(self, action_id: str):
@@ -86,6 +245,18 @@ class Storage:
         with self.conn() as conn:
             conn.execute(f"UPDATE actions SET {','.join(f'{k}=?' for k in keys)} WHERE action_id=?", (*values, action_id))
 
+    def claim_action(self, action_id: str, expected: str, status: str, **fields) -> bool:
+        # Compare-and-set on status: exactly one caller, in any process, moves
+        # the action out of `expected`.
+        keys = ["status", *fields]
+        values = [status, *fields.values()]
+        with self.conn() as conn:
+            cursor = conn.execute(
+                f"UPDATE actions SET {','.join(f'{k}=?' for k in keys)} WHERE action_id=? AND status=?",
+                (*values, action_id, expected),
+            )
+        return cursor.rowcount == 1
+
     def create_approval(self, row: dict):
         with self.conn() as conn:
             conn.execute(
@@ -101,9 +272,10 @@ class Storage:
             ).fetchone()
         return dict(row) if row else None
 
-    def mark_approval_used(self, approval_id: int):
+    def mark_approval_used(self, approval_id: int) -> bool:
         with self.conn() as conn:
-            conn.execute("UPDATE approvals SET used=1 WHERE id=?", (approval_id,))
+            cursor = conn.execute("UPDATE approvals SET used=1 WHERE id=? AND used=0", (approval_id,))
+        return cursor.rowcount == 1
 
     def add_audit(self, action_id: str, event_type: str, created_at: int, metadata: dict):
         with self.conn() as conn:
@@ -112,6 +284,18 @@ class Storage:
                 (action_id, event_type, created_at, json.dumps(metadata)),
             )
 
+    def add_audits(self, entries: list[tuple[str, str, int, dict]]) -> list[int]:
+        if not entries:
+            return []
+        with self.transaction() as conn:
+            conn.executemany(
+                "INSERT INTO audit_log(action_id,event_type,created_at,metadata_json) VALUES(?,?,?,?)",
+                [(action_id, event_type, created_at, json.dumps(metadata)) for action_id, event_type, created_at, metadata in entries],
+            )
+            # The write lock is held, so AUTOINCREMENT ids are contiguous.
+            last_id = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+        return list(range(last_id - len(entries) + 1, last_id + 1))
+
     def list_audit(self, action_id: str):
         with self.conn() as conn:
             rows = conn.execute("SELECT * FROM audit_log WHERE action_id=? ORDER BY id", (action_id,)).fetchall()
@@ -123,3 +307,152 @@ class Storage:
                 "INSERT INTO tool_results(action_id,result_json,created_at) VALUES(?,?,?)",
                 (action_id, json.dumps(result), created_at),
             )
+
+    def get_latest_tool_result(self, action_id: str):
+        with self.conn() as conn:
+            row = conn.execute(
+                "SELECT result_json FROM tool_results WHERE action_id=? ORDER BY id DESC LIMIT 1",
+                (action_id,),
+            ).fetchone()
+        return json.loads(row["result_json"]) if row else None
+
+    def get_cached_plan(self, cache_key: str, not_before: int):
+        with self.conn() as conn:
+            row = conn.execute(
+                "SELECT plan_json FROM plan_cache WHERE cache_key=? AND created_at>=?",
+                (cache_key, not_before),
+            ).fetchone()
+        return json.loads(row["plan_json"]) if row else None
+
+    def put_cached_plan(self, cache_key: str, plan: dict, created_at: int):
+        with self.conn() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO plan_cache(cache_key,plan_json,created_at) VALUES(?,?,?)",
+                (cache_key, json.dumps(plan), created_at),
+            )
+
+    def prune_plan_cache(self, not_before: int, max_rows: int):
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM plan_cache WHERE created_at<?", (not_before,))
+            conn.execute(
+                "DELETE FROM plan_cache WHERE cache_key NOT IN (SELECT cache_key FROM plan_cache ORDER BY created_at DESC LIMIT ?)",
+                (max_rows,),
+            )
+
+    def find_actions_due(self, statuses: list[str], before: int, limit: int) -> list[str]:
+        placeholders = ",".join("?" for _ in statuses)
+        with self.conn() as conn:
+            rows = conn.execute(
+                f"SELECT action_id FROM actions WHERE status IN ({placeholders}) AND expires_at < ? ORDER BY expires_at LIMIT ?",
+                (*statuses, before, limit),
+            ).fetchall()
+        return [row["action_id"] for row in rows]
+
+    def set_status(self, action_ids: list[str], status: str) -> None:
+        with self.conn() as conn:
+            conn.executemany("UPDATE actions SET status=? WHERE action_id=?", [(status, action_id) for action_id in action_ids])
+
+    def export_actions(self, action_ids: list[str]) -> list[dict]:
+        records = []
+        with self.conn() as conn:
+            for action_id in action_ids:
+                action = conn.execute("SELECT * FROM actions WHERE action_id=?", (action_id,)).fetchone()
+                if action is None:
+                    continue
+                records.append(
+                    {
+                        "action": dict(action),
+                        "approvals": [dict(r) for r in conn.execute("SELECT * FROM approvals WHERE action_id=? ORDER BY id", (action_id,))],
+                        "audit": [dict(r) for r in conn.execute("SELECT * FROM audit_log WHERE action_id=? ORDER BY id", (action_id,))],
+                        "tool_results": [dict(r) for r in conn.execute("SELECT * FROM tool_results WHERE action_id=? ORDER BY id", (action_id,))],
+                    }
+                )
+        return records
+
+    def referenced_blobs(self) -> set[str]:
+        digests = set()
+        queries = (
+            "SELECT args_json FROM actions WHERE args_json LIKE '%\"$blob\"%'",
+            "SELECT result_json FROM tool_results WHERE result_json LIKE '%\"$blob\"%'",
+            "SELECT metadata_json FROM audit_log WHERE metadata_json LIKE '%\"$blob\"%'",
+        )
+        with self.conn() as conn:
+            for sql in queries:
+                for (text,) in conn.execute(sql):
+                    digests |= references(text)
+        return digests
+
+    def delete_actions(self, action_ids: list[str]) -> None:
+        params = [(action_id,) for action_id in action_ids]
+        with self.transaction() as conn:
+            for table in ("approvals", "audit_log", "tool_results", "actions"):
+                conn.executemany(f"DELETE FROM {table} WHERE action_id=?", params)
+
+    def compact(self, max_pages: int = 1000) -> None:
+        with self.conn() as conn:
+            if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+                # One-off conversion of databases created before incremental vacuum.
+                conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+                conn.execute("VACUUM")
+                return
+            conn.execute(f"PRAGMA incremental_vacuum({int(max_pages)})").fetchall()
+
+
+# Awaitable facade over Storage. SQLite has no non-blocking driver, so, like
+# aiosqlite, calls run on a small dedicated executor whose threads each keep a
+# pooled connection and are never occupied by slow tool executions.
+class AsyncStorage:
+    def __init__(self, storage: StorageBackend, max_workers: int = 4):
+        self.storage = storage
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="pancho-storage")
+
+    async def run(self, fn, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(fn, *args, **kwargs))
+
+    def __getattr__(self, name: str):
+        target = getattr(self.storage, name)
+        if not callable(target):
+            return target
+
+        async def call(*args, **kwargs):
+            return await self.run(target, *args, **kwargs)
+
+        return call
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True)
+
+
+TIMED_METHODS = (
+    "create_actions",
+    "get_action",
+    "update_action",
+    "claim_action",
+    "create_approval",
+    "get_latest_approval",
+    "mark_approval_used",
+    "add_audit",
+    "add_audits",
+    "list_audit",
+    "save_tool_result",
+    "get_latest_tool_result",
+    "get_cached_plan",
+    "put_cached_plan",
+    "prune_plan_cache",
+    "find_actions_due",
+    "set_status",
+    "export_actions",
+    "referenced_blobs",
+    "delete_actions",
+    "compact",
+)
+
+
+def instrument(cls: type) -> type:
+    for method in TIMED_METHODS:
+        setattr(cls, method, timed_method(STORAGE_SECONDS, method)(getattr(cls, method)))
+    return cls
+
+
+instrument(Storage)
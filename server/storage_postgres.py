@@ -0,0 +1,387 @@
+import json
+import logging
+import threading
+import uuid
+from contextlib import contextmanager
+from typing import Callable
+
+from .blobs import references
+from .storage import instrument
+
+try:
+    import psycopg
+    from psycopg.rows import dict_row
+    from psycopg_pool import ConnectionPool
+except ImportError:
+    psycopg = None
+
+logger = logging.getLogger(__name__)
+
+NOTIFY_CHANNEL = "panchobot_actions"
+SCHEMA_LOCK_ID = 0x70616E63686F
+
+# Same tables and indexes as the SQLite schema, plus a trigger that publishes
+# every status change on NOTIFY_CHANNEL when its transaction commits.
+MIGRATIONS: list[tuple[int, tuple[str, ...]]] = [
+    (
+        1,
+        (
+            """CREATE TABLE IF NOT EXISTS actions (
+                action_id TEXT PRIMARY KEY,
+                tool_name TEXT NOT NULL,
+                args_json TEXT NOT NULL,
+                requested_by TEXT NOT NULL,
+                created_at BIGINT NOT NULL,
+                expires_at BIGINT NOT NULL,
+                approval_expires_at BIGINT,
+                action_hash TEXT NOT NULL,
+                status TEXT NOT NULL
+            )""",
+            """CREATE TABLE IF NOT EXISTS approvals (
+                id BIGSERIAL PRIMARY KEY,
+                action_id TEXT NOT NULL,
+                action_hash TEXT NOT NULL,
+                approved_at BIGINT NOT NULL,
+                expires_at BIGINT NOT NULL,
+                used INTEGER NOT NULL DEFAULT 0
+            )""",
+            """CREATE TABLE IF NOT EXISTS audit_log (
+                id BIGSERIAL PRIMARY KEY,
+                action_id TEXT NOT NULL,
+                event_type TEXT NOT NULL,
+                created_at BIGINT NOT NULL,
+                metadata_json TEXT NOT NULL
+            )""",
+            """CREATE TABLE IF NOT EXISTS tool_results (
+                id BIGSERIAL PRIMARY KEY,
+                action_id TEXT NOT NULL,
+                result_json TEXT NOT NULL,
+                created_at BIGINT NOT NULL
+            )""",
+            """CREATE TABLE IF NOT EXISTS plan_cache (
+                cache_key TEXT PRIMARY KEY,
+                plan_json TEXT NOT NULL,
+                created_at BIGINT NOT NULL
+            )""",
+            "CREATE INDEX IF NOT EXISTS idx_audit_log_action ON audit_log(action_id, id)",
+            "CREATE INDEX IF NOT EXISTS idx_approvals_action ON approvals(action_id, id)",
+            "CREATE INDEX IF NOT EXISTS idx_tool_results_action ON tool_results(action_id, id)",
+            "CREATE INDEX IF NOT EXISTS idx_actions_status_expires ON actions(status, expires_at)",
+            "CREATE INDEX IF NOT EXISTS idx_plan_cache_created ON plan_cache(created_at)",
+            f"""CREATE OR REPLACE FUNCTION panchobot_notify_action() RETURNS trigger AS $$
+            BEGIN
+                PERFORM pg_notify('{NOTIFY_CHANNEL}', json_build_object('action_id', NEW.action_id, 'status', NEW.status)::text);
+                RETURN NEW;
+            END
+            $$ LANGUAGE plpgsql""",
+            "DROP TRIGGER IF EXISTS panchobot_actions_notify ON actions",
+            """CREATE TRIGGER panchobot_actions_notify AFTER INSERT OR UPDATE OF status ON actions
+            FOR EACH ROW EXECUTE FUNCTION panchobot_notify_action()""",
+        ),
+    ),
+    (
+        2,
+        (
+            # Tag notifications with the writer's application_name so a node
+            # can skip its own changes, which it already handled locally.
+            f"""CREATE OR REPLACE FUNCTION panchobot_notify_action() RETURNS trigger AS $$
+            BEGIN
+                PERFORM pg_notify(
+                    '{NOTIFY_CHANNEL}',
+                    json_build_object(
+                        'action_id', NEW.action_id,
+                        'status', NEW.status,
+                        'origin', current_setting('application_name')
+                    )::text
+                );
+                RETURN NEW;
+            END
+            $$ LANGUAGE plpgsql""",
+        ),
+    ),
+]
+
+
+class PostgresStorage:
+    def __init__(self, dsn: str, max_connections: int = 10):
+        if psycopg is None:
+            raise RuntimeError("DATABASE_URL needs the PostgreSQL driver: pip install 'psycopg[binary]' psycopg-pool")
+        self.dsn = dsn
+        self.node_name = f"panchobot-{uuid.uuid4().hex[:12]}"
+        self.pool = ConnectionPool(
+            dsn,
+            min_size=1,
+            max_size=max_connections,
+            kwargs={"row_factory": dict_row, "application_name": self.node_name},
+            open=True,
+        )
+        self._local = threading.local()
+        self._listeners: list[Callable[[str, str], None]] = []
+        self._listener_thread: threading.Thread | None = None
+        self._stopping = threading.Event()
+        self._listening = threading.Event()
+        self._migrate()
+
+    @contextmanager
+    def transaction(self):
+        # Same contract as the SQLite backend: calls inside the block share one
+        # pooled connection and commit together; nested blocks are savepoints.
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            with connection.transaction():
+                yield connection
+            return
+        with self.pool.connection() as connection:
+            self._local.connection = connection
+            try:
+                with connection.transaction():
+                    yield connection
+            finally:
+                self._local.connection = None
+
+    def close(self) -> None:
+        self._stopping.set()
+        if self._listener_thread is not None:
+            self._listener_thread.join(timeout=5)
+        self.pool.close()
+
+    def _migrate(self) -> None:
+        with self.transaction() as conn:
+            # Nodes starting together apply migrations one at a time.
+            conn.execute("SELECT pg_advisory_xact_lock(%s)", (SCHEMA_LOCK_ID,))
+            conn.execute("CREATE TABLE IF NOT EXISTS schema_version (version INTEGER NOT NULL)")
+            row = conn.execute("SELECT version FROM schema_version").fetchone()
+            if row is None:
+                conn.execute("INSERT INTO schema_version(version) VALUES(0)")
+            current = row["version"] if row else 0
+            for version, statements in MIGRATIONS:
+                if version <= current:
+                    continue
+                for statement in statements:
+                    conn.execute(statement)
+                conn.execute("UPDATE schema_version SET version=%s", (version,))
+
+    def schema_version(self) -> int:
+        with self.transaction() as conn:
+            return conn.execute("SELECT version FROM schema_version").fetchone()["version"]
+
+    def listen(self, callback: Callable[[str, str], None]) -> bool:
+        self._listeners.append(callback)
+        if self._listener_thread is None:
+            self._listener_thread = threading.Thread(target=self._listen_loop, name="pancho-pg-listen", daemon=True)
+            self._listener_thread.start()
+            # Changes committed after this returns are guaranteed to be seen.
+            self._listening.wait(timeout=5)
+        return True
+
+    def _listen_loop(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                with psycopg.connect(self.dsn, autocommit=True) as conn:
+                    conn.execute(f"LISTEN {NOTIFY_CHANNEL}")
+                    self._listening.set()
+                    while not self._stopping.is_set():
+                        for notify in conn.notifies(timeout=1.0):
+                            self._dispatch(notify.payload)
+            except psycopg.Error:
+                logger.exception("PostgreSQL listener disconnected; reconnecting")
+                self._stopping.wait(1.0)
+
+    def _dispatch(self, raw: str) -> None:
+        # Errors stay per notification: a dead listener thread would silently
+        # end cross-node cache invalidation while the detail cache stays on.
+        try:
+            payload = json.loads(raw)
+            action_id, status = payload["action_id"], payload["status"]
+        except (ValueError, KeyError, TypeError):
+            logger.exception("Ignoring malformed PostgreSQL notification: %.200s", raw)
+            return
+        if payload.get("origin") == self.node_name:
+            return
+        for callback in list(self._listeners):
+            try:
+                callback(action_id, status)
+            except Exception:
+                logger.exception("Change listener failed for action %s", action_id)
+
+    def create_action(self, row: dict):
+        self.create_actions([row])
+
+    def create_actions(self, rows: list[dict]):
+        with self.transaction() as conn:
+            conn.cursor().executemany(
+                """INSERT INTO actions(action_id,tool_name,args_json,requested_by,created_at,expires_at,approval_expires_at,action_hash,status)
+                VALUES(%s,%s,%s,%s,%s,%s,%s,%s,%s)""",
+                [
+                    (
+                        row["action_id"],
+                        row["tool_name"],
+                        row.get("args_json") or json.dumps(row["args"]),
+                        row["requested_by"],
+                        row["created_at"],
+                        row["expires_at"],
+                        row.get("approval_expires_at"),
+                        row["action_hash"],
+                        row["status"],
+                    )
+                    for row in rows
+                ],
+            )
+
+    def get_action(self, action_id: str):
+        with self.transaction() as conn:
+            return conn.execute("SELECT * FROM actions WHERE action_id=%s", (action_id,)).fetchone()
+
+    def update_action(self, action_id: str, **fields):
+        keys = list(fields.keys())
+        values = [json.dumps(v) if isinstance(v, (dict, list)) else v for v in fields.values()]
+        with self.transaction() as conn:
+            conn.execute(f"UPDATE actions SET {','.join(f'{k}=%s' for k in keys)} WHERE action_id=%s", (*values, action_id))
+
+    def claim_action(self, action_id: str, expected: str, status: str, **fields) -> bool:
+        keys = ["status", *fields]
+        values = [status, *fields.values()]
+        with self.transaction() as conn:
+            cursor = conn.execute(
+                f"UPDATE actions SET {','.join(f'{k}=%s' for k in keys)} WHERE action_id=%s AND status=%s",
+                (*values, action_id, expected),
+            )
+        return cursor.rowcount == 1
+
+    def create_approval(self, row: dict):
+        with self.transaction() as conn:
+            conn.execute(
+                "INSERT INTO approvals(action_id,action_hash,approved_at,expires_at,used) VALUES(%s,%s,%s,%s,0)",
+                (row["action_id"], row["action_hash"], row["approved_at"], row["expires_at"]),
+            )
+
+    def get_latest_approval(self, action_id: str):
+        with self.transaction() as conn:
+            return conn.execute(
+                "SELECT * FROM approvals WHERE action_id=%s ORDER BY id DESC LIMIT 1",
+                (action_id,),
+            ).fetchone()
+
+    def mark_approval_used(self, approval_id: int) -> bool:
+        # The UPDATE takes the approval's row lock; a concurrent consumer waits
+        # for it, re-checks used=0 against the committed row and matches nothing.
+        with self.transaction() as conn:
+            cursor = conn.execute("UPDATE approvals SET used=1 WHERE id=%s AND used=0", (approval_id,))
+        return cursor.rowcount == 1
+
+    def add_audit(self, action_id: str, event_type: str, created_at: int, metadata: dict):
+        with self.transaction() as conn:
+            conn.execute(
+                "INSERT INTO audit_log(action_id,event_type,created_at,metadata_json) VALUES(%s,%s,%s,%s)",
+                (action_id, event_type, created_at, json.dumps(metadata)),
+            )
+
+    def add_audits(self, entries: list[tuple[str, str, int, dict]]) -> list[int]:
+        ids = []
+        with self.transaction() as conn:
+            for action_id, event_type, created_at, metadata in entries:
+                row = conn.execute(
+                    "INSERT INTO audit_log(action_id,event_type,created_at,metadata_json) VALUES(%s,%s,%s,%s) RETURNING id",
+                    (action_id, event_type, created_at, json.dumps(metadata)),
+                ).fetchone()
+                ids.append(row["id"])
+        return ids
+
+    def list_audit(self, action_id: str):
+        with self.transaction() as conn:
+            return conn.execute("SELECT * FROM audit_log WHERE action_id=%s ORDER BY id", (action_id,)).fetchall()
+
+    def save_tool_result(self, action_id: str, result: dict, created_at: int):
+        with self.transaction() as conn:
+            conn.execute(
+                "INSERT INTO tool_results(action_id,result_json,created_at) VALUES(%s,%s,%s)",
+                (action_id, json.dumps(result), created_at),
+            )
+
+    def get_latest_tool_result(self, action_id: str):
+        with self.transaction() as conn:
+            row = conn.execute(
+                "SELECT result_json FROM tool_results WHERE action_id=%s ORDER BY id DESC LIMIT 1",
+                (action_id,),
+            ).fetchone()
+        return json.loads(row["result_json"]) if row else None
+
+    def get_cached_plan(self, cache_key: str, not_before: int):
+        with self.transaction() as conn:
+            row = conn.execute(
+                "SELECT plan_json FROM plan_cache WHERE cache_key=%s AND created_at>=%s",
+                (cache_key, not_before),
+            ).fetchone()
+        return json.loads(row["plan_json"]) if row else None
+
+    def put_cached_plan(self, cache_key: str, plan: dict, created_at: int):
+        with self.transaction() as conn:
+            conn.execute(
+                """INSERT INTO plan_cache(cache_key,plan_json,created_at) VALUES(%s,%s,%s)
+                ON CONFLICT (cache_key) DO UPDATE SET plan_json=EXCLUDED.plan_json, created_at=EXCLUDED.created_at""",
+                (cache_key, json.dumps(plan), created_at),
+            )
+
+    def prune_plan_cache(self, not_before: int, max_rows: int):
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM plan_cache WHERE created_at<%s", (not_before,))
+            conn.execute(
+                "DELETE FROM plan_cache WHERE cache_key NOT IN (SELECT cache_key FROM plan_cache ORDER BY created_at DESC LIMIT %s)",
+                (max_rows,),
+            )
+
+    def find_actions_due(self, statuses: list[str], before: int, limit: int) -> list[str]:
+        # Rows are locked for the caller's transaction and rows another node's
+        # sweeper already holds are skipped, so sweeps never overlap.
+        with self.transaction() as conn:
+            rows = conn.execute(
+                "SELECT action_id FROM actions WHERE status = ANY(%s) AND expires_at < %s ORDER BY expires_at LIMIT %s FOR UPDATE SKIP LOCKED",
+                (list(statuses), before, limit),
+            ).fetchall()
+        return [row["action_id"] for row in rows]
+
+    def set_status(self, action_ids: list[str], status: str) -> None:
+        with self.transaction() as conn:
+            conn.execute("UPDATE actions SET status=%s WHERE action_id = ANY(%s)", (status, list(action_ids)))
+
+    def export_actions(self, action_ids: list[str]) -> list[dict]:
+        records = []
+        with self.transaction() as conn:
+            for action_id in action_ids:
+                action = conn.execute("SELECT * FROM actions WHERE action_id=%s", (action_id,)).fetchone()
+                if action is None:
+                    continue
+                records.append(
+                    {
+                        "action": action,
+                        "approvals": conn.execute("SELECT * FROM approvals WHERE action_id=%s ORDER BY id", (action_id,)).fetchall(),
+                        "audit": conn.execute("SELECT * FROM audit_log WHERE action_id=%s ORDER BY id", (action_id,)).fetchall(),
+                        "tool_results": conn.execute("SELECT * FROM tool_results WHERE action_id=%s ORDER BY id", (action_id,)).fetchall(),
+                    }
+                )
+        return records
+
+    def referenced_blobs(self) -> set[str]:
+        digests = set()
+        queries = (
+            "SELECT args_json AS text FROM actions WHERE args_json LIKE %s",
+            "SELECT result_json AS text FROM tool_results WHERE result_json LIKE %s",
+            "SELECT metadata_json AS text FROM audit_log WHERE metadata_json LIKE %s",
+        )
+        with self.transaction() as conn:
+            for sql in queries:
+                for row in conn.execute(sql, ('%"$blob"%',)):
+                    digests |= references(row["text"])
+        return digests
+
+    def delete_actions(self, action_ids: list[str]) -> None:
+        with self.transaction() as conn:
+            for table in ("approvals", "audit_log", "tool_results", "actions"):
+                conn.execute(f"DELETE FROM {table} WHERE action_id = ANY(%s)", (list(action_ids),))
+
+    def compact(self, max_pages: int = 1000) -> None:
+        # Autovacuum reclaims space; there is no per-call work to do.
+        return None
+
+
+instrument(PostgresStorage)
@@ -0,0 +1,136 @@
+import asyncio
+import json
+import threading
+from collections import OrderedDict, deque
+from typing import AsyncIterator
+
+
+def sse_event(event: str, data, event_id: int | None = None) -> str:
+    prefix = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{prefix}event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+class _Channel:
+    def __init__(self, retain_chars: int):
+        self.retain_chars = retain_chars
+        self.replay: deque[tuple[str, str]] = deque()
+        self.replay_size = 0
+        self.subscribers: set[asyncio.Queue] = set()
+
+
+# Fan-out of live tool output per action. Each channel keeps a bounded replay
+# buffer so late subscribers still see the recent tail.
+class OutputHub:
+    def __init__(self, retain_chars: int = 65536, subscriber_queue_size: int = 1024):
+        self.retain_chars = retain_chars
+        self.subscriber_queue_size = subscriber_queue_size
+        self._channels: dict[str, _Channel] = {}
+
+    def open(self, action_id: str) -> None:
+        self._channels.setdefault(action_id, _Channel(self.retain_chars))
+
+    def is_open(self, action_id: str) -> bool:
+        return action_id in self._channels
+
+    def publish(self, action_id: str, stream: str, text: str) -> None:
+        channel = self._channels.get(action_id)
+        if channel is None:
+            return
+        channel.replay.append((stream, text))
+        channel.replay_size += len(text)
+        while channel.replay_size > channel.retain_chars and len(channel.replay) > 1:
+            channel.replay_size -= len(channel.replay.popleft()[1])
+        for queue in channel.subscribers:
+            _offer(queue, (stream, text))
+
+    def sink(self, action_id: str):
+        return lambda stream, text: self.publish(action_id, stream, text)
+
+    def close(self, action_id: str) -> None:
+        channel = self._channels.pop(action_id, None)
+        if channel is None:
+            return
+        for queue in channel.subscribers:
+            _offer(queue, None)
+
+    async def subscribe(self, action_id: str) -> AsyncIterator[tuple[str, str]]:
+        channel = self._channels.get(action_id)
+        if channel is None:
+            return
+        queue: asyncio.Queue = asyncio.Queue(self.subscriber_queue_size)
+        for item in channel.replay:
+            _offer(queue, item)
+        channel.subscribers.add(queue)
+        try:
+            while (item := await queue.get()) is not None:
+                yield item
+        finally:
+            channel.subscribers.discard(queue)
+
+
+# Per-session fan-out of action deltas. Publishers are storage executor and
+# worker threads, so delivery hops onto each subscriber's event loop. Events
+# carry a process-wide sequence number; a short per-session replay buffer lets
+# a reconnecting client resume from its Last-Event-ID.
+class EventBus:
+    def __init__(self, replay_events: int = 256, max_sessions: int = 1024, subscriber_queue_size: int = 1024):
+        self.replay_events = replay_events
+        self.max_sessions = max_sessions
+        self.subscriber_queue_size = subscriber_queue_size
+        self._lock = threading.Lock()
+        self._seq = 0
+        self._replay: OrderedDict[str, deque] = OrderedDict()
+        self._subscribers: dict[str, set[tuple[asyncio.AbstractEventLoop, asyncio.Queue]]] = {}
+
+    def has_subscribers(self) -> bool:
+        return bool(self._subscribers)
+
+    def publish(self, session_id: str, event: str, data: dict) -> None:
+        with self._lock:
+            self._seq += 1
+            item = (self._seq, event, data)
+            replay = self._replay.get(session_id)
+            if replay is None:
+                replay = self._replay[session_id] = deque(maxlen=self.replay_events)
+                while len(self._replay) > self.max_sessions:
+                    self._replay.popitem(last=False)
+            else:
+                self._replay.move_to_end(session_id)
+            replay.append(item)
+            subscribers = list(self._subscribers.get(session_id, ()))
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(_offer, queue, item)
+            except RuntimeError:
+                pass
+
+    async def subscribe(self, session_id: str, after: int | None = None, keepalive_seconds: float = 15.0) -> AsyncIterator[tuple[int, str, dict] | None]:
+        # Yields None after keepalive_seconds without events, so the caller
+        # can write a heartbeat.
+        queue: asyncio.Queue = asyncio.Queue(self.subscriber_queue_size)
+        subscriber = (asyncio.get_running_loop(), queue)
+        with self._lock:
+            if after is not None:
+                for item in self._replay.get(session_id, ()):
+                    if item[0] > after:
+                        _offer(queue, item)
+            self._subscribers.setdefault(session_id, set()).add(subscriber)
+        try:
+            while True:
+                try:
+                    yield await asyncio.wait_for(queue.get(), keepalive_seconds)
+                except asyncio.TimeoutError:
+                    yield None
+        finally:
+            with self._lock:
+                subscribers = self._subscribers.get(session_id)
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self._subscribers[session_id]
+
+
+def _offer(queue: asyncio.Queue, item) -> None:
+    # Slow subscribers lose their oldest items rather than growing memory.
+    if queue.full():
+        queue.get_nowait()
+    queue.put_nowait(item)
@@ -0,0 +1,117 @@
+import asyncio
+import gzip
+import json
+import logging
+import os
+import time
+from pathlib import Path
+
+from .actions import ActionService
+from .blobs import references
+
+logger = logging.getLogger(__name__)
+
+
+def _record_blobs(record: dict) -> set[str]:
+    texts = [record["action"]["args_json"]]
+    texts += [row["result_json"] for row in record["tool_results"]]
+    texts += [row["metadata_json"] for row in record["audit"]]
+    return set().union(*(references(text) for text in texts))
+
+
+class ExpirySweeper:
+    def __init__(
+        self,
+        actions: ActionService,
+        interval_seconds: float = 30,
+        batch_size: int = 500,
+        retention_seconds: int = 0,
+        retention_interval_seconds: float = 3600,
+        archive_dir: str | None = None,
+        vacuum_pages: int = 1000,
+        blob_grace_seconds: float = 3600,
+    ):
+        self.actions = actions
+        self.interval_seconds = interval_seconds
+        self.batch_size = batch_size
+        self.retention_seconds = retention_seconds
+        self.retention_interval_seconds = retention_interval_seconds
+        self.archive_dir = Path(archive_dir) if archive_dir else None
+        self.vacuum_pages = vacuum_pages
+        self.blob_grace_seconds = blob_grace_seconds
+        self._next_retention = 0.0
+        self._task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        if self.interval_seconds > 0 and self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                await self.run_once()
+            except Exception:
+                logger.exception("Expiry sweep failed")
+            await asyncio.sleep(self.interval_seconds)
+
+    async def run_once(self) -> dict:
+        expired = 0
+        while True:
+            batch = await self.actions.async_storage.run(self.actions.sweep_expired, self.batch_size)
+            expired += len(batch)
+            if len(batch) < self.batch_size:
+                break
+        recovered = 0
+        while True:
+            batch = await self.actions.async_storage.run(self.actions.recover_stale_running, self.batch_size)
+            recovered += len(batch)
+            if len(batch) < self.batch_size:
+                break
+        purged = 0
+        if self.retention_seconds > 0 and time.monotonic() >= self._next_retention:
+            self._next_retention = time.monotonic() + self.retention_interval_seconds
+            purged = await self.actions.async_storage.run(self.enforce_retention)
+        return {"expired": expired, "recovered": recovered, "purged": purged}
+
+    def enforce_retention(self) -> int:
+        cutoff = int(time.time()) - self.retention_seconds
+        archive_path = None
+        if self.archive_dir:
+            self.archive_dir.mkdir(parents=True, exist_ok=True)
+            archive_path = self.archive_dir / f"actions-{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}.jsonl.gz"
+
+        def archive(records: list[dict]) -> None:
+            if archive_path is None:
+                return
+            blobs = self.actions.blobs
+            with gzip.open(archive_path, "at", encoding="utf-8") as f:
+                for record in records:
+                    # Blobs may be collected after the purge, so archives carry
+                    # their content.
+                    if blobs:
+                        record["blobs"] = {digest: (blobs.get(digest) or b"").decode("utf-8") for digest in _record_blobs(record)}
+                    f.write(json.dumps(record) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+        purged = 0
+        while True:
+            count = self.actions.purge_terminal(cutoff, self.batch_size, archive)
+            purged += count
+            if count < self.batch_size:
+                break
+        if purged:
+            self.actions.storage.compact(self.vacuum_pages)
+            if self.actions.blobs:
+                self.actions.blobs.collect(self.actions.storage.referenced_blobs(), self.blob_grace_seconds)
+        return purged
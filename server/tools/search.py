@@ -0,0 +1,266 @@
+import bisect
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from pydantic import BaseModel, Field
+
+from .workspace import WorkspacePolicy
+
+MAX_LINE_CHARS = 200
+BINARY_SNIFF_BYTES = 8192
+
+
+class SearchArgs(BaseModel):
+    query: str = Field(min_length=1, max_length=500)
+    path: str = ""
+    case_sensitive: bool = False
+    max_results: int = Field(default=50, ge=1, le=500)
+
+
+class ListTreeArgs(BaseModel):
+    path: str = ""
+    max_depth: int | None = Field(default=None, ge=1)
+    max_entries: int = Field(default=500, ge=1, le=5000)
+
+
+def search_preview(args: SearchArgs) -> str:
+    return f"Search workspace{f' under {args.path}' if args.path else ''} for: {args.query[:120]}"
+
+
+def list_tree_preview(args: ListTreeArgs) -> str:
+    return f"List workspace files{f' under {args.path}' if args.path else ''}"
+
+
+def _trigrams(text: str) -> set[str]:
+    return {text[i : i + 3] for i in range(len(text) - 2)}
+
+
+@dataclass
+class IndexedFile:
+    size: int
+    mtime_ns: int
+    trigrams: set[str] = field(default_factory=set)
+    text: bool = False
+
+
+@dataclass
+class _Snapshot:
+    files: dict[str, IndexedFile] = field(default_factory=dict)
+    postings: dict[str, set[str]] = field(default_factory=dict)
+    ordered: list[str] = field(default_factory=list)
+    # Text files too short to have a trigram; only short queries can hit them.
+    short: frozenset[str] = frozenset()
+    truncated: bool = False
+
+
+# In-process index of workspace paths, sizes, mtimes and a trigram index over
+# lowercased file content, kept current by an mtime scan that only re-reads
+# changed files. Rescans build a new snapshot copy-on-write, outside the lock,
+# and swap it in; queries take the current snapshot and never wait on a
+# rescan or read files under the lock. A stale index is served while a
+# background scan runs, at most once per rescan interval. An interval of 0
+# rescans synchronously on every query.
+class WorkspaceIndex:
+    def __init__(
+        self,
+        policy: WorkspacePolicy,
+        max_file_bytes: int = 1 << 20,
+        max_files: int = 100000,
+        rescan_interval_seconds: float = 2.0,
+    ):
+        self.policy = policy
+        self.max_file_bytes = max_file_bytes
+        self.max_files = max_files
+        self.rescan_interval_seconds = rescan_interval_seconds
+        self._snapshot = _Snapshot()
+        self._scanned_at: float | None = None
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._rescanning = threading.Event()
+
+    @property
+    def files(self) -> dict[str, IndexedFile]:
+        return self._snapshot.files
+
+    @property
+    def postings(self) -> dict[str, set[str]]:
+        return self._snapshot.postings
+
+    @property
+    def truncated(self) -> bool:
+        return self._snapshot.truncated
+
+    def _current(self) -> _Snapshot:
+        with self._lock:
+            return self._snapshot
+
+    def _walk(self) -> tuple[dict[str, os.stat_result], bool]:
+        found: dict[str, os.stat_result] = {}
+        stack = [self.policy.workspace]
+        while stack and len(found) < self.max_files:
+            directory = stack.pop()
+            try:
+                entries = list(os.scandir(directory))
+            except OSError:
+                continue
+            for entry in entries:
+                # Symlinks are skipped so the index never leaves the workspace.
+                if entry.is_symlink():
+                    continue
+                if entry.is_dir():
+                    stack.append(Path(entry.path))
+                elif entry.is_file() and len(found) < self.max_files:
+                    found[Path(entry.path).relative_to(self.policy.workspace).as_posix()] = entry.stat()
+        return found, bool(stack) or len(found) >= self.max_files
+
+    def _read_text(self, relative_path: str, size: int) -> str | None:
+        if size > self.max_file_bytes:
+            return None
+        try:
+            data = (self.policy.workspace / relative_path).read_bytes()
+        except OSError:
+            return None
+        if b"\0" in data[:BINARY_SNIFF_BYTES]:
+            return None
+        return data.decode("utf-8", errors="replace")
+
+    def refresh(self, force: bool = False) -> int:
+        with self._refresh_lock:
+            now = time.monotonic()
+            if not force and self._scanned_at is not None and now - self._scanned_at < self.rescan_interval_seconds:
+                return 0
+            current = self._current()
+            found, truncated = self._walk()
+            removed = [path for path in current.files if path not in found]
+            updated = [
+                (path, stat)
+                for path, stat in found.items()
+                if (entry := current.files.get(path)) is None or entry.size != stat.st_size or entry.mtime_ns != stat.st_mtime_ns
+            ]
+            if removed or updated or truncated != current.truncated:
+                self._swap(self._rebuild(current, removed, updated, truncated))
+            self._scanned_at = time.monotonic()
+            return len(removed) + len(updated)
+
+    def _rebuild(self, current: _Snapshot, removed: list[str], updated: list[tuple[str, os.stat_result]], truncated: bool) -> _Snapshot:
+        # Published snapshots are never mutated: the file map is copied and
+        # only the posting sets that change are.
+        files = dict(current.files)
+        postings = dict(current.postings)
+        copied: set[str] = set()
+
+        def posting(gram: str) -> set[str]:
+            if gram not in copied:
+                copied.add(gram)
+                postings[gram] = set(postings.get(gram, ()))
+            return postings[gram]
+
+        for relative_path in [*removed, *(path for path, _ in updated if path in files)]:
+            for gram in files.pop(relative_path).trigrams:
+                paths = posting(gram)
+                paths.discard(relative_path)
+                if not paths:
+                    del postings[gram]
+                    copied.discard(gram)
+        for relative_path, stat in updated:
+            text = self._read_text(relative_path, stat.st_size)
+            entry = IndexedFile(stat.st_size, stat.st_mtime_ns, _trigrams(text.lower()) if text else set(), text is not None)
+            files[relative_path] = entry
+            for gram in entry.trigrams:
+                posting(gram).add(relative_path)
+        short = frozenset(path for path, entry in files.items() if entry.text and not entry.trigrams)
+        return _Snapshot(files, postings, sorted(files), short, truncated)
+
+    def _swap(self, snapshot: _Snapshot) -> None:
+        with self._lock:
+            self._snapshot = snapshot
+
+    def _ensure_fresh(self) -> None:
+        if self._scanned_at is None or self.rescan_interval_seconds <= 0:
+            self.refresh()
+            return
+        stale = time.monotonic() - self._scanned_at >= self.rescan_interval_seconds
+        if stale and not self._rescanning.is_set():
+            self._rescanning.set()
+            threading.Thread(target=self._background_refresh, daemon=True).start()
+
+    def _background_refresh(self) -> None:
+        try:
+            self.refresh()
+        finally:
+            self._rescanning.clear()
+
+    def _under(self, snapshot: _Snapshot, prefix: str):
+        start = bisect.bisect_left(snapshot.ordered, prefix)
+        for relative_path in snapshot.ordered[start:]:
+            if not relative_path.startswith(prefix):
+                break
+            yield relative_path
+
+    def _prefix(self, path: str) -> str:
+        target = self.policy.resolve(path or ".")
+        relative = target.relative_to(self.policy.workspace).as_posix()
+        return "" if relative == "." else relative + "/"
+
+    def _candidates(self, snapshot: _Snapshot, needle: str, prefix: str):
+        grams = _trigrams(needle)
+        if not grams:
+            # Shorter than a trigram: a file containing it either has a
+            # trigram containing it or is too short to have any.
+            paths = set(snapshot.short).union(*(paths for gram, paths in snapshot.postings.items() if needle in gram))
+            return (path for path in sorted(paths) if path.startswith(prefix))
+        postings = sorted((snapshot.postings.get(gram, set()) for gram in grams), key=len)
+        if len(postings[0]) * 8 < len(snapshot.files):
+            candidates = (path for path in sorted(postings[0]) if path.startswith(prefix))
+        else:
+            candidates = self._under(snapshot, prefix)
+        return (path for path in candidates if all(path in posting for posting in postings))
+
+    def search(self, args: SearchArgs) -> dict:
+        prefix = self._prefix(args.path)
+        self._ensure_fresh()
+        snapshot = self._current()
+        needle = args.query if args.case_sensitive else args.query.lower()
+        matches = []
+        for relative_path in self._candidates(snapshot, needle.lower(), prefix):
+            entry = snapshot.files[relative_path]
+            if not entry.text:
+                continue
+            text = self._read_text(relative_path, entry.size)
+            if text is None:
+                continue
+            for number, line in enumerate(text.split("\n"), start=1):
+                if needle in (line if args.case_sensitive else line.lower()):
+                    matches.append({"path": relative_path, "line": number, "text": line[:MAX_LINE_CHARS]})
+                    if len(matches) >= args.max_results:
+                        break
+            if len(matches) >= args.max_results:
+                break
+        return {
+            "query": args.query,
+            "matches": matches,
+            "truncated": len(matches) >= args.max_results,
+            "files_indexed": len(snapshot.files),
+            "index_truncated": snapshot.truncated,
+        }
+
+    def list_tree(self, args: ListTreeArgs) -> dict:
+        prefix = self._prefix(args.path)
+        self._ensure_fresh()
+        snapshot = self._current()
+        selected = []
+        for relative_path in self._under(snapshot, prefix):
+            if args.max_depth is not None and relative_path[len(prefix) :].count("/") >= args.max_depth:
+                continue
+            entry = snapshot.files[relative_path]
+            selected.append({"path": relative_path, "size": entry.size, "mtime": entry.mtime_ns // 1_000_000_000})
+            if len(selected) > args.max_entries:
+                break
+        return {
+            "path": args.path,
+            "files": selected[: args.max_entries],
+            "truncated": len(selected) > args.max_entries or snapshot.truncated,
+        }
@@ -1,6 +1,11 @@
+import asyncio
+import codecs
 import shlex
 import subprocess
+import threading
+from collections import deque
 from pathlib import Path
+from typing import Callable
 
 from pydantic import BaseModel, Field
 
@@ -10,12 +15,55 @@ class ShellArgs(BaseModel):
 
 
 FORBIDDEN_TOKENS = {"|", ">", "<", ">>", "&&", ";", "$", "`"}
+READ_CHUNK_BYTES = 4096
+
+OutputSink = Callable[[str, str], None]
 
 
 class ShellPolicy:
-    def __init__(self, workspace_dir: str, allowlisted_commands: list[str]):
+    def __init__(
+        self,
+        workspace_dir: str,
+        allowlisted_commands: list[str],
+        timeout_seconds: float = 300,
+        max_output_bytes: int = 65536,
+    ):
         self.workspace = Path(workspace_dir).resolve()
         self.allowlisted_commands = set(allowlisted_commands)
+        self.timeout_seconds = timeout_seconds
+        self.max_output_bytes = max_output_bytes
+
+
+class OutputBuffer:
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.truncated = False
+        self._chunks: deque[bytes] = deque()
+        self._size = 0
+
+    def append(self, data: bytes) -> None:
+        self._chunks.append(data)
+        self._size += len(data)
+        while self._size > self.limit:
+            excess = self._size - self.limit
+            head = self._chunks[0]
+            if len(head) <= excess:
+                self._chunks.popleft()
+                self._size -= len(head)
+            else:
+                self._chunks[0] = head[excess:]
+                self._size -= excess
+            self.truncated = True
+
+    def text(self) -> str:
+        data = b"".join(self._chunks)
+        if self.truncated:
+            # Drop a UTF-8 sequence cut in half by the ring buffer.
+            start = 0
+            while start < min(len(data), 3) and data[start] & 0xC0 == 0x80:
+                start += 1
+            data = data[start:]
+        return data.decode("utf-8", errors="replace")
 
 
 class ShellTool:
@@ -42,12 +90,80 @@ class ShellTool:
                     raise ValueError("cat can only read files inside workspace")
         return parts
 
-    def execute(self, args: ShellArgs) -> dict:
-        parts = self._validate(args.command)
-        proc = subprocess.run(parts, cwd=self.policy.workspace, capture_output=True, text=True, check=False)
+    def _buffers(self) -> dict[str, OutputBuffer]:
+        return {"stdout": OutputBuffer(self.policy.max_output_bytes), "stderr": OutputBuffer(self.policy.max_output_bytes)}
+
+    def _result(self, args: ShellArgs, returncode: int, buffers: dict[str, OutputBuffer], timed_out: bool) -> dict:
         return {
             "command": args.command,
-            "returncode": proc.returncode,
-            "stdout": proc.stdout,
-            "stderr": proc.stderr,
+            "returncode": returncode,
+            "stdout": buffers["stdout"].text(),
+            "stderr": buffers["stderr"].text(),
+            "stdout_truncated": buffers["stdout"].truncated,
+            "stderr_truncated": buffers["stderr"].truncated,
+            "timed_out": timed_out,
         }
+
+    # Plain blocking subprocess, so it is safe to call from any thread,
+    # including one that is already running an event loop.
+    def execute(self, args: ShellArgs) -> dict:
+        parts = self._validate(args.command)
+        proc = subprocess.Popen(parts, cwd=self.policy.workspace, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        buffers = self._buffers()
+
+        def pump(name: str, pipe) -> None:
+            with pipe:
+                while chunk := pipe.read1(READ_CHUNK_BYTES):
+                    buffers[name].append(chunk)
+
+        pumps = [threading.Thread(target=pump, args=(name, getattr(proc, name)), daemon=True) for name in buffers]
+        for thread in pumps:
+            thread.start()
+        timed_out = False
+        try:
+            proc.wait(self.policy.timeout_seconds)
+        except subprocess.TimeoutExpired:
+            timed_out = True
+            proc.kill()
+            proc.wait()
+        for thread in pumps:
+            thread.join()
+        return self._result(args, proc.returncode, buffers, timed_out)
+
+    async def execute_async(self, args: ShellArgs) -> dict:
+        return await self.stream(args)
+
+    async def stream(self, args: ShellArgs, on_output: OutputSink | None = None) -> dict:
+        parts = self._validate(args.command)
+        proc = await asyncio.create_subprocess_exec(
+            *parts,
+            cwd=self.policy.workspace,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        buffers = self._buffers()
+
+        async def pump(name: str, pipe: asyncio.StreamReader) -> None:
+            decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+            while chunk := await pipe.read(READ_CHUNK_BYTES):
+                buffers[name].append(chunk)
+                if on_output:
+                    text = decoder.decode(chunk)
+                    if text:
+                        on_output(name, text)
+            if on_output:
+                tail = decoder.decode(b"", final=True)
+                if tail:
+                    on_output(name, tail)
+
+        timed_out = False
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(pump("stdout", proc.stdout), pump("stderr", proc.stderr), proc.wait()),
+                self.policy.timeout_seconds,
+            )
+        except asyncio.TimeoutError:
+            timed_out = True
+            proc.kill()
+            await proc.wait()
+        return self._result(args, proc.returncode, buffers, timed_out)
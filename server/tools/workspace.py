@@ -1,15 +1,70 @@
+import difflib
+import hashlib
+import mmap
+import os
+import re
+import tempfile
 from pathlib import Path
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, model_validator
+
+SHA256_PATTERN = r"^[0-9a-f]{64}$"
+MAX_PREVIEW_LINES = 200
+MAX_PREVIEW_BYTES = 1 << 20
+HASH_CHUNK_BYTES = 1 << 20
+HUNK_RE = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
 
 
 class ReadFileArgs(BaseModel):
     path: str = Field(min_length=1)
+    offset: int = Field(default=0, ge=0)
+    length: int | None = Field(default=None, gt=0)
+    start_line: int | None = Field(default=None, ge=1)
+    end_line: int | None = Field(default=None, ge=1)
+
+    @model_validator(mode="after")
+    def _check_window(self):
+        if self.start_line is None:
+            if self.end_line is not None:
+                raise ValueError("end_line requires start_line")
+            return self
+        if self.offset or self.length is not None:
+            raise ValueError("Use either offset/length or start_line/end_line")
+        if self.end_line is not None and self.end_line < self.start_line:
+            raise ValueError("end_line must be >= start_line")
+        return self
 
 
 class WriteFileArgs(BaseModel):
     path: str = Field(min_length=1)
     content: str
+    base_sha256: str | None = Field(default=None, pattern=SHA256_PATTERN)
+
+
+class RangeEdit(BaseModel):
+    start_line: int = Field(ge=1)
+    # Inclusive; defaults to start_line. start_line - 1 inserts before start_line.
+    end_line: int | None = Field(default=None, ge=0)
+    content: str
+
+    @model_validator(mode="after")
+    def _check_range(self):
+        if self.end_line is not None and self.end_line < self.start_line - 1:
+            raise ValueError("end_line must be >= start_line - 1")
+        return self
+
+
+class ApplyPatchArgs(BaseModel):
+    path: str = Field(min_length=1)
+    base_sha256: str | None = Field(default=None, pattern=SHA256_PATTERN)
+    diff: str | None = None
+    edits: list[RangeEdit] | None = None
+
+    @model_validator(mode="after")
+    def _check_patch(self):
+        if (self.diff is None) == (self.edits is None):
+            raise ValueError("Provide exactly one of diff or edits")
+        return self
 
 
 class WorkspacePolicy:
@@ -25,15 +80,172 @@ class WorkspacePolicy:
 
 
 def read_file_preview(args: ReadFileArgs) -> str:
+    if args.start_line is not None:
+        return f"Read file from workspace: {args.path} (lines {args.start_line}-{args.end_line or 'end'})"
+    if args.offset or args.length is not None:
+        return f"Read file from workspace: {args.path} (bytes {args.offset}+{args.length or 'max'})"
     return f"Read file from workspace: {args.path}"
 
 
-def write_file_preview(args: WriteFileArgs) -> str:
-    lines = args.content.splitlines()
-    diff_preview = "\n".join(f"+ {line}" for line in lines[:20])
-    if len(lines) > 20:
-        diff_preview += "\n+ ..."
-    return f"Write file in workspace: {args.path}\n{diff_preview}"
+def _utf8_lead_skip(data: bytes) -> int:
+    skip = 0
+    while skip < min(len(data), 3) and data[skip] & 0xC0 == 0x80:
+        skip += 1
+    return skip
+
+
+def _utf8_complete_length(data: bytes) -> int:
+    for back in range(1, min(len(data), 4) + 1):
+        byte = data[-back]
+        if byte & 0xC0 == 0x80:
+            continue
+        if byte < 0x80:
+            needed = 1
+        elif byte >= 0xF0:
+            needed = 4
+        elif byte >= 0xE0:
+            needed = 3
+        else:
+            needed = 2
+        return len(data) if back >= needed else len(data) - back
+    return len(data)
+
+
+def _split_lines(text: str) -> list[str]:
+    parts = text.split("\n")
+    lines = [part + "\n" for part in parts[:-1]]
+    if parts[-1]:
+        lines.append(parts[-1])
+    return lines
+
+
+def _apply_edits(lines: list[str], edits: list[RangeEdit]) -> list[str]:
+    spans = sorted(
+        ((edit.start_line, edit.start_line if edit.end_line is None else edit.end_line, edit.content) for edit in edits),
+        key=lambda span: span[:2],
+    )
+    for (_, previous_end, _), (start, _, _) in zip(spans, spans[1:]):
+        if start <= previous_end:
+            raise ValueError("Edits overlap")
+    result = list(lines)
+    for start, end, content in reversed(spans):
+        if start > len(result) + 1 or end > len(result):
+            raise ValueError(f"Edit {start}-{end} is outside the file ({len(result)} lines)")
+        replacement = _split_lines(content)
+        if replacement and not replacement[-1].endswith("\n") and end < len(result):
+            replacement[-1] += "\n"
+        if start > len(result) and result and not result[-1].endswith("\n"):
+            result[-1] += "\n"
+        result[start - 1 : end] = replacement
+    return result
+
+
+def _apply_unified_diff(lines: list[str], diff: str) -> list[str]:
+    result: list[str] = []
+    position = 0
+    old_left = new_left = 0
+    hunks = 0
+    last_tag = ""
+    for line in diff.split("\n"):
+        if line.startswith("\\"):
+            # "\ No newline at end of file" refers to the previous line.
+            if last_tag != "-" and result and result[-1].endswith("\n"):
+                result[-1] = result[-1][:-1]
+            continue
+        if old_left == 0 and new_left == 0:
+            match = HUNK_RE.match(line)
+            if match:
+                old_count = 1 if match.group(2) is None else int(match.group(2))
+                old_start = int(match.group(1)) - (1 if old_count else 0)
+                if old_start < position or old_start > len(lines):
+                    raise ValueError("Hunks overlap, are out of order or are outside the file")
+                result.extend(lines[position:old_start])
+                position = old_start
+                old_left = old_count
+                new_left = 1 if match.group(4) is None else int(match.group(4))
+                hunks += 1
+            elif line.startswith("+++ ") and hunks:
+                raise ValueError("Patch touches more than one file")
+            continue
+        tag, text = line[:1], line[1:]
+        last_tag = tag
+        if tag == "+":
+            result.append(text + "\n")
+            new_left -= 1
+            continue
+        if tag not in (" ", "-", ""):
+            raise ValueError(f"Malformed hunk line: {line[:40]}")
+        # Some tools strip the space from blank context lines.
+        current = lines[position] if position < len(lines) else None
+        if current is None or current.rstrip("\n") != text:
+            raise ValueError(f"Patch does not apply at line {position + 1}")
+        if tag != "-":
+            result.append(current)
+            new_left -= 1
+        old_left -= 1
+        position += 1
+    if old_left > 0 or new_left > 0:
+        raise ValueError("Patch ends in the middle of a hunk")
+    if not hunks:
+        raise ValueError("Patch has no hunks")
+    result.extend(lines[position:])
+    return result
+
+
+def apply_patch_text(current: str, args: ApplyPatchArgs) -> str:
+    lines = _split_lines(current)
+    patched = _apply_edits(lines, args.edits) if args.edits is not None else _apply_unified_diff(lines, args.diff)
+    return "".join(patched)
+
+
+def render_diff(path: str, before: str, after: str) -> str:
+    diff = list(difflib.unified_diff(_split_lines(before), _split_lines(after), f"a/{path}", f"b/{path}"))
+    if not diff:
+        return "(no changes)"
+    shown = [line if line.endswith("\n") else line + "\n\\ No newline at end of file\n" for line in diff[:MAX_PREVIEW_LINES]]
+    text = "".join(shown).rstrip("\n")
+    if len(diff) > MAX_PREVIEW_LINES:
+        text += f"\n... {len(diff) - MAX_PREVIEW_LINES} more diff lines"
+    return text
+
+
+def write_file_preview(args: WriteFileArgs, current: str = "") -> str:
+    return f"Write file in workspace: {args.path}\n{render_diff(args.path, current, args.content)}"
+
+
+def write_summary_preview(args: WriteFileArgs, current_size: int) -> str:
+    base = f", base sha256 {args.base_sha256}" if args.base_sha256 else ""
+    return (
+        f"Write file in workspace: {args.path}\n"
+        f"(diff omitted: replaces {current_size} bytes{base} with {len(args.content.encode('utf-8'))} bytes)"
+    )
+
+
+def file_sha256(path: Path) -> str | None:
+    if not path.is_file():
+        return None
+    hasher = hashlib.sha256()
+    with path.open("rb") as f:
+        while chunk := f.read(HASH_CHUNK_BYTES):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def _atomic_write(path: Path, data: bytes) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    mode = path.stat().st_mode & 0o777 if path.exists() else None
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        if mode is not None:
+            os.chmod(tmp, mode)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
 
 
 class WorkspaceTools:
@@ -44,12 +256,146 @@ class WorkspaceTools:
         path = self.policy.resolve(args.path)
         if not path.exists() or not path.is_file():
             raise ValueError("File not found")
-        data = path.read_text(encoding="utf-8")
-        limited = data[: self.policy.max_read_bytes]
-        return {"path": args.path, "content": limited, "truncated": len(limited) != len(data)}
+        size = path.stat().st_size
+        if args.start_line is not None:
+            return self._read_lines(path, args, size)
+        limit = self.policy.max_read_bytes
+        wanted = max(size - args.offset, 0) if args.length is None else args.length
+        with path.open("rb") as f:
+            f.seek(args.offset)
+            data = f.read(min(wanted, limit))
+        start = _utf8_lead_skip(data) if args.offset else 0
+        end = len(data) if args.offset + len(data) >= size else _utf8_complete_length(data)
+        next_offset = args.offset + end
+        return {
+            "path": args.path,
+            "content": data[start:end].decode("utf-8", errors="replace"),
+            "truncated": wanted > limit,
+            "size": size,
+            "offset": args.offset + start,
+            "next_offset": next_offset if next_offset < size else None,
+            # Only a whole-file read hashes for free; otherwise hashing would
+            # defeat the bounded read.
+            "sha256": hashlib.sha256(data).hexdigest() if not args.offset and len(data) == size else None,
+        }
+
+    def _read_lines(self, path: Path, args: ReadFileArgs, size: int) -> dict:
+        limit = self.policy.max_read_bytes
+        start = end = resume = 0
+        line = args.start_line
+        truncated = False
+        content = ""
+        digest = hashlib.sha256(b"").hexdigest() if not size else None
+        if size:
+            with path.open("rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                for _ in range(args.start_line - 1):
+                    newline = mm.find(b"\n", start)
+                    start = size if newline == -1 else newline + 1
+                    if start == size:
+                        break
+                end = resume = start
+                while resume < size and (args.end_line is None or line <= args.end_line):
+                    newline = mm.find(b"\n", resume)
+                    line_end = size if newline == -1 else newline + 1
+                    if line_end - start > limit:
+                        truncated = True
+                        if end == start:
+                            # A single line longer than the limit is returned cut short.
+                            end = start + _utf8_complete_length(mm[start : start + limit])
+                            resume = line_end
+                            line += 1
+                        break
+                    end = resume = line_end
+                    line += 1
+                content = mm[start:end].decode("utf-8", errors="replace")
+                if start == 0 and end == size:
+                    digest = hashlib.sha256(mm).hexdigest()
+        return {
+            "path": args.path,
+            "content": content,
+            "truncated": truncated,
+            "size": size,
+            "start_line": args.start_line,
+            "end_line": line - 1 if line > args.start_line else None,
+            "next_line": line if resume < size else None,
+            "sha256": digest,
+        }
+
+    def _current_text(self, path: Path) -> str | None:
+        return path.read_bytes().decode("utf-8") if path.is_file() else None
+
+    def _check_base(self, path: Path, base_sha256: str | None) -> None:
+        if base_sha256 is not None and file_sha256(path) != base_sha256:
+            raise ValueError("File changed since the action was proposed (base_sha256 mismatch)")
+
+    def _write(self, path: Path, relative_path: str, after: str) -> dict:
+        data = after.encode("utf-8")
+        changed = not (path.is_file() and path.stat().st_size == len(data) and path.read_bytes() == data)
+        if changed:
+            _atomic_write(path, data)
+        return {
+            "path": relative_path,
+            "bytes_written": len(data) if changed else 0,
+            "changed": changed,
+            "sha256": hashlib.sha256(data).hexdigest(),
+        }
+
+    def prepare_write(self, args: WriteFileArgs) -> WriteFileArgs:
+        path = self.policy.resolve(args.path)
+        if args.base_sha256 is None and path.is_file():
+            return args.model_copy(update={"base_sha256": file_sha256(path)})
+        return args
+
+    def write_file_preview(self, args: WriteFileArgs) -> str:
+        try:
+            path = self.policy.resolve(args.path)
+        except ValueError as exc:
+            return f"Write file in workspace: {args.path}\n(preview unavailable: {exc})"
+        if not path.is_file():
+            return write_file_preview(args)
+        size = path.stat().st_size
+        if size > MAX_PREVIEW_BYTES or len(args.content) > MAX_PREVIEW_BYTES:
+            return write_summary_preview(args, size)
+        try:
+            current = self._current_text(path)
+        except UnicodeDecodeError:
+            return write_summary_preview(args, size)
+        return write_file_preview(args, current or "")
 
     def write_file(self, args: WriteFileArgs) -> dict:
         path = self.policy.resolve(args.path)
-        path.parent.mkdir(parents=True, exist_ok=True)
-        path.write_text(args.content, encoding="utf-8")
-        return {"path": args.path, "bytes_written": len(args.content.encode("utf-8"))}
+        self._check_base(path, args.base_sha256)
+        return self._write(path, args.path, args.content)
+
+    def _patched(self, path: Path, args: ApplyPatchArgs) -> tuple[str, str]:
+        current = self._current_text(path)
+        if current is None:
+            raise ValueError("File not found")
+        return current, apply_patch_text(current, args)
+
+    def prepare_patch(self, args: ApplyPatchArgs) -> ApplyPatchArgs:
+        # Binds the digest the patch was checked against into the args, and so
+        # into the action hash; execution refuses to run on any other base.
+        path = self.policy.resolve(args.path)
+        self._check_base(path, args.base_sha256)
+        self._patched(path, args)
+        return args.model_copy(update={"base_sha256": file_sha256(path)})
+
+    def apply_patch_preview(self, args: ApplyPatchArgs) -> str:
+        header = f"Patch file in workspace: {args.path}"
+        try:
+            path = self.policy.resolve(args.path)
+            if path.is_file() and path.stat().st_size > MAX_PREVIEW_BYTES:
+                base = f", base sha256 {args.base_sha256}" if args.base_sha256 else ""
+                return f"{header}\n(diff omitted: file is {path.stat().st_size} bytes{base})"
+            self._check_base(path, args.base_sha256)
+            before, after = self._patched(path, args)
+        except ValueError as exc:
+            return f"{header}\n(patch does not apply: {exc})"
+        return f"{header}\n{render_diff(args.path, before, after)}"
+
+    def apply_patch(self, args: ApplyPatchArgs) -> dict:
+        path = self.policy.resolve(args.path)
+        self._check_base(path, args.base_sha256)
+        _, after = self._patched(path, args)
+        return self._write(path, args.path, after)
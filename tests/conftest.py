@@ -1,24 +1,54 @@
+import atexit
+import os
+import shutil
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
 from fastapi.testclient import TestClient
 import pytest
 
+# server.main opens its storage and creates its directories at import time;
+# point those at a scratch directory instead of ./data and ./workspace.
+_IMPORT_ROOT = tempfile.mkdtemp(prefix="panchobot-tests-")
+atexit.register(shutil.rmtree, _IMPORT_ROOT, True)
+os.environ.update(
+    DATABASE_URL="",
+    DB_PATH=os.path.join(_IMPORT_ROOT, "pancho.db"),
+    BLOB_DIR=os.path.join(_IMPORT_ROOT, "blobs"),
+    ARCHIVE_DIR=os.path.join(_IMPORT_ROOT, "archive"),
+    WORKSPACE_DIR=os.path.join(_IMPORT_ROOT, "workspace"),
+)
+
 from server import main
 from server.actions import ActionService
 from server.agent import AgentPlanner
+from server.blobs import BlobStore
 from server.ai.fake_client import FakeAIClient
 from server.config import Settings, ensure_directories
+from server.jobs import ExecutionQueue
 from server.registry import RiskTier, Tool, ToolRegistry
 from server.storage import Storage
+from server.streams import EventBus
+from server.sweeper import ExpirySweeper
+from server.tools.search import ListTreeArgs, SearchArgs, WorkspaceIndex, list_tree_preview, search_preview
 from server.tools.shell import ShellArgs, ShellPolicy, ShellTool
-from server.tools.workspace import ReadFileArgs, WorkspacePolicy, WorkspaceTools, WriteFileArgs, read_file_preview, write_file_preview
+from server.tools.workspace import ApplyPatchArgs, ReadFileArgs, WorkspacePolicy, WorkspaceTools, WriteFileArgs, read_file_preview
 
 
 class ExplainPlanArgs(main.ExplainPlanArgs):
     pass
 
 
-@pytest.fixture
-def app_client(tmp_path):
-    settings = Settings(db_path=str(tmp_path / "test.db"), workspace_dir=str(tmp_path / "workspace"), action_ttl_seconds=5, approval_ttl_seconds=5)
+@contextmanager
+def make_app_client(root: Path, **overrides):
+    settings = Settings(
+        db_path=str(root / "test.db"),
+        workspace_dir=str(root / "workspace"),
+        blob_dir=str(root / "blobs"),
+        **{"action_ttl_seconds": 5, "approval_ttl_seconds": 5, **overrides},
+    )
     ensure_directories(settings)
     storage = Storage(settings.db_path)
     registry = ToolRegistry()
@@ -27,13 +57,44 @@ def app_client(tmp_path):
 
     registry.register(Tool("agent.explain_plan", "", ExplainPlanArgs, RiskTier.SAFE, main.explain_plan_preview, main.explain_plan_execute))
     registry.register(Tool("workspace.read_file", "", ReadFileArgs, RiskTier.SAFE, read_file_preview, ws.read_file))
-    registry.register(Tool("workspace.write_file", "", WriteFileArgs, RiskTier.PRIVILEGED, write_file_preview, ws.write_file))
-    registry.register(Tool("shell.run_allowlisted", "", ShellArgs, RiskTier.PRIVILEGED, sh.preview, sh.execute))
+    index = WorkspaceIndex(ws.policy, rescan_interval_seconds=0)
+    registry.register(Tool("workspace.search", "", SearchArgs, RiskTier.SAFE, search_preview, index.search))
+    registry.register(Tool("workspace.list_tree", "", ListTreeArgs, RiskTier.SAFE, list_tree_preview, index.list_tree))
+    registry.register(Tool("workspace.write_file", "", WriteFileArgs, RiskTier.PRIVILEGED, ws.write_file_preview, ws.write_file, prepare=ws.prepare_write))
+    registry.register(Tool("workspace.apply_patch", "", ApplyPatchArgs, RiskTier.PRIVILEGED, ws.apply_patch_preview, ws.apply_patch, prepare=ws.prepare_patch))
+    registry.register(Tool("shell.run_allowlisted", "", ShellArgs, RiskTier.PRIVILEGED, sh.preview, sh.execute, sh.execute_async, sh.stream))
 
     main.settings = settings
     main.storage = storage
     main.registry = registry
-    main.action_service = ActionService(storage, registry, settings.action_ttl_seconds, settings.approval_ttl_seconds)
+    main.blob_store = BlobStore(settings.blob_dir)
+    main.event_bus = EventBus()
+    main.action_service = ActionService(
+        storage, registry, settings.action_ttl_seconds, settings.approval_ttl_seconds, blobs=main.blob_store, events=main.event_bus
+    )
     main.planner = AgentPlanner(FakeAIClient(), main.action_service)
-    client = TestClient(main.app)
-    return client, settings, main.action_service
+    main.execution_queue = ExecutionQueue(
+        main.action_service, settings.execution_workers, settings.execution_max_queued, settings.execution_per_session_limit
+    )
+    main.sweeper = ExpirySweeper(main.action_service, interval_seconds=0)
+    with TestClient(main.app) as client:
+        yield client, settings, main.action_service
+
+
+@pytest.fixture
+def app_client(tmp_path):
+    with make_app_client(tmp_path) as built:
+        yield built
+
+
+@pytest.fixture
+def wait_for_status():
+    def wait(client, action_id, *statuses, timeout=5.0):
+        deadline = time.monotonic() + timeout
+        while True:
+            detail = client.get(f"/actions/{action_id}").json()
+            if detail["status"] in statuses or time.monotonic() > deadline:
+                return detail
+            time.sleep(0.01)
+
+    return wait
@@ -1,3 +1,15 @@
+import json
+from dataclasses import replace
+
+import pytest
+
+from server.actions import ActionError
+from server.agent import AgentPlanner
+from server.ai.client import PlanOutput, ProposedAction
+from server.ai.fake_client import FakeAIClient
+from server.registry import ToolRegistry
+
+
 def test_agent_plan_returns_structured_plan(app_client):
     client, _, _ = app_client
     response = client.post("/agent/plan", json={"goal": "Create a README in workspace describing this project"})
@@ -15,3 +27,117 @@ def test_unknown_tool_rejected(app_client):
         assert False
     except Exception as exc:
         assert "Unknown tool" in str(exc)
+
+
+def test_bulk_create_matches_stored_detail(app_client):
+    _, _, svc = app_client
+    created = svc.create_proposed_actions(
+        [
+            ("agent.explain_plan", {"plan": "step one"}),
+            ("workspace.write_file", {"path": "a.txt", "content": "x"}),
+            ("workspace.read_file", {"path": "a.txt"}),
+        ],
+        "session",
+    )
+    assert [detail["tool_name"] for detail in created] == ["agent.explain_plan", "workspace.write_file", "workspace.read_file"]
+    svc.detail_cache.clear()
+    for detail in created:
+        assert svc.get_action_detail(detail["action_id"]) == detail
+
+
+def test_bulk_create_validates_everything_before_inserting(app_client):
+    _, _, svc = app_client
+    with pytest.raises(ActionError) as excinfo:
+        svc.create_proposed_actions(
+            [("agent.explain_plan", {"plan": "ok"}), ("workspace.write_file", {"path": "a.txt"})],
+            "session",
+        )
+    assert excinfo.value.status_code == 400
+    assert "content" in excinfo.value.detail
+    with svc.storage.conn() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM actions").fetchone()[0] == 0
+        assert conn.execute("SELECT COUNT(*) FROM audit_log").fetchone()[0] == 0
+
+
+def test_registry_catalog_is_compact_and_versioned(app_client):
+    _, _, svc = app_client
+    catalog = svc.registry.catalog()
+    assert catalog is svc.registry.catalog()
+    assert catalog.names == svc.registry.names()
+    entries = json.loads(catalog.prompt)
+    write = next(entry for entry in entries if entry["name"] == "workspace.write_file")
+    assert write["args"]["required"] == ["path", "content"]
+    assert '"title"' not in catalog.prompt
+
+    registry = ToolRegistry()
+    for name in catalog.names:
+        registry.register(svc.registry.get(name))
+    assert registry.catalog() == catalog
+    registry.register(replace(svc.registry.get("agent.explain_plan"), name="agent.extra"))
+    assert registry.catalog().version != catalog.version
+
+
+def test_planner_repairs_output_before_persisting(app_client):
+    _, _, svc = app_client
+
+    class SloppyClient(FakeAIClient):
+        def plan(self, goal, catalog):
+            action = ProposedAction(tool_name="Workspace_Write-File", args='{"Path": "a.txt", "content": "x"}')
+            return PlanOutput(plan_summary="Write a file.", proposed_actions=[action])
+
+    (created,) = AgentPlanner(SloppyClient(), svc).plan("write", "s")["actions"]
+    assert created["tool_name"] == "workspace.write_file"
+    assert created["args"] == {"path": "a.txt", "content": "x", "base_sha256": None}
+
+
+@pytest.mark.parametrize(
+    ("tool_name", "args", "error"),
+    [
+        ("workspace.delete_file", {"path": "a.txt"}, "Unknown tool: workspace.delete_file"),
+        ("workspace.write_file", {"path": "a.txt", "content": "x", "mode": "w"}, "unknown fields mode"),
+    ],
+)
+def test_repair_never_guesses_tools_or_drops_args(app_client, tool_name, args, error):
+    _, _, svc = app_client
+    goals = []
+
+    class GuessingClient(FakeAIClient):
+        def plan(self, goal, catalog):
+            goals.append(goal)
+            return PlanOutput(plan_summary="Guess.", proposed_actions=[ProposedAction(tool_name, args)])
+
+    with pytest.raises(ActionError, match=error):
+        AgentPlanner(GuessingClient(), svc, repair_rounds=1).plan("tidy up", "s")
+    assert len(goals) == 2 and error in goals[1]
+
+
+def test_planner_asks_for_a_corrected_plan(app_client):
+    _, _, svc = app_client
+    goals = []
+
+    class LearningClient(FakeAIClient):
+        def plan(self, goal, catalog):
+            goals.append(goal)
+            args = {"plan": "fixed"} if len(goals) > 1 else {}
+            return PlanOutput(plan_summary="Explain.", proposed_actions=[ProposedAction("agent.explain_plan", args)])
+
+    result = AgentPlanner(LearningClient(), svc, repair_rounds=1).plan("explain", "s")
+    assert result["actions"][0]["args"] == {"plan": "fixed"}
+    assert "rejected: Invalid args for agent.explain_plan" in goals[1]
+
+    goals.clear()
+    with pytest.raises(ActionError):
+        AgentPlanner(LearningClient(), svc).plan("explain", "s")
+    assert len(goals) == 1
+
+
+def test_args_are_validated_once_and_stored_canonically(app_client):
+    _, _, svc = app_client
+    codec = svc.registry.codec("workspace.write_file")
+    assert codec is svc.registry.codec("workspace.write_file")
+    created = svc.create_proposed_action("workspace.write_file", {"content": "é", "path": "a.txt"}, "session")
+    stored = svc.storage.get_action(created["action_id"])["args_json"]
+    assert stored == '{"base_sha256":null,"content":"é","path":"a.txt"}'
+    assert codec.validate_json(stored) == codec.trusted(json.loads(stored))
+    svc.detail_cache.clear()
+    assert svc.get_action_detail(created["action_id"])["preview"] == created["preview"]
@@ -0,0 +1,63 @@
+import json
+import os
+
+import pytest
+
+from server.blobs import BlobStore, references
+
+
+def test_blob_store_dedups_and_round_trips(tmp_path):
+    store = BlobStore(str(tmp_path), inline_limit=8)
+    value = {"small": "tiny", "big": "é" * 10, "nested": ["é" * 10, 3]}
+    stored = store.externalize(value)
+    assert stored["small"] == "tiny"
+    assert stored["big"] == stored["nested"][0] == {"$blob": stored["big"]["$blob"], "size": 20}
+    assert len(list(tmp_path.glob("??/*"))) == 1
+    assert store.resolve(stored) == value
+    assert references(json.dumps(stored)) == {stored["big"]["$blob"]}
+
+    with pytest.raises(ValueError):
+        store.get("../../etc/passwd")
+    store.path(stored["big"]["$blob"]).write_bytes(b"tampered")
+    with pytest.raises(ValueError):
+        store.resolve(stored)
+
+
+def test_collect_keeps_referenced_and_recent_blobs(tmp_path):
+    store = BlobStore(str(tmp_path))
+    keep, old, recent = (store.put(data) for data in (b"keep", b"old", b"recent"))
+    for digest in (keep, old):
+        os.utime(store.path(digest), (0, 0))
+    assert store.collect({keep}, grace_seconds=60) == 1
+    assert store.get(keep) == b"keep" and store.get(recent) == b"recent"
+    assert store.get(old) is None
+
+
+def test_large_args_and_results_are_stored_as_references(app_client, wait_for_status):
+    client, settings, svc = app_client
+    content = "line of generated text\n" * 1000
+    action = svc.create_proposed_action("workspace.write_file", {"path": "big.txt", "content": content}, "s")
+    ref = action["args"]["content"]
+    assert ref == {"$blob": ref["$blob"], "size": len(content)}
+    assert content not in svc.storage.get_action(action["action_id"])["args_json"]
+    assert client.get(f"/blobs/{ref['$blob']}").text == content
+    assert client.get("/blobs/" + "0" * 64).status_code == 404
+    assert client.get("/blobs/not-a-digest").status_code == 400
+
+    svc.detail_cache.clear()
+    assert client.get(f"/actions/{action['action_id']}").json()["preview"] == action["preview"]
+    client.post("/actions/approve", json={"action_id": action["action_id"]})
+    client.post("/actions/execute", json={"action_id": action["action_id"]})
+    wait_for_status(client, action["action_id"], "EXECUTED")
+    with open(os.path.join(settings.workspace_dir, "big.txt"), encoding="utf-8") as f:
+        assert f.read() == content
+
+    cat = svc.create_proposed_action("shell.run_allowlisted", {"command": "cat big.txt"}, "s")
+    client.post("/actions/approve", json={"action_id": cat["action_id"]})
+    client.post("/actions/execute", json={"action_id": cat["action_id"]})
+    detail = wait_for_status(client, cat["action_id"], "EXECUTED")
+    stdout = detail["result"]["stdout"]
+    assert stdout["$blob"] == ref["$blob"]
+    executed = next(entry for entry in detail["audit"] if entry["event_type"] == "ACTION_EXECUTED")
+    assert ref["$blob"] in executed["metadata_json"] and content not in executed["metadata_json"]
+    assert json.dumps(content) in client.get(f"/actions/{cat['action_id']}/output").text
@@ -0,0 +1,49 @@
+from server.cache import TTLCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_ttl_cache_expires_and_evicts_lru():
+    clock = FakeClock()
+    cache = TTLCache(max_entries=2, ttl_seconds=10, clock=clock)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    clock.now = 11
+    assert cache.get("a") is None
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"]) == (1, 2, 1)
+
+
+def test_ttl_cache_rejects_values_loaded_before_invalidation():
+    cache = TTLCache()
+    version = cache.version
+    cache.invalidate("a")
+    assert cache.put("a", "stale", version) is False
+    assert cache.get("a") is None
+
+
+def test_action_detail_cache_is_invalidated_by_transitions(app_client, wait_for_status):
+    client, _, svc = app_client
+    action = client.post("/agent/plan", json={"goal": "Create a README"}).json()["actions"][0]
+    action_id = action["action_id"]
+    first = client.get(f"/actions/{action_id}").json()
+    hits = svc.detail_cache.hits
+    assert client.get(f"/actions/{action_id}").json() == first
+    assert svc.detail_cache.hits == hits + 1
+
+    assert client.post("/actions/approve", json={"action_id": action_id}).json()["status"] == "APPROVED"
+    assert client.get(f"/actions/{action_id}").json()["status"] == "APPROVED"
+    client.post("/actions/execute", json={"action_id": action_id})
+    assert wait_for_status(client, action_id, "EXECUTED")["status"] == "EXECUTED"
+
+    stats = client.get("/stats").json()["detail_cache"]
+    assert stats["hits"] >= 1 and stats["misses"] >= 1
@@ -1,8 +1,30 @@
+import hashlib
+
+import pytest
+
+from server import crypto
 from server.crypto import action_hash, canonical_json
 
+PAYLOADS = [
+    {},
+    {"b": 1, "a": {"z": 2, "x": 1}},
+    {"text": "é😀\x00\n\"\\" * 30000, "list": [1, -2**70, 1.5, 1e16, float("nan"), True, None, ("t", 1)]},
+    {"ints": {2: "b", 1: "a"}, "floats": {2.5: [], 1.5: {}}},
+    {"args": {"path": "a.txt", "content": "x" * (crypto.HASH_BUFFER_CHARS - 1) + "\t"}, "created_at": 2**62},
+]
+
 
 def test_canonical_json_is_deterministic():
     a = {"b": 1, "a": {"z": 2, "x": 1}}
     b = {"a": {"x": 1, "z": 2}, "b": 1}
     assert canonical_json(a) == canonical_json(b)
     assert action_hash(a) == action_hash(b)
+
+
+@pytest.mark.parametrize("orjson_enabled", [False, crypto.ORJSON_ENABLED])
+@pytest.mark.parametrize("payload", PAYLOADS)
+def test_canonical_digest_matches_hash_of_canonical_json(monkeypatch, payload, orjson_enabled):
+    monkeypatch.setattr(crypto, "ORJSON_ENABLED", orjson_enabled)
+    expected = hashlib.sha256(canonical_json(payload).encode("utf-8")).hexdigest()
+    assert crypto.canonical_digest(payload) == expected
+    assert "".join(crypto._iter_canonical(payload)) == canonical_json(payload)
@@ -1,4 +1,12 @@
-def test_full_flow_plan_approve_execute(app_client):
+import os
+import time
+
+import pytest
+
+from server.actions import ActionError
+
+
+def test_full_flow_plan_approve_execute(app_client, wait_for_status):
     client, settings, _ = app_client
     resp = client.post("/agent/plan", json={"goal": "Create a README in workspace describing this project"})
     assert resp.status_code == 200
@@ -9,8 +17,9 @@ def test_full_flow_plan_approve_execute(app_client):
     assert approve.json()["status"] == "APPROVED"
 
     execute = client.post("/actions/execute", json={"action_id": action["action_id"]})
-    assert execute.status_code == 200
-    assert execute.json()["action"]["status"] == "EXECUTED"
+    assert execute.status_code == 202
+    assert execute.json()["action"]["status"] in {"RUNNING", "EXECUTED"}
+    assert wait_for_status(client, action["action_id"], "EXECUTED")["status"] == "EXECUTED"
 
     again = client.post("/actions/execute", json={"action_id": action["action_id"]})
     assert again.status_code == 400
@@ -25,3 +34,98 @@ def test_full_flow_plan_approve_execute(app_client):
     generated = (settings.workspace_dir + "/README.generated.md")
     with open(generated, "r", encoding="utf-8") as f:
         assert "Create a README" in f.read()
+
+
+def test_shell_action_executes_on_async_path(app_client, wait_for_status):
+    client, settings, svc = app_client
+    with open(settings.workspace_dir + "/notes.txt", "w", encoding="utf-8") as f:
+        f.write("async hello")
+    action = svc.create_proposed_action("shell.run_allowlisted", {"command": "cat notes.txt"}, "s")
+    assert client.post("/actions/approve", json={"action_id": action["action_id"]}).status_code == 200
+
+    execute = client.post("/actions/execute", json={"action_id": action["action_id"]})
+    assert execute.status_code == 202
+    detail = wait_for_status(client, action["action_id"], "EXECUTED")
+    assert detail["status"] == "EXECUTED"
+    assert detail["result"]["stdout"] == "async hello"
+
+
+def test_batch_approve_and_parallel_execute(app_client, wait_for_status):
+    client, settings, svc = app_client
+    created = svc.create_proposed_actions(
+        [("workspace.write_file", {"path": f"f{i}.txt", "content": str(i)}) for i in range(3)],
+        "s",
+    )
+    ids = [action["action_id"] for action in created]
+
+    approved = client.post("/actions/approve:batch", json={"action_ids": ids + ["missing"]}).json()["results"]
+    assert [item["ok"] for item in approved] == [True, True, True, False]
+    assert approved[-1]["status_code"] == 404
+    assert all(item["action"]["status"] == "APPROVED" for item in approved[:3])
+
+    executed = client.post("/actions/execute:batch", json={"action_ids": ids + [ids[0]]})
+    assert executed.status_code == 202
+    results = executed.json()["results"]
+    assert [item["ok"] for item in results] == [True, True, True, False]
+    for action_id in ids:
+        assert wait_for_status(client, action_id, "EXECUTED")["status"] == "EXECUTED"
+    with open(settings.workspace_dir + "/f2.txt", encoding="utf-8") as f:
+        assert f.read() == "2"
+
+
+def test_ordered_batch_stops_after_failure(app_client, wait_for_status):
+    client, _, svc = app_client
+    created = svc.create_proposed_actions(
+        [
+            ("agent.explain_plan", {"plan": "first"}),
+            ("workspace.read_file", {"path": "missing.txt"}),
+            ("agent.explain_plan", {"plan": "never"}),
+            ("workspace.write_file", {"path": "later.txt", "content": "x"}),
+        ],
+        "s",
+    )
+    ids = [action["action_id"] for action in created]
+    svc.approve(ids[3])
+    results = client.post("/actions/execute:batch", json={"action_ids": ids, "mode": "ordered"}).json()["results"]
+    assert all(item["ok"] for item in results)
+
+    assert wait_for_status(client, ids[0], "EXECUTED")["status"] == "EXECUTED"
+    assert wait_for_status(client, ids[1], "FAILED")["status"] == "FAILED"
+    deadline = time.monotonic() + 5
+    while client.get(f"/actions/{ids[3]}").json()["audit"][-1]["event_type"] != "ACTION_SKIPPED" and time.monotonic() < deadline:
+        time.sleep(0.01)
+    for action_id, status in ((ids[2], "PROPOSED"), (ids[3], "APPROVED")):
+        skipped = client.get(f"/actions/{action_id}").json()
+        assert (skipped["status"], skipped["audit"][-1]["event_type"]) == (status, "ACTION_SKIPPED")
+    assert not svc.storage.get_latest_approval(ids[3])["used"]
+    # The untouched step can still be executed on its own.
+    client.post("/actions/execute", json={"action_id": ids[3]})
+    assert wait_for_status(client, ids[3], "EXECUTED")["status"] == "EXECUTED"
+
+
+def test_stale_patch_cannot_be_applied(app_client, wait_for_status):
+    client, settings, svc = app_client
+    target = os.path.join(settings.workspace_dir, "notes.md")
+    with open(target, "w", encoding="utf-8") as f:
+        f.write("title\nbody\n")
+    edit = {"path": "notes.md", "edits": [{"start_line": 2, "content": "new body"}]}
+    action = svc.create_proposed_action("workspace.apply_patch", edit, "s")
+    assert action["args"]["base_sha256"]
+    assert "-body\n+new body" in action["preview"]
+
+    with open(target, "a", encoding="utf-8") as f:
+        f.write("edited meanwhile\n")
+    client.post("/actions/approve", json={"action_id": action["action_id"]})
+    client.post("/actions/execute", json={"action_id": action["action_id"]})
+    detail = wait_for_status(client, action["action_id"], "FAILED")
+    assert "base_sha256 mismatch" in detail["result"]["error"]
+
+    fresh = svc.create_proposed_action("workspace.apply_patch", edit, "s")
+    client.post("/actions/approve", json={"action_id": fresh["action_id"]})
+    client.post("/actions/execute", json={"action_id": fresh["action_id"]})
+    wait_for_status(client, fresh["action_id"], "EXECUTED")
+    with open(target, encoding="utf-8") as f:
+        assert f.read() == "title\nnew body\nedited meanwhile\n"
+
+    with pytest.raises(ActionError):
+        svc.create_proposed_action("workspace.apply_patch", {"path": "notes.md", "diff": "@@ -1 +1 @@\n-nope\n+yes\n"}, "s")
@@ -0,0 +1,67 @@
+import asyncio
+
+from server.actions import FAILED, RUNNING
+from server.jobs import ExecutionQueue
+
+
+def test_execute_endpoint_returns_before_tool_finishes(app_client, wait_for_status):
+    client, _, svc = app_client
+    release = asyncio.Event()
+
+    async def slow_execute(args):
+        await release.wait()
+        return {"summary": args.plan}
+
+    svc.registry.get("agent.explain_plan").execute_async = slow_execute
+    action = svc.create_proposed_action("agent.explain_plan", {"plan": "wait"}, "s")
+    response = client.post("/actions/execute", json={"action_id": action["action_id"]})
+    assert response.status_code == 202
+    assert response.json()["action"]["status"] == RUNNING
+    assert client.post("/actions/execute", json={"action_id": action["action_id"]}).status_code == 400
+
+    client.portal.call(release.set)
+    detail = wait_for_status(client, action["action_id"], "EXECUTED")
+    assert detail["result"] == {"summary": "wait"}
+
+
+def test_failed_tool_marks_action_failed(app_client, wait_for_status):
+    client, _, svc = app_client
+    action = svc.create_proposed_action("workspace.read_file", {"path": "missing.txt"}, "s")
+    assert client.post("/actions/execute", json={"action_id": action["action_id"]}).status_code == 202
+    detail = wait_for_status(client, action["action_id"], FAILED)
+    assert detail["status"] == FAILED
+    assert detail["result"] == {"error": "File not found"}
+    assert detail["audit"][-1]["event_type"] == "ACTION_FAILED"
+
+
+def test_queue_enforces_per_session_and_per_tool_limits(app_client):
+    _, _, svc = app_client
+    active = {"now": 0, "peak": 0}
+
+    async def scenario(per_session, per_tool):
+        active["peak"] = 0
+        gate = asyncio.Event()
+
+        async def tracked(args):
+            active["now"] += 1
+            active["peak"] = max(active["peak"], active["now"])
+            await gate.wait()
+            active["now"] -= 1
+            return {"summary": args.plan}
+
+        svc.registry.get("agent.explain_plan").execute_async = tracked
+        queue = ExecutionQueue(svc, max_workers=8, per_session_limit=per_session, per_tool_limits=per_tool)
+        for i in range(6):
+            action = svc.create_proposed_action("agent.explain_plan", {"plan": str(i)}, "one-session")
+            await queue.submit(action["action_id"])
+        for _ in range(20):
+            await asyncio.sleep(0)
+        peak = active["peak"]
+        gate.set()
+        await queue.drain()
+        assert queue.queued == 0 and queue.running == 0
+        return peak
+
+    assert asyncio.run(scenario(2, None)) == 2
+    assert asyncio.run(scenario(0, {"agent.explain_plan": 1})) == 1
+    assert asyncio.run(scenario(0, None)) == 6
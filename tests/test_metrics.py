@@ -0,0 +1,59 @@
+import re
+
+from server.metrics import MetricsRegistry
+
+
+def _sample(text, name, **labels):
+    for line in text.splitlines():
+        if line.startswith("#"):
+            continue
+        metric, value = line.rsplit(" ", 1)
+        if metric.split("{")[0] != name:
+            continue
+        found = dict(re.findall(r'(\w+)="([^"]*)"', metric))
+        if found == labels:
+            return float(value)
+    return None
+
+
+def test_registry_renders_prometheus_text():
+    registry = MetricsRegistry()
+    requests = registry.counter("requests_total", "Requests.", ("route",))
+    requests.labels('a"b').inc()
+    requests.labels('a"b').inc(2)
+    depth = registry.gauge("depth", "Depth.")
+    depth.set_function(lambda: 7)
+    latency = registry.histogram("latency_seconds", "Latency.", ("method",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 5.0):
+        latency.labels("get").observe(value)
+
+    text = registry.render()
+    assert "# TYPE requests_total counter" in text
+    assert 'requests_total{route="a\\"b"} 3' in text
+    assert "depth 7" in text
+    assert _sample(text, "latency_seconds_bucket", method="get", le="0.1") == 2
+    assert _sample(text, "latency_seconds_bucket", method="get", le="1") == 3
+    assert _sample(text, "latency_seconds_bucket", method="get", le="+Inf") == 4
+    assert _sample(text, "latency_seconds_count", method="get") == 4
+    assert _sample(text, "latency_seconds_sum", method="get") == 5.65
+
+
+def test_metrics_endpoint_reports_action_flow(app_client, wait_for_status):
+    client, settings, svc = app_client
+    before = client.get("/metrics").text
+    action = client.post("/agent/plan", json={"goal": "list files"}, headers={"X-Session-Id": "s"}).json()["actions"][0]
+    client.post("/actions/execute", json={"action_id": action["action_id"]})
+    wait_for_status(client, action["action_id"], "EXECUTED")
+
+    response = client.get("/metrics")
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    text = response.text
+    for status in ("PROPOSED", "RUNNING", "EXECUTED"):
+        name = "panchobot_action_transitions_total"
+        assert _sample(text, name, status=status) == _sample(before, name, status=status) + 1
+    assert _sample(text, "panchobot_action_transitions_total", status="REJECTED") is not None
+    assert _sample(text, "panchobot_planner_seconds_count", method="plan_async") >= 1
+    assert _sample(text, "panchobot_storage_seconds_count", method="create_actions") >= 1
+    assert _sample(text, "panchobot_tool_execute_seconds_count", tool=action["tool_name"], outcome="ok") >= 1
+    assert _sample(text, "panchobot_tool_preview_seconds_count", tool=action["tool_name"]) >= 1
+    assert _sample(text, "panchobot_execution_queue_depth") == 0
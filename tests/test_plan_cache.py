@@ -0,0 +1,72 @@
+from server import main
+from server.agent import AgentPlanner
+from server.ai.fake_client import FakeAIClient
+from server.plan_cache import PlanCache
+
+
+class CountingAIClient(FakeAIClient):
+    def __init__(self):
+        self.calls = 0
+
+    def plan(self, goal, catalog):
+        self.calls += 1
+        return super().plan(goal, catalog)
+
+
+def test_plan_cache_key_is_canonical(app_client):
+    _, _, svc = app_client
+    cache = PlanCache(svc.storage, "model-a")
+    version = svc.registry.catalog().version
+    assert cache.key("write  a README ", version) == cache.key("write a README", version)
+    assert cache.key("write a README", version) != cache.key("write a README", "other-catalog")
+    assert cache.key("write a README", version) != PlanCache(svc.storage, "model-b").key("write a README", version)
+
+
+def test_plan_endpoint_serves_repeat_goals_from_cache(app_client):
+    client, _, svc = app_client
+    ai = CountingAIClient()
+    main.planner = AgentPlanner(ai, svc, PlanCache(svc.storage, "fake"))
+    goal = {"goal": "Create a README in workspace"}
+
+    first = client.post("/agent/plan", json=goal).json()
+    second = client.post("/agent/plan", json=goal).json()
+    assert ai.calls == 1
+    assert second["plan_summary"] == first["plan_summary"]
+    assert second["actions"][0]["action_id"] != first["actions"][0]["action_id"]
+    assert svc.get_action_detail(second["actions"][0]["action_id"])["status"] == "PROPOSED"
+
+    client.post("/agent/plan", json=goal, headers={"x-plan-cache": "bypass"})
+    assert ai.calls == 2
+
+    stats = client.get("/stats").json()["plan_cache"]
+    assert stats["memory_hits"] == 1 and stats["misses"] == 1
+
+
+def test_persistent_tier_survives_restart(app_client):
+    _, _, svc = app_client
+    ai = CountingAIClient()
+    AgentPlanner(ai, svc, PlanCache(svc.storage, "fake")).plan("Create a README", "s")
+    restarted = AgentPlanner(ai, svc, PlanCache(svc.storage, "fake"))
+    result = restarted.plan("Create a README", "s")
+    assert ai.calls == 1
+    assert result["actions"][0]["tool_name"] == "workspace.write_file"
+    assert restarted.plan_cache.stats()["persistent_hits"] == 1
+
+
+def test_invalid_plans_are_not_cached(app_client):
+    _, _, svc = app_client
+    cache = PlanCache(svc.storage, "fake")
+
+    class BadClient(CountingAIClient):
+        def plan(self, goal, catalog):
+            plan = super().plan(goal, catalog)
+            plan.proposed_actions[0].args = {}
+            return plan
+
+    planner = AgentPlanner(BadClient(), svc, cache)
+    for _ in range(2):
+        try:
+            planner.plan("anything", "s")
+        except Exception:
+            pass
+    assert planner.ai_client.calls == 2
@@ -0,0 +1,64 @@
+import json
+
+from server import main
+from server.ai.client import ProposedAction
+from server.ai.fake_client import FakeAIClient
+from server.ai.streaming import PlanStreamParser
+from server.ai.transport import PlannerHTTPError
+
+PLAN = (
+    '```json\n{"plan_summary": "Write {two} \\"files\\"", "proposed_actions": ['
+    '{"tool_name": "workspace.write_file", "args": {"path": "a.txt", "content": "}]\\\\"}},'
+    '{"tool_name": "agent.explain_plan", "args": {"plan": "[nested]"}}'
+    '], "extra": [{"tool_name": "ignored"}]}\n```'
+)
+
+
+def test_parser_emits_each_action_as_soon_as_it_closes():
+    parser = PlanStreamParser()
+    emitted_at = []
+    for index, char in enumerate(PLAN):
+        for action in parser.feed(char):
+            emitted_at.append((index, action))
+    assert [action.tool_name for _, action in emitted_at] == ["workspace.write_file", "agent.explain_plan"]
+    assert emitted_at[0][1].args == {"path": "a.txt", "content": "}]\\"}
+    assert emitted_at[0][0] == PLAN.index("},{")
+    assert parser.plan_summary == 'Write {two} "files"'
+    assert parser.actions == [action for _, action in emitted_at]
+
+
+def _events(body: str) -> list[tuple[str, dict]]:
+    events = []
+    for block in body.strip().split("\n\n"):
+        event_line, data_line = block.split("\n")
+        events.append((event_line.removeprefix("event: "), json.loads(data_line.removeprefix("data: "))))
+    return events
+
+
+def test_streaming_plan_endpoint_materializes_actions(app_client):
+    client, _, svc = app_client
+    response = client.post("/agent/plan:stream", json={"goal": "Create a README please"})
+    assert response.status_code == 200
+    events = _events(response.text)
+    assert [name for name, _ in events] == ["action", "summary", "done"]
+    action = events[0][1]
+    assert action["tool_name"] == "workspace.write_file"
+    assert svc.get_action_detail(action["action_id"])["status"] == "PROPOSED"
+    assert events[1][1]["plan_summary"]
+
+
+def test_streaming_plan_reports_partial_plan_on_planner_failure(app_client):
+    client, _, svc = app_client
+
+    class DroppingClient(FakeAIClient):
+        async def plan_stream(self, goal, catalog):
+            yield ProposedAction("agent.explain_plan", {"plan": "first"})
+            raise PlannerHTTPError(503, "overloaded")
+
+    main.planner.ai_client = DroppingClient()
+    events = _events(client.post("/agent/plan:stream", json={"goal": "explain"}, headers={"X-Plan-Cache": "bypass"}).text)
+    assert [name for name, _ in events] == ["action", "error", "done"]
+    error = events[1][1]
+    assert error["status_code"] == 502 and "overloaded" in error["detail"]
+    assert error["action_ids"] == [events[0][1]["action_id"]]
+    assert svc.get_action_detail(error["action_ids"][0])["status"] == "PROPOSED"
@@ -1,8 +1,11 @@
+import asyncio
 import time
+from dataclasses import replace
 
 import pytest
 
-from server.actions import ActionError
+from server.actions import ActionError, ActionService
+from server.storage import Storage
 
 
 def test_expired_proposed_cannot_be_approved(app_client):
@@ -34,3 +37,53 @@ def test_approval_hash_mismatch_fails(app_client):
         conn.execute("UPDATE approvals SET action_hash='bad' WHERE id=?", (approval["id"],))
     with pytest.raises(ActionError):
         svc.execute(action["action_id"])
+
+
+
+def test_concurrent_workers_claim_an_approval_once(app_client):
+    _, settings, svc = app_client
+    other = ActionService(Storage(settings.db_path), svc.registry, svc.action_ttl_seconds, svc.approval_ttl_seconds)
+    action = svc.create_proposed_action("workspace.write_file", {"path": "a.txt", "content": "x"}, "s")
+    svc.approve(action["action_id"])
+
+    # Both workers pass the read-side checks before either claims.
+    first = svc._prepare_execution(action["action_id"])
+    second = other._prepare_execution(action["action_id"])
+    svc._start_execution(first)
+    with pytest.raises(ActionError) as exc:
+        other._start_execution(second)
+    assert exc.value.status_code == 409
+    assert svc.storage.get_action(action["action_id"])["status"] == "RUNNING"
+    assert [e["event_type"] for e in svc.storage.list_audit(action["action_id"])].count("ACTION_RUNNING") == 1
+    assert not svc.storage.mark_approval_used(first.approval["id"])
+
+
+
+def test_sweeper_recovery_and_late_completion_cannot_both_finish(app_client):
+    _, settings, svc = app_client
+    sweeper = ActionService(Storage(settings.db_path), svc.registry, svc.action_ttl_seconds, svc.approval_ttl_seconds)
+    action = svc.create_proposed_action("agent.explain_plan", {"plan": "p"}, "s")
+    prepared = svc.begin_execution(action["action_id"])
+    svc.storage.update_action(action["action_id"], expires_at=0)
+    assert sweeper.recover_stale_running() == [action["action_id"]]
+
+    with pytest.raises(ActionError) as exc:
+        svc._complete_execution(prepared, {"late": True})
+    assert exc.value.status_code == 409
+    svc.fail_execution(prepared, RuntimeError("late failure"))
+    detail = svc.get_action_detail(action["action_id"])
+    assert detail["status"] == "FAILED" and "deadline" in detail["result"]["error"]
+    assert [e["event_type"] for e in detail["audit"]] == ["ACTION_PROPOSED", "ACTION_RUNNING", "ACTION_FAILED"]
+
+
+def test_execution_deadline_starts_when_the_job_runs(app_client):
+    _, _, svc = app_client
+    action = svc.create_proposed_action("agent.explain_plan", {"plan": "p"}, "s")
+    prepared = svc.begin_execution(action["action_id"])
+    # Long enough in the queue that the claim-time deadline has passed.
+    svc.storage.update_action(action["action_id"], expires_at=0)
+    prepared = replace(prepared, tool=replace(prepared.tool, execute=lambda args: {"recovered": svc.recover_stale_running()}))
+
+    result = asyncio.run(svc.run_execution(prepared))
+    assert result["result"] == {"recovered": []}
+    assert result["action"]["status"] == "EXECUTED"
@@ -0,0 +1,79 @@
+import threading
+
+from server.storage import MIGRATIONS, Storage
+
+
+def test_storage_uses_wal_and_reuses_thread_connection(tmp_path):
+    storage = Storage(str(tmp_path / "pool.db"))
+    with storage.conn() as first:
+        assert first.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert first.execute("PRAGMA synchronous").fetchone()[0] == 1
+    with storage.conn() as second:
+        assert second is first
+
+    other = []
+    thread = threading.Thread(target=lambda: other.append(storage._thread_connection()))
+    thread.start()
+    thread.join()
+    assert other[0] is not first
+    storage.close()
+
+
+def test_storage_rolls_back_failed_block(tmp_path):
+    storage = Storage(str(tmp_path / "pool.db"))
+    try:
+        with storage.conn() as conn:
+            conn.execute("INSERT INTO audit_log(action_id,event_type,created_at,metadata_json) VALUES('a','X',1,'{}')")
+            raise RuntimeError("boom")
+    except RuntimeError:
+        pass
+    assert storage.list_audit("a") == []
+    storage.add_audit("a", "X", 1, {})
+    assert len(storage.list_audit("a")) == 1
+
+
+def test_transaction_commits_nested_calls_atomically(tmp_path):
+    storage = Storage(str(tmp_path / "pool.db"))
+    try:
+        with storage.transaction():
+            storage.add_audit("a", "FIRST", 1, {})
+            storage.add_audit("a", "SECOND", 2, {})
+            raise RuntimeError("crash mid-transition")
+    except RuntimeError:
+        pass
+    assert storage.list_audit("a") == []
+
+    with storage.transaction():
+        storage.add_audit("a", "FIRST", 1, {})
+        with storage.transaction():
+            storage.add_audit("a", "SECOND", 2, {})
+        assert storage._thread_connection().in_transaction
+    assert [row["event_type"] for row in storage.list_audit("a")] == ["FIRST", "SECOND"]
+
+    with storage.transaction():
+        storage.add_audit("b", "KEPT", 1, {})
+        try:
+            with storage.transaction():
+                storage.add_audit("b", "UNDONE", 2, {})
+                raise RuntimeError("lost a claim")
+        except RuntimeError:
+            pass
+    assert [row["event_type"] for row in storage.list_audit("b")] == ["KEPT"]
+
+
+def test_migrations_index_hot_lookups(tmp_path):
+    storage = Storage(str(tmp_path / "pool.db"))
+    assert storage.schema_version() == len(MIGRATIONS)
+    queries = {
+        "SELECT * FROM audit_log WHERE action_id=? ORDER BY id": "idx_audit_log_action",
+        "SELECT * FROM approvals WHERE action_id=? ORDER BY id DESC LIMIT 1": "idx_approvals_action",
+        "SELECT * FROM actions WHERE status=? AND expires_at<?": "idx_actions_status_expires",
+    }
+    with storage.conn() as conn:
+        for sql, index in queries.items():
+            plan = " ".join(row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", ("a",) * sql.count("?")))
+            assert index in plan
+            assert "TEMP B-TREE" not in plan
+
+    reopened = Storage(storage.path)
+    assert reopened.schema_version() == len(MIGRATIONS)
@@ -0,0 +1,252 @@
+import asyncio
+import os
+import threading
+import uuid
+
+import pytest
+
+from server import main
+from server.actions import ActionService
+from server.registry import ToolRegistry
+from server.storage import Storage
+from server.streams import EventBus
+
+POSTGRES_URL = os.getenv("PANCHOBOT_TEST_DATABASE_URL")
+
+
+@pytest.fixture(scope="session")
+def postgres_url(tmp_path_factory):
+    # A throwaway local server from pgserver (bundled PostgreSQL binaries)
+    # stands in when no database is configured.
+    pytest.importorskip("psycopg")
+    pytest.importorskip("psycopg_pool")
+    if POSTGRES_URL:
+        yield POSTGRES_URL
+        return
+    pgserver = pytest.importorskip("pgserver", reason="set PANCHOBOT_TEST_DATABASE_URL or install pgserver")
+    server = pgserver.get_server(tmp_path_factory.mktemp("pgdata"), cleanup_mode="stop")
+    yield server.get_uri()
+    server.cleanup()
+
+
+def _open(kind, tmp_path, url=None):
+    if kind == "sqlite":
+        return Storage(str(tmp_path / "conformance.db"))
+    from server.storage_postgres import PostgresStorage
+
+    return PostgresStorage(url, max_connections=4)
+
+
+@pytest.fixture(params=["sqlite", "postgres"])
+def backend(request, tmp_path):
+    url = request.getfixturevalue("postgres_url") if request.param == "postgres" else None
+    storage = _open(request.param, tmp_path, url)
+    if request.param == "postgres":
+        with storage.transaction() as conn:
+            conn.execute("TRUNCATE actions, approvals, audit_log, tool_results, plan_cache")
+    storage.kind = request.param
+    storage.url = url
+    yield storage
+    storage.close()
+
+
+def _row(status="PROPOSED", expires_at=100, **extra):
+    return {
+        "action_id": str(uuid.uuid4()),
+        "tool_name": "workspace.write_file",
+        "args": {"path": "a.txt", "content": "x"},
+        "requested_by": "s",
+        "created_at": 1,
+        "expires_at": expires_at,
+        "action_hash": "h",
+        "status": status,
+        **extra,
+    }
+
+
+def test_actions_round_trip_and_claim_once(backend):
+    row = _row()
+    backend.create_actions([row])
+    stored = backend.get_action(row["action_id"])
+    assert stored["args_json"] == '{"path": "a.txt", "content": "x"}'
+    assert stored["status"] == "PROPOSED" and stored["approval_expires_at"] is None
+    assert backend.get_action("missing") is None
+
+    assert backend.claim_action(row["action_id"], "PROPOSED", "APPROVED", approval_expires_at=50)
+    assert not backend.claim_action(row["action_id"], "PROPOSED", "APPROVED")
+    backend.update_action(row["action_id"], expires_at=7)
+    stored = backend.get_action(row["action_id"])
+    assert (stored["status"], stored["approval_expires_at"], stored["expires_at"]) == ("APPROVED", 50, 7)
+
+
+def test_approvals_are_consumed_once(backend):
+    row = _row()
+    backend.create_action(row)
+    for approved_at in (1, 2):
+        backend.create_approval({"action_id": row["action_id"], "action_hash": "h", "approved_at": approved_at, "expires_at": 9})
+    approval = backend.get_latest_approval(row["action_id"])
+    assert approval["approved_at"] == 2 and not approval["used"]
+    assert backend.mark_approval_used(approval["id"])
+    assert not backend.mark_approval_used(approval["id"])
+    assert backend.get_latest_approval(row["action_id"])["used"]
+
+
+def test_concurrent_consumers_see_one_success(backend, tmp_path):
+    row = _row()
+    backend.create_action(row)
+    backend.create_approval({"action_id": row["action_id"], "action_hash": "h", "approved_at": 1, "expires_at": 9})
+    approval_id = backend.get_latest_approval(row["action_id"])["id"]
+    others = [_open(backend.kind, tmp_path, backend.url) for _ in range(3)]
+    results = []
+    barrier = threading.Barrier(len(others))
+
+    def consume(storage):
+        barrier.wait()
+        with storage.transaction():
+            results.append(storage.mark_approval_used(approval_id))
+
+    threads = [threading.Thread(target=consume, args=(storage,)) for storage in others]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for storage in others:
+        storage.close()
+    assert sorted(results) == [False, False, True]
+
+
+def test_audit_ids_and_nested_transactions(backend):
+    with backend.transaction():
+        ids = backend.add_audits([("a", "FIRST", 1, {"n": 1}), ("a", "SECOND", 2, {})])
+        backend.add_audit("a", "THIRD", 3, {})
+        try:
+            with backend.transaction():
+                backend.add_audit("a", "UNDONE", 4, {})
+                raise RuntimeError("nested failure")
+        except RuntimeError:
+            pass
+    audit = backend.list_audit("a")
+    assert [entry["event_type"] for entry in audit] == ["FIRST", "SECOND", "THIRD"]
+    assert [entry["id"] for entry in audit[:2]] == ids
+    assert audit[0]["metadata_json"] == '{"n": 1}'
+    assert backend.add_audits([]) == []
+
+    with pytest.raises(RuntimeError):
+        with backend.transaction():
+            backend.add_audit("b", "LOST", 1, {})
+            raise RuntimeError("outer failure")
+    assert backend.list_audit("b") == []
+
+
+def test_plan_cache_upserts_and_prunes(backend):
+    backend.put_cached_plan("k1", {"v": 1}, 10)
+    backend.put_cached_plan("k1", {"v": 2}, 20)
+    backend.put_cached_plan("k2", {"v": 3}, 30)
+    backend.put_cached_plan("k3", {"v": 4}, 5)
+    assert backend.get_cached_plan("k1", 15) == {"v": 2}
+    assert backend.get_cached_plan("k1", 25) is None
+    backend.prune_plan_cache(not_before=8, max_rows=1)
+    assert backend.get_cached_plan("k2", 0) == {"v": 3}
+    assert backend.get_cached_plan("k1", 0) is None and backend.get_cached_plan("k3", 0) is None
+
+
+def test_retention_queries(backend):
+    blob = "ab" * 32
+    due, later, done = _row(expires_at=5), _row(expires_at=500), _row(status="EXECUTED", expires_at=1)
+    backend.create_actions([due, later, done])
+    backend.save_tool_result(done["action_id"], {"out": 1}, 2)
+    backend.save_tool_result(done["action_id"], {"stdout": {"$blob": blob, "size": 9000}}, 3)
+    assert backend.get_latest_tool_result(done["action_id"]) == {"stdout": {"$blob": blob, "size": 9000}}
+    assert backend.get_latest_tool_result(due["action_id"]) is None
+    assert backend.referenced_blobs() == {blob}
+
+    with backend.transaction():
+        assert backend.find_actions_due(["PROPOSED"], 100, 10) == [due["action_id"]]
+        backend.set_status([due["action_id"]], "EXPIRED")
+    assert backend.get_action(due["action_id"])["status"] == "EXPIRED"
+    assert backend.find_actions_due(["EXECUTED", "EXPIRED"], 100, 10) == [done["action_id"], due["action_id"]]
+
+    (record,) = backend.export_actions([done["action_id"]])
+    assert record["action"]["action_id"] == done["action_id"]
+    assert [r["created_at"] for r in record["tool_results"]] == [2, 3]
+    backend.delete_actions([done["action_id"], due["action_id"]])
+    assert backend.get_action(done["action_id"]) is None
+    assert backend.get_latest_tool_result(done["action_id"]) is None
+    assert backend.referenced_blobs() == set()
+    backend.compact()
+
+
+def test_listen_reports_other_nodes_status_changes(backend, tmp_path):
+    seen = []
+    changed = threading.Event()
+
+    def on_change(action_id, status):
+        seen.append((action_id, status))
+        if status == "APPROVED":
+            changed.set()
+
+    if not backend.listen(on_change):
+        assert backend.kind == "sqlite"
+        return
+    backend.create_action(_row())
+    other = _open(backend.kind, tmp_path, backend.url)
+    row = _row()
+    other.create_action(row)
+    other.claim_action(row["action_id"], "PROPOSED", "APPROVED")
+    other.close()
+    assert changed.wait(5)
+    assert seen == [(row["action_id"], "PROPOSED"), (row["action_id"], "APPROVED")]
+
+
+def test_listener_survives_failing_callbacks(backend, tmp_path):
+    seen = []
+    changed = threading.Event()
+
+    def broken(action_id, status):
+        raise RuntimeError("callback bug")
+
+    def on_change(action_id, status):
+        seen.append(status)
+        if status == "APPROVED":
+            changed.set()
+
+    if not backend.listen(broken):
+        return
+    backend.listen(on_change)
+    other = _open(backend.kind, tmp_path, backend.url)
+    row = _row()
+    other.create_action(row)
+    other.claim_action(row["action_id"], "PROPOSED", "APPROVED")
+    other.close()
+    assert changed.wait(5)
+    assert seen == ["PROPOSED", "APPROVED"]
+
+
+def test_remote_changes_reach_session_subscribers(backend, tmp_path, monkeypatch):
+    if backend.kind == "sqlite":
+        assert not backend.listen(main._on_remote_change)
+        return
+    service = ActionService(backend, ToolRegistry(), 300, 120, events=EventBus())
+    monkeypatch.setattr(main, "storage", backend)
+    monkeypatch.setattr(main, "action_service", service)
+    monkeypatch.setattr(main, "event_bus", service.events)
+    row = _row()
+    backend.create_action(row)
+    service.detail_cache.put(row["action_id"], {"status": "PROPOSED"}, service.detail_cache.version)
+    backend.listen(main._on_remote_change)
+
+    async def scenario():
+        async def first_delta():
+            async for item in service.events.subscribe(row["requested_by"]):
+                return item[2]
+
+        consumer = asyncio.create_task(first_delta())
+        await asyncio.sleep(0)
+        other = _open(backend.kind, tmp_path, backend.url)
+        await asyncio.to_thread(other.claim_action, row["action_id"], "PROPOSED", "APPROVED", approval_expires_at=50)
+        other.close()
+        return await asyncio.wait_for(consumer, 5)
+
+    delta = asyncio.run(scenario())
+    assert delta == {"action_id": row["action_id"], "status": "APPROVED", "approval_expires_at": 50}
+    assert service.detail_cache.get(row["action_id"]) is None
@@ -0,0 +1,159 @@
+import asyncio
+
+from server import main
+from server.streams import EventBus, OutputHub
+
+
+def test_output_hub_replays_tail_and_ends_on_close():
+    async def scenario():
+        hub = OutputHub(retain_chars=6)
+        hub.open("a")
+        hub.publish("a", "stdout", "abc")
+        hub.publish("a", "stdout", "def")
+        hub.publish("a", "stderr", "ghi")
+        received = []
+
+        async def consume():
+            async for item in hub.subscribe("a"):
+                received.append(item)
+
+        consumer = asyncio.create_task(consume())
+        await asyncio.sleep(0)
+        hub.publish("a", "stdout", "jkl")
+        hub.close("a")
+        await consumer
+        return received, hub.is_open("a")
+
+    received, still_open = asyncio.run(scenario())
+    assert received == [("stdout", "def"), ("stderr", "ghi"), ("stdout", "jkl")]
+    assert still_open is False
+
+
+def test_output_endpoint_streams_shell_output(app_client, wait_for_status):
+    client, settings, svc = app_client
+    with open(settings.workspace_dir + "/log.txt", "w", encoding="utf-8") as f:
+        f.write("line one\nline two\n")
+    action = svc.create_proposed_action("shell.run_allowlisted", {"command": "cat log.txt"}, "s")
+    svc.approve(action["action_id"])
+    assert client.post("/actions/execute", json={"action_id": action["action_id"]}).status_code == 202
+    wait_for_status(client, action["action_id"], "EXECUTED")
+
+    response = client.get(f"/actions/{action['action_id']}/output")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert 'event: stdout\ndata: "line one\\nline two\\n"' in response.text
+    assert response.text.endswith('event: end\ndata: {"status": "EXECUTED"}\n\n')
+
+
+def _take(bus, session_id, after, count, keepalive_seconds=5.0):
+    async def scenario():
+        items = []
+        async for item in bus.subscribe(session_id, after, keepalive_seconds):
+            items.append(item)
+            if len(items) == count:
+                break
+        return items
+
+    return asyncio.run(scenario())
+
+
+def test_event_bus_is_per_session_and_resumable():
+    bus = EventBus(replay_events=2)
+    bus.publish("a", "action", {"n": 1})
+    bus.publish("b", "action", {"n": 2})
+    bus.publish("a", "action", {"n": 3})
+    bus.publish("a", "action", {"n": 4})
+    assert _take(bus, "a", 0, 2) == [(3, "action", {"n": 3}), (4, "action", {"n": 4})]
+    assert _take(bus, "a", 3, 1) == [(4, "action", {"n": 4})]
+    assert _take(bus, "a", None, 1, keepalive_seconds=0.01) == [None]
+    assert not bus.has_subscribers()
+
+    async def live():
+        received = []
+
+        async def consume():
+            async for item in bus.subscribe("c"):
+                received.append(item)
+                return
+
+        consumer = asyncio.create_task(consume())
+        await asyncio.sleep(0)
+        await asyncio.to_thread(bus.publish, "c", "action", {"n": 5})
+        await consumer
+        return received
+
+    assert asyncio.run(live()) == [(5, "action", {"n": 5})]
+
+
+def test_transitions_publish_compact_deltas(app_client, wait_for_status):
+    client, _, svc = app_client
+    action = svc.create_proposed_action("workspace.write_file", {"path": "a.txt", "content": "x"}, "web")
+    svc.create_proposed_action("agent.explain_plan", {"plan": "other"}, "other-session")
+    client.post("/actions/approve", json={"action_id": action["action_id"]})
+    client.post("/actions/execute", json={"action_id": action["action_id"]})
+    wait_for_status(client, action["action_id"], "EXECUTED")
+
+    deltas = [data for _, _, data in _take(main.event_bus, "web", 0, 4)]
+    assert [d["status"] for d in deltas] == ["PROPOSED", "APPROVED", "RUNNING", "EXECUTED"]
+    assert {d["action_id"] for d in deltas} == {action["action_id"]}
+    assert [d["audit"]["event_type"] for d in deltas] == ["ACTION_PROPOSED", "ACTION_APPROVED", "ACTION_RUNNING", "ACTION_EXECUTED"]
+    assert deltas[0]["tool_name"] == "workspace.write_file" and deltas[0]["expires_at"] == action["expires_at"]
+    assert deltas[1]["approval_expires_at"] > 0
+    assert deltas[3]["result"]["path"] == "a.txt"
+    assert "preview" not in deltas[0]
+
+    async def first_frames():
+        events = main._session_events("web", 0)
+        try:
+            return [await anext(events), await anext(events)]
+        finally:
+            await events.aclose()
+
+    ready, frame = asyncio.run(first_frames())
+    assert ready == 'event: ready\ndata: {"process_local": false}\n\n'
+    assert frame.startswith("id: ") and "\nevent: action\n" in frame
+
+
+def test_sweeper_expiry_reaches_subscribers(app_client):
+    _, _, svc = app_client
+    action = svc.create_proposed_action("agent.explain_plan", {"plan": "p"}, "web")
+    svc.storage.update_action(action["action_id"], expires_at=0)
+
+    async def scenario():
+        received = []
+
+        async def consume():
+            async for item in main.event_bus.subscribe("web"):
+                received.append(item[2])
+                return
+
+        consumer = asyncio.create_task(consume())
+        await asyncio.sleep(0)
+        await asyncio.to_thread(svc.sweep_expired)
+        await consumer
+        return received
+
+    (delta,) = asyncio.run(scenario())
+    assert (delta["action_id"], delta["status"], delta["audit"]["metadata_json"]) == (action["action_id"], "EXPIRED", '{"phase": "sweeper"}')
+
+
+def test_remote_change_invalidates_and_publishes(app_client):
+    _, _, svc = app_client
+    action = svc.create_proposed_action("agent.explain_plan", {"plan": "p"}, "web")
+    assert svc.get_action_detail(action["action_id"])["status"] == "PROPOSED"
+    # Another node approved it; only its notification reaches this process.
+    svc.storage.claim_action(action["action_id"], "PROPOSED", "APPROVED", approval_expires_at=50)
+
+    async def scenario():
+        async def first_delta():
+            async for item in main.event_bus.subscribe("web", after=1):
+                return item[2]
+
+        consumer = asyncio.create_task(first_delta())
+        await asyncio.sleep(0)
+        main._on_remote_change(action["action_id"], "APPROVED")
+        return await consumer
+
+    delta = asyncio.run(scenario())
+    assert delta == {"action_id": action["action_id"], "status": "APPROVED", "approval_expires_at": 50}
+    assert svc.get_action_detail(action["action_id"])["status"] == "APPROVED"
@@ -0,0 +1,66 @@
+import asyncio
+import gzip
+import json
+import time
+
+from server.actions import EXECUTED, EXPIRED, FAILED
+from server.sweeper import ExpirySweeper
+
+
+def test_sweeper_expires_due_actions_in_batches(app_client):
+    _, _, svc = app_client
+    created = svc.create_proposed_actions([("agent.explain_plan", {"plan": str(i)}) for i in range(5)], "s")
+    due = [action["action_id"] for action in created[:3]]
+    for action_id in due:
+        svc.storage.update_action(action_id, expires_at=int(time.time()) - 10)
+
+    report = asyncio.run(ExpirySweeper(svc, batch_size=2).run_once())
+    assert report == {"expired": 3, "recovered": 0, "purged": 0}
+    for action_id in due:
+        detail = svc.get_action_detail(action_id)
+        assert detail["status"] == EXPIRED
+        assert detail["audit"][-1]["event_type"] == "ACTION_EXPIRED"
+    assert svc.get_action_detail(created[3]["action_id"])["status"] == "PROPOSED"
+
+
+def test_sweeper_fails_actions_left_running_past_their_deadline(app_client):
+    _, _, svc = app_client
+    stale, live = svc.create_proposed_actions([("agent.explain_plan", {"plan": str(i)}) for i in range(2)], "s")
+    for action in (stale, live):
+        svc.begin_execution(action["action_id"])
+    assert svc.storage.get_action(live["action_id"])["expires_at"] >= int(time.time()) + svc.execution_timeout_seconds - 1
+    svc.storage.update_action(stale["action_id"], expires_at=int(time.time()) - 1)
+
+    report = asyncio.run(ExpirySweeper(svc).run_once())
+    assert report["recovered"] == 1
+    detail = svc.get_action_detail(stale["action_id"])
+    assert detail["status"] == FAILED and "deadline" in detail["result"]["error"]
+    assert detail["audit"][-1]["event_type"] == "ACTION_FAILED"
+    assert svc.get_action_detail(live["action_id"])["status"] == "RUNNING"
+
+
+def test_retention_archives_and_deletes_old_terminal_actions(app_client, tmp_path):
+    _, _, svc = app_client
+    big_plan = "x" * 5000
+    old, recent, pending = svc.create_proposed_actions([("agent.explain_plan", {"plan": big_plan if i == 0 else str(i)}) for i in range(3)], "s")
+    svc.execute(old["action_id"])
+    svc.execute(recent["action_id"])
+    svc.storage.update_action(old["action_id"], expires_at=int(time.time()) - 7200)
+    svc.storage.update_action(pending["action_id"], expires_at=int(time.time()) - 7200, status="APPROVED")
+
+    sweeper = ExpirySweeper(svc, retention_seconds=3600, archive_dir=str(tmp_path / "archive"), blob_grace_seconds=0)
+    assert sweeper.enforce_retention() == 1
+
+    assert svc.storage.get_action(old["action_id"]) is None
+    assert svc.storage.list_audit(old["action_id"]) == []
+    assert svc.storage.get_action(recent["action_id"])["status"] == EXECUTED
+    assert svc.storage.get_action(pending["action_id"]) is not None
+
+    (archive,) = (tmp_path / "archive").iterdir()
+    with gzip.open(archive, "rt", encoding="utf-8") as f:
+        records = [json.loads(line) for line in f]
+    assert [r["action"]["action_id"] for r in records] == [old["action_id"]]
+    assert [e["event_type"] for e in records[0]["audit"]] == ["ACTION_PROPOSED", "ACTION_RUNNING", "ACTION_EXECUTED"]
+    assert records[0]["tool_results"]
+    assert sorted(records[0]["blobs"].values()) == sorted([big_plan, f"Plan: {big_plan}"])
+    assert list(svc.blobs.root.glob("??/*")) == []
@@ -0,0 +1,104 @@
+import os
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+from server.tools.search import ListTreeArgs, SearchArgs, WorkspaceIndex
+from server.tools.workspace import WorkspacePolicy
+
+
+def _write(root, relative, content):
+    path = root / relative
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(content if isinstance(content, bytes) else content.encode("utf-8"))
+    return path
+
+
+def test_index_searches_and_updates_incrementally(tmp_path):
+    root = tmp_path / "workspace"
+    _write(root, "src/app.py", "import os\n\ndef Handler():\n    return 'hello world'\n")
+    _write(root, "docs/readme.md", "Hello there\n")
+    _write(root, "blob.bin", b"hello\0world")
+    _write(root, "big.txt", "hello " * 100)
+    (tmp_path / "outside.txt").write_text("hello outside")
+    os.symlink(tmp_path / "outside.txt", root / "link.txt")
+    index = WorkspaceIndex(WorkspacePolicy(str(root)), max_file_bytes=100, rescan_interval_seconds=0)
+
+    result = index.search(SearchArgs(query="hello"))
+    assert [(m["path"], m["line"]) for m in result["matches"]] == [("docs/readme.md", 1), ("src/app.py", 4)]
+    assert result["files_indexed"] == 4
+    assert index.search(SearchArgs(query="Hello", case_sensitive=True))["matches"][0]["path"] == "docs/readme.md"
+    assert index.search(SearchArgs(query="hello", path="src"))["matches"][0]["text"] == "    return 'hello world'"
+    assert index.search(SearchArgs(query="os"))["matches"] == [{"path": "src/app.py", "line": 1, "text": "import os"}]
+    with pytest.raises(ValueError):
+        index.search(SearchArgs(query="hello", path="../"))
+
+    assert index.refresh() == 0
+    _write(root, "docs/readme.md", "goodbye\n")
+    _write(root, "docs/new.md", "hello again\n")
+    (root / "src/app.py").unlink()
+    assert index.refresh() == 3
+    assert [m["path"] for m in index.search(SearchArgs(query="hello"))["matches"]] == ["docs/new.md"]
+    assert "hel" not in {gram for gram, paths in index.postings.items() if "docs/readme.md" in paths}
+
+
+
+def test_short_queries_use_the_index_and_rescans_never_block_queries(tmp_path, monkeypatch):
+    root = tmp_path / "workspace"
+    _write(root, "a.txt", "xyz\n")
+    _write(root, "b.txt", "q z")
+    _write(root, "t.txt", "z")
+    index = WorkspaceIndex(WorkspacePolicy(str(root)), rescan_interval_seconds=0)
+    assert [m["path"] for m in index.search(SearchArgs(query="z"))["matches"]] == ["a.txt", "b.txt", "t.txt"]
+    assert [m["path"] for m in index.search(SearchArgs(query="YZ"))["matches"]] == ["a.txt"]
+    reads = []
+    monkeypatch.setattr(index, "_read_text", lambda *args: reads.append(args))
+    # Only the file too short to be indexed is read for a short miss.
+    assert index.search(SearchArgs(query="zq"))["matches"] == [] and reads == [("t.txt", 1)]
+    monkeypatch.undo()
+
+    walking = threading.Event()
+    release = threading.Event()
+    walk = index._walk
+
+    def slow_walk():
+        walking.set()
+        release.wait(5)
+        return walk()
+
+    index._walk = slow_walk
+    _write(root, "c.txt", "xyz again\n")
+    rescan = threading.Thread(target=index.refresh, kwargs={"force": True})
+    rescan.start()
+    assert walking.wait(5)
+    started = time.monotonic()
+    index.rescan_interval_seconds = 3600
+    assert [m["path"] for m in index.search(SearchArgs(query="xyz"))["matches"]] == ["a.txt"]
+    assert time.monotonic() - started < 1
+    release.set()
+    rescan.join()
+    assert [m["path"] for m in index.search(SearchArgs(query="xyz"))["matches"]] == ["a.txt", "c.txt"]
+
+
+def test_list_tree_respects_depth_and_limits(tmp_path):
+    root = tmp_path / "workspace"
+    for relative in ("a.txt", "dir/b.txt", "dir/sub/c.txt"):
+        _write(root, relative, "x")
+    index = WorkspaceIndex(WorkspacePolicy(str(root)))
+
+    listed = index.list_tree(ListTreeArgs())
+    assert [f["path"] for f in listed["files"]] == ["a.txt", "dir/b.txt", "dir/sub/c.txt"]
+    assert listed["files"][0]["size"] == 1 and not listed["truncated"]
+    assert [f["path"] for f in index.list_tree(ListTreeArgs(path="dir", max_depth=1))["files"]] == ["dir/b.txt"]
+    capped = index.list_tree(ListTreeArgs(max_entries=2))
+    assert len(capped["files"]) == 2 and capped["truncated"]
+
+
+def test_search_is_a_safe_action(app_client):
+    client, settings, svc = app_client
+    _write(Path(settings.workspace_dir), "notes.txt", "find me\n")
+    action = svc.create_proposed_action("workspace.search", {"query": "find"}, "s")
+    assert action["risk_tier"] == "SAFE"
+    assert svc.execute(action["action_id"])["result"]["matches"][0]["path"] == "notes.txt"
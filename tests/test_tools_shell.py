@@ -1,3 +1,5 @@
+import asyncio
+
 import pytest
 
 from server.tools.shell import ShellArgs, ShellPolicy, ShellTool
@@ -15,3 +17,43 @@ def test_shell_blocks_non_allowlisted(tmp_path):
     shell = ShellTool(ShellPolicy(str(tmp_path), ["ls", "pwd", "cat", "pytest"]))
     with pytest.raises(ValueError):
         shell.execute(ShellArgs(command="rm -rf /"))
+
+
+def test_shell_execute_async_runs_in_workspace(tmp_path):
+    (tmp_path / "hello.txt").write_text("hi", encoding="utf-8")
+    shell = ShellTool(ShellPolicy(str(tmp_path), ["ls", "pwd", "cat", "pytest"]))
+    result = asyncio.run(shell.execute_async(ShellArgs(command="cat hello.txt")))
+    assert result["returncode"] == 0
+    assert result["stdout"] == "hi"
+    with pytest.raises(ValueError):
+        asyncio.run(shell.execute_async(ShellArgs(command="ls; pwd")))
+
+
+def test_shell_stream_pushes_chunks_and_bounds_retained_output(tmp_path):
+    (tmp_path / "big.txt").write_text("é" * 10000, encoding="utf-8")
+    shell = ShellTool(ShellPolicy(str(tmp_path), ["cat"], max_output_bytes=1001))
+    chunks = []
+    result = asyncio.run(shell.stream(ShellArgs(command="cat big.txt"), lambda stream, text: chunks.append((stream, text))))
+    assert "".join(text for stream, text in chunks if stream == "stdout") == "é" * 10000
+    assert result["stdout_truncated"] is True
+    assert result["stdout"] == "é" * 500
+    assert result["timed_out"] is False
+
+
+def test_shell_stream_kills_command_on_timeout(tmp_path):
+    shell = ShellTool(ShellPolicy(str(tmp_path), ["sleep"], timeout_seconds=0.2))
+    result = asyncio.run(shell.stream(ShellArgs(command="sleep 5")))
+    assert result["timed_out"] is True
+    assert result["returncode"] != 0
+
+
+def test_shell_sync_execute_works_inside_a_running_loop(tmp_path):
+    (tmp_path / "hello.txt").write_text("hi", encoding="utf-8")
+    shell = ShellTool(ShellPolicy(str(tmp_path), ["cat", "sleep"], timeout_seconds=0.2))
+
+    async def from_loop():
+        return shell.execute(ShellArgs(command="cat hello.txt")), shell.execute(ShellArgs(command="sleep 5"))
+
+    ok, slow = asyncio.run(from_loop())
+    assert (ok["returncode"], ok["stdout"], ok["timed_out"]) == (0, "hi", False)
+    assert slow["timed_out"] is True and slow["returncode"] != 0
@@ -1,6 +1,17 @@
+import difflib
+import hashlib
+
 import pytest
 
-from server.tools.workspace import ReadFileArgs, WorkspacePolicy, WorkspaceTools, WriteFileArgs
+from server.tools.workspace import (
+    ApplyPatchArgs,
+    RangeEdit,
+    ReadFileArgs,
+    WorkspacePolicy,
+    WorkspaceTools,
+    WriteFileArgs,
+    apply_patch_text,
+)
 
 
 def test_workspace_allowlist_enforced(tmp_path):
@@ -14,3 +25,112 @@ def test_workspace_read_write_roundtrip(tmp_path):
     tools.write_file(WriteFileArgs(path="ok.txt", content="hello"))
     result = tools.read_file(ReadFileArgs(path="ok.txt"))
     assert result["content"] == "hello"
+
+
+def test_read_file_is_bounded_and_utf8_safe(tmp_path):
+    tools = WorkspaceTools(WorkspacePolicy(str(tmp_path / "workspace"), max_read_bytes=5))
+    tools.write_file(WriteFileArgs(path="u.txt", content="aéééé"))
+    first = tools.read_file(ReadFileArgs(path="u.txt"))
+    assert first["content"] == "aéé"
+    assert first["truncated"] is True
+    assert first["next_offset"] == 5
+
+    rest = tools.read_file(ReadFileArgs(path="u.txt", offset=first["next_offset"]))
+    assert rest["content"] == "éé"
+    assert rest["truncated"] is False
+    assert rest["next_offset"] is None
+
+    middle = tools.read_file(ReadFileArgs(path="u.txt", offset=2, length=3))
+    assert middle["offset"] == 3
+    assert middle["content"] == "é"
+
+
+def test_read_file_pages_by_line_range(tmp_path):
+    tools = WorkspaceTools(WorkspacePolicy(str(tmp_path / "workspace"), max_read_bytes=12))
+    tools.write_file(WriteFileArgs(path="lines.txt", content="one\ntwo\nthree\nfour\n"))
+    page = tools.read_file(ReadFileArgs(path="lines.txt", start_line=2, end_line=3))
+    assert page["content"] == "two\nthree\n"
+    assert (page["end_line"], page["next_line"], page["truncated"]) == (3, 4, False)
+
+    capped = tools.read_file(ReadFileArgs(path="lines.txt", start_line=1))
+    assert capped["content"] == "one\ntwo\n"
+    assert (capped["end_line"], capped["next_line"], capped["truncated"]) == (2, 3, True)
+
+    tail = tools.read_file(ReadFileArgs(path="lines.txt", start_line=4, end_line=10))
+    assert tail["content"] == "four\n"
+    assert tail["next_line"] is None
+
+    with pytest.raises(ValueError):
+        ReadFileArgs(path="lines.txt", offset=3, start_line=1)
+
+
+def _unified(path, before, after):
+    diff = difflib.unified_diff(before.splitlines(keepends=True), after.splitlines(keepends=True), f"a/{path}", f"b/{path}")
+    return "".join(line if line.endswith("\n") else line + "\n\\ No newline at end of file\n" for line in diff)
+
+
+@pytest.mark.parametrize(
+    "before,after",
+    [
+        ("a\nb\nc\n", "a\nB\nc\n"),
+        ("".join(f"{i}\n" for i in range(50)), "".join(f"{i}\n" for i in range(50) if i not in (3, 40)) + "tail\n"),
+        ("one\ntwo", "one\ntwo\nthree"),
+        ("one\ntwo\n", "zero\none\ntwo"),
+        ("", "new\n"),
+    ],
+)
+def test_apply_patch_text_applies_unified_diffs(before, after):
+    assert apply_patch_text(before, ApplyPatchArgs(path="f", diff=_unified("f", before, after))) == after
+
+
+def test_apply_patch_text_applies_range_edits():
+    text = "1\n2\n3\n4"
+    edits = [
+        RangeEdit(start_line=1, end_line=0, content="0"),
+        RangeEdit(start_line=2, content="two"),
+        RangeEdit(start_line=3, end_line=3, content=""),
+        RangeEdit(start_line=5, end_line=4, content="5"),
+    ]
+    assert apply_patch_text(text, ApplyPatchArgs(path="f", edits=edits)) == "0\n1\ntwo\n4\n5"
+    with pytest.raises(ValueError):
+        apply_patch_text(text, ApplyPatchArgs(path="f", edits=[RangeEdit(start_line=1, end_line=2, content=""), RangeEdit(start_line=2, content="")]))
+    with pytest.raises(ValueError):
+        apply_patch_text("a\nb\n", ApplyPatchArgs(path="f", diff="@@ -1,2 +1,2 @@\n a\n-x\n+y\n"))
+
+
+def test_patch_and_write_are_atomic_and_bound_to_base(tmp_path):
+    tools = WorkspaceTools(WorkspacePolicy(str(tmp_path / "workspace")))
+    tools.write_file(WriteFileArgs(path="f.txt", content="a\nb\n"))
+    read = tools.read_file(ReadFileArgs(path="f.txt"))
+    assert read["sha256"] == hashlib.sha256(b"a\nb\n").hexdigest()
+
+    args = tools.prepare_patch(ApplyPatchArgs(path="f.txt", diff=_unified("f.txt", "a\nb\n", "a\nB\n")))
+    assert args.base_sha256 == read["sha256"]
+    assert "-b\n+B" in tools.apply_patch_preview(args)
+    assert tools.write_file_preview(WriteFileArgs(path="f.txt", content="a\nc\n")).endswith("-b\n+c")
+
+    result = tools.apply_patch(args)
+    assert result["changed"] and (tmp_path / "workspace" / "f.txt").read_text() == "a\nB\n"
+    assert list((tmp_path / "workspace").iterdir()) == [tmp_path / "workspace" / "f.txt"]
+    with pytest.raises(ValueError, match="base_sha256"):
+        tools.apply_patch(args)
+    assert "does not apply" in tools.apply_patch_preview(args)
+    assert tools.write_file(WriteFileArgs(path="f.txt", content="a\nB\n"))["changed"] is False
+
+
+def test_partial_reads_skip_hash_and_writes_never_decode(tmp_path, monkeypatch):
+    monkeypatch.setattr("server.tools.workspace.MAX_PREVIEW_BYTES", 16)
+    tools = WorkspaceTools(WorkspacePolicy(str(tmp_path / "workspace")))
+    tools.write_file(WriteFileArgs(path="f.txt", content="a\nb\n"))
+    assert tools.read_file(ReadFileArgs(path="f.txt", length=2))["sha256"] is None
+    assert tools.read_file(ReadFileArgs(path="f.txt", start_line=2))["sha256"] is None
+    assert tools.read_file(ReadFileArgs(path="f.txt", start_line=1))["sha256"] == hashlib.sha256(b"a\nb\n").hexdigest()
+
+    (tmp_path / "workspace" / "bin.dat").write_bytes(b"\xff\xfe\x00")
+    args = tools.prepare_write(WriteFileArgs(path="bin.dat", content="text"))
+    assert "diff omitted: replaces 3 bytes" in tools.write_file_preview(args)
+    assert tools.write_file(args)["changed"]
+    assert (tmp_path / "workspace" / "bin.dat").read_bytes() == b"text"
+    assert "diff omitted" in tools.write_file_preview(WriteFileArgs(path="f.txt", content="x" * 17))
+    (tmp_path / "workspace" / "big.txt").write_text("line\n" * 10)
+    assert "diff omitted: file is 50 bytes" in tools.apply_patch_preview(ApplyPatchArgs(path="big.txt", edits=[RangeEdit(start_line=1, content="x")]))
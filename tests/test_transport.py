@@ -0,0 +1,148 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from server.ai.openai_client import OpenAIClient
+from server.ai.transport import PlannerHTTPError, PlannerTransport
+from server.registry import ToolCatalog
+
+CATALOG = ToolCatalog(version="v1", names=["workspace.write_file"], prompt='[{"name":"workspace.write_file"}]')
+PLAN_TEXT = json.dumps(
+    {"plan_summary": "Write it", "proposed_actions": [{"tool_name": "workspace.write_file", "args": {"path": "a.txt"}}]}
+)
+
+
+def _transport(handler, **kwargs) -> PlannerTransport:
+    transport = PlannerTransport("sk-test", backoff_base_seconds=0, **kwargs)
+    transport._client = httpx.Client(base_url="https://planner.test", transport=httpx.MockTransport(handler))
+    transport._async_client = httpx.AsyncClient(base_url="https://planner.test", transport=httpx.MockTransport(handler))
+    return transport
+
+
+def test_retries_retryable_statuses_then_succeeds():
+    statuses = [429, 503, 200]
+    hits = []
+
+    def handler(request):
+        hits.append(request)
+        status = statuses[len(hits) - 1]
+        return httpx.Response(status, headers={"retry-after": "0"}, json={"ok": status == 200})
+
+    assert _transport(handler).post_json("/responses", {"a": 1}) == {"ok": True}
+    assert len(hits) == 3
+
+
+def test_does_not_retry_client_errors_or_exhausted_budget():
+    hits = []
+
+    def handler(request):
+        hits.append(request)
+        return httpx.Response(400 if len(hits) == 1 else 500, text="nope")
+
+    transport = _transport(handler, max_retries=2)
+    with pytest.raises(PlannerHTTPError) as exc:
+        transport.post_json("/responses", {})
+    assert exc.value.status_code == 400 and len(hits) == 1
+
+    with pytest.raises(PlannerHTTPError) as exc:
+        transport.post_json("/responses", {})
+    assert exc.value.status_code == 500 and len(hits) == 4
+
+
+def test_timeouts_are_retried_and_surface():
+    def handler(request):
+        raise httpx.ReadTimeout("slow", request=request)
+
+    with pytest.raises(httpx.ReadTimeout):
+        _transport(handler, max_retries=1).post_json("/responses", {})
+
+
+def test_async_requests_coalesce_and_respect_in_flight_cap():
+    in_flight = 0
+    peak = 0
+    hits = []
+
+    async def handler(request):
+        nonlocal in_flight, peak
+        body = json.loads(request.content)
+        hits.append(body)
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return httpx.Response(200, json=body)
+
+    transport = _transport(handler, max_in_flight=2)
+
+    async def scenario():
+        same = [transport.post_json_async("/responses", {"goal": "same"}) for _ in range(3)]
+        distinct = [transport.post_json_async("/responses", {"goal": n}) for n in range(4)]
+        return await asyncio.gather(*same, *distinct)
+
+    results = asyncio.run(scenario())
+    assert results[:3] == [{"goal": "same"}] * 3
+    assert len(hits) == 5
+    assert peak == 2
+
+
+def test_cancelled_caller_does_not_fail_coalesced_requests():
+    hits = []
+    release = asyncio.Event()
+
+    async def handler(request):
+        hits.append(request)
+        await release.wait()
+        return httpx.Response(200, json={"ok": True})
+
+    transport = _transport(handler)
+
+    async def scenario():
+        leader = asyncio.create_task(transport.post_json_async("/responses", {"goal": "same"}))
+        await asyncio.sleep(0.01)
+        follower = asyncio.create_task(transport.post_json_async("/responses", {"goal": "same"}))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        await asyncio.sleep(0.01)
+        release.set()
+        result = await follower
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+
+        release.clear()
+        abandoned = asyncio.create_task(transport.post_json_async("/responses", {"goal": "gone"}))
+        await asyncio.sleep(0.01)
+        abandoned.cancel()
+        await asyncio.sleep(0.01)
+        return result, dict(transport._async_inflight), dict(transport._async_waiters)
+
+    assert asyncio.run(scenario()) == ({"ok": True}, {}, {})
+    assert len(hits) == 2
+
+
+def test_openai_client_parses_responses_body_and_stream():
+    def handler(request):
+        body = json.loads(request.content)
+        assert request.url.path == "/responses" and body["model"] == "gpt-test"
+        assert body["instructions"].endswith(CATALOG.prompt) and body["input"] == "Goal: goal"
+        if not body.get("stream"):
+            return httpx.Response(200, json={"output": [{"content": [{"type": "output_text", "text": PLAN_TEXT}]}]})
+        half = len(PLAN_TEXT) // 2
+        events = "".join(
+            f"event: response.output_text.delta\ndata: {json.dumps({'delta': part})}\n\n"
+            for part in (PLAN_TEXT[:half], PLAN_TEXT[half:])
+        )
+        return httpx.Response(200, text=events + "data: [DONE]\n\n", headers={"content-type": "text/event-stream"})
+
+    client = OpenAIClient("sk-test", "gpt-test", _transport(handler))
+    plan = client.plan("goal", CATALOG)
+    assert plan.plan_summary == "Write it"
+    assert plan.proposed_actions[0].args == {"path": "a.txt"}
+
+    async def collect():
+        return [item async for item in client.plan_stream("goal", CATALOG)]
+
+    streamed = asyncio.run(collect())
+    assert streamed[0].tool_name == "workspace.write_file"
+    assert streamed[-1].plan_summary == "Write it"
@@ -2,12 +2,15 @@ const planBtn = document.getElementById('planBtn');
 const planSummary = document.getElementById('planSummary');
 const actionsRoot = document.getElementById('actions');
 
+const SESSION_ID = 'web-session';
+
 let actions = [];
+const outputs = {};
 
 async function post(path, body) {
   const res = await fetch(path, {
     method: 'POST',
-    headers: { 'content-type': 'application/json', 'x-session-id': 'web-session' },
+    headers: { 'content-type': 'application/json', 'x-session-id': SESSION_ID },
     body: JSON.stringify(body),
   });
   const data = await res.json();
@@ -15,13 +18,6 @@ async function post(path, body) {
   return data;
 }
 
-async function get(path) {
-  const res = await fetch(path);
-  const data = await res.json();
-  if (!res.ok) throw new Error(data.detail || JSON.stringify(data));
-  return data;
-}
-
 function ttlText(ts) {
   if (!ts) return 'n/a';
   const left = Math.max(0, ts - Math.floor(Date.now() / 1000));
@@ -34,30 +30,151 @@ function render() {
     const div = document.createElement('div');
     div.className = 'action';
     div.innerHTML = `
-      <div><b>${action.tool_name}</b> - status: ${action.status}</div>
+      <div><b>${escapeHtml(action.tool_name)}</b> - status: ${action.status}</div>
       <div>Action TTL: ${ttlText(action.expires_at)} | Approval TTL: ${ttlText(action.approval_expires_at)}</div>
-      <pre>${action.preview}</pre>
+      <pre>${escapeHtml(action.preview)}</pre>
+      ${outputs[action.action_id] !== undefined ? `<pre class="output">${outputs[action.action_id]}</pre>` : ''}
       <button data-kind="approve" data-id="${action.action_id}">Approve</button>
       <button data-kind="execute" data-id="${action.action_id}">Execute</button>
-      <details><summary>Audit trail</summary><pre>${JSON.stringify(action.audit, null, 2)}</pre></details>
+      <details><summary>Audit trail</summary><pre>${escapeHtml(JSON.stringify(action.audit, null, 2))}</pre></details>
     `;
     actionsRoot.appendChild(div);
   });
 }
 
-async function refreshAction(actionId) {
-  const updated = await get(`/actions/${actionId}`);
-  actions = actions.map((a) => (a.action_id === actionId ? updated : a));
+function escapeHtml(text) {
+  return text.replace(/&/g, '&amp;').replace(/</g, '&lt;').replace(/>/g, '&gt;');
+}
+
+function streamOutput(actionId) {
+  outputs[actionId] = '';
+  const source = new EventSource(`/actions/${actionId}/output`);
+  const append = (event) => {
+    outputs[actionId] += escapeHtml(JSON.parse(event.data));
+    render();
+  };
+  source.addEventListener('stdout', append);
+  source.addEventListener('stderr', append);
+  source.addEventListener('end', () => source.close());
+  source.onerror = () => source.close();
+}
+
+// The audit trail only grows, so its length orders a response against deltas
+// that may have arrived first.
+function upsert(updated) {
+  const fresher = (a) => a.action_id === updated.action_id && updated.audit.length >= (a.audit || []).length;
+  actions = actions.map((a) => (fresher(a) ? updated : a));
   render();
 }
 
+// Status changes (including ones made by other tabs, workers or the expiry
+// sweeper) arrive as compact deltas; EventSource resumes from the last event
+// id after a reconnect.
+function applyDelta(delta) {
+  const action = actions.find((a) => a.action_id === delta.action_id);
+  if (!action) return;
+  const { audit, ...fields } = delta;
+  Object.assign(action, fields);
+  if (audit) action.audit = [...(action.audit || []), { action_id: delta.action_id, ...audit }];
+  render();
+}
+
+const events = new EventSource(`/sessions/${SESSION_ID}/events`);
+events.addEventListener('action', (event) => applyDelta(JSON.parse(event.data)));
+
+// With several workers and no backend change notifications the server only
+// sees its own transitions, so unfinished actions are refreshed as well.
+const TERMINAL = ['EXECUTED', 'EXPIRED', 'REJECTED', 'FAILED'];
+let refreshTimer = null;
+
+async function refreshPending() {
+  const pending = actions.filter((a) => !TERMINAL.includes(a.status));
+  await Promise.all(pending.map(async (a) => {
+    const res = await fetch(`/actions/${a.action_id}`);
+    if (res.ok) upsert(await res.json());
+  }));
+}
+
+events.addEventListener('ready', (event) => {
+  if (JSON.parse(event.data).process_local && !refreshTimer) refreshTimer = setInterval(refreshPending, 2000);
+});
+
+async function streamPlan(goal, onEvent) {
+  const res = await fetch('/agent/plan:stream', {
+    method: 'POST',
+    headers: { 'content-type': 'application/json', 'x-session-id': SESSION_ID },
+    body: JSON.stringify({ goal }),
+  });
+  if (!res.ok) {
+    const data = await res.json();
+    throw new Error(data.detail || JSON.stringify(data));
+  }
+  const reader = res.body.getReader();
+  const decoder = new TextDecoder();
+  let buffered = '';
+  for (;;) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffered += decoder.decode(value, { stream: true });
+    let split;
+    while ((split = buffered.indexOf('\n\n')) !== -1) {
+      const block = buffered.slice(0, split);
+      buffered = buffered.slice(split + 2);
+      const event = block.match(/^event: (.*)$/m)[1];
+      const data = JSON.parse(block.match(/^data: (.*)$/m)[1]);
+      onEvent(event, data);
+    }
+  }
+}
+
 planBtn.onclick = async () => {
   try {
     const goal = document.getElementById('goal').value;
-    const data = await post('/agent/plan', { goal });
-    planSummary.textContent = data.plan_summary;
-    actions = data.actions;
+    planSummary.textContent = 'Planning...';
+    actions = [];
     render();
+    await streamPlan(goal, (event, data) => {
+      if (event === 'action') {
+        actions.push(data);
+        render();
+      }
+      if (event === 'summary') planSummary.textContent = data.plan_summary;
+      if (event === 'error') {
+        const kept = data.action_ids && data.action_ids.length ? ` (partial plan: ${data.action_ids.length} action(s) kept)` : '';
+        throw new Error(data.detail + kept);
+      }
+    });
+  } catch (err) {
+    alert(err.message);
+  }
+};
+
+async function runBatch(path, body) {
+  const data = await post(path, body);
+  const failed = data.results.filter((item) => !item.ok);
+  for (const item of data.results) {
+    if (item.ok && path.startsWith('/actions/execute')) streamOutput(item.action_id);
+  }
+  data.results.filter((item) => item.ok).forEach((item) => upsert(item.action));
+  if (failed.length) alert(failed.map((item) => `${item.action_id}: ${item.error}`).join('\n'));
+}
+
+document.getElementById('approveAllBtn').onclick = async () => {
+  const ids = actions.filter((a) => a.status === 'PROPOSED' && a.risk_tier === 'PRIVILEGED').map((a) => a.action_id);
+  if (!ids.length) return;
+  try {
+    await runBatch('/actions/approve:batch', { action_ids: ids });
+  } catch (err) {
+    alert(err.message);
+  }
+};
+
+document.getElementById('executeAllBtn').onclick = async () => {
+  const ready = (a) => a.status === 'APPROVED' || (a.status === 'PROPOSED' && a.risk_tier === 'SAFE');
+  const ids = actions.filter(ready).map((a) => a.action_id);
+  if (!ids.length) return;
+  try {
+    await runBatch('/actions/execute:batch', { action_ids: ids, mode: 'ordered' });
   } catch (err) {
     alert(err.message);
   }
@@ -71,20 +188,16 @@ actionsRoot.onclick = async (event) => {
 
   try {
     if (kind === 'approve') {
-      await post('/actions/approve', { action_id: actionId });
-      await refreshAction(actionId);
+      upsert(await post('/actions/approve', { action_id: actionId }));
     }
     if (kind === 'execute') {
-      await post('/actions/execute', { action_id: actionId });
-      await refreshAction(actionId);
+      upsert((await post('/actions/execute', { action_id: actionId })).action);
+      streamOutput(actionId);
     }
   } catch (err) {
     alert(err.message);
   }
 };
 
-setInterval(async () => {
-  for (const action of actions) {
-    await refreshAction(action.action_id);
-  }
-}, 1000);
+// TTL countdowns are computed locally from the expiry timestamps.
+setInterval(render, 1000);